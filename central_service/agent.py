@@ -1,21 +1,29 @@
 # global imports
 import os
-import threading, queue
+import queue
 import multiprocessing as mp
 import numpy as np
 import tensorflow as tf
 import time
-import signal
 
 # local imports
 from centraltrainer.request_handler import RequestHandler
 from centraltrainer.collector import Collector
-from environment.environment import Environment
+from centraltrainer.channel import RequestChannel, IDLE_CHECK
+from centraltrainer.async_frontend import AsyncRequestFrontend
+from centraltrainer.io_loop import IOLoop
+from environment.environment import Environment, Session, middlewareConfig
+from environment.simulator import SimulatedEnvironment
+from environment.vector_env import VectorEnv
 from utils.logger import config_logger
-from utils.queue_ops import get_request, put_response
-from utils.data_transf import arrangeStateStreamsInfo, getTrainingVariables, allUnique
+from utils.stats import RunStats
+from utils.connection_state import ConnectionTable
+from utils.data_transf import joinStatesStreams, allUnique, splitStreamsPerConnection
+from utils.featurizer import REQUEST_RECORD, request_features, request_rewards, lowestRTTPathID
 from training import a3c
-from training import load_trace
+from training.numpy_actor import NumpyActor, actor_param_shapes
+from training.policy_snapshot import PolicySnapshot
+from training.learner import learner, episode_gradients
 
 # ---------- Global Variables ----------
 S_INFO = 6  # bandwidth_path_i, path_i_mean_RTT, path_i_retransmitted_packets + path_i_lost_packets
@@ -32,6 +40,15 @@ RANDOM_SEED = 42
 RAND_RANGE = 1000000
 GRADIENT_BATCH_SIZE = 8
 
+# Micro-batched inference: requests arriving within BATCH_WINDOW (s) share one forward pass
+# keep it well below requestTimeout (50ms) in zclient.go; 0 only batches requests already queued
+BATCH_WINDOW = 0.0
+MAX_BATCH_SIZE = 32
+
+# Serving engine for scheduling decisions: 'tf' (sess.run) or 'numpy' (NumpyActor),
+# both refreshed from the weights the learner process publishes after every update
+INFERENCE_ENGINE = 'tf'
+
 SUMMARY_DIR = ''
 LOG_FILE = ''
 NN_MODEL = ''
@@ -39,18 +56,66 @@ EPOCH = 0
 
 SSH_HOST = '192.168.122.157'
 
-
-def environment(bdw_paths: mp.Array, stop_env: mp.Event, end_of_run: mp.Event):
-    rhostname = 'mininet' + '@' + SSH_HOST
+# One entry per environment worker: a VM running mininet + MPQUIC and its middleware,
+# which exposes the scheduling requests (REQ/REP) and the stream completions (PUSH/PULL) on these ports
+WORKERS = [
+    {'host': SSH_HOST, 'ssh_port': '22', 'request_port': '5555', 'publisher_port': '5556'},
+]
+
+# False: workers send the raw episodes, the learner computes and applies the gradients
+# in graph (FusedTrainer, no round trip through Python)
+# True (A3C): workers compute the gradients on their own copy of the networks, the learner only
+# applies them (spreads the gradient computation when the learner falls behind, e.g. many vector workers)
+WORKER_GRADIENTS = False
+
+# Advantage estimator: None -> discounted return - V(s), otherwise GAE(lambda)
+GAE_LAMBDA = None
+
+# Decision budget (s) from the arrival of a request, after that it is answered by
+# the lowest smoothed-RTT path instead (keep it well below globalTimeout in zclient.go, None disables)
+DECISION_BUDGET = 0.1
+
+# At the end of a run, how long (s) to wait for the stream completions still in flight
+END_OF_EPISODE_TIMEOUT = 1.0
+
+# Collector memory: at most COLLECTOR_CAPACITY completions per run in memory,
+# optionally the full history in an append-only log (SUMMARY_DIR/streams_<worker>.bin, see utils/stream_log.py)
+COLLECTOR_CAPACITY = 10000
+SPILL_STREAMS = False
+
+# Per-connection episode buffers: bounded length, evicted after being idle (s)
+MAX_CONNECTION_STEPS = 10000
+CONNECTION_IDLE_TIMEOUT = 120
+
+# Request front end: 'rep' (RequestHandler, one outstanding request)
+# or 'router' (AsyncRequestFrontend, interleaved requests; run the middleware with -proxy)
+FRONTEND = 'rep'
+
+# Single I/O thread (one zmq context and poller for requests + stream completions, see centraltrainer/io_loop.py)
+# False: separate front end and Collector threads
+IO_LOOP = True
+
+# Environment of the workers: 'mininet' (VM with mininet + MPQUIC, Environment)
+# or 'simulator' (discrete-event simulator on this machine, see environment/simulator.py;
+# use 'localhost' as the host of the workers, it binds the ports of the middleware)
+ENVIRONMENT = 'mininet'
+# 'vector': no sockets, each worker steps NUM_ENVS simulated page loads in lockstep
+# (environment/vector_env.py) with one predict per step for all of them
+NUM_ENVS = 64
+
+
+def environment(worker_id: int, worker: dict, seed: int, bdw_paths: mp.Array, stop_env: mp.Event, end_of_run: mp.Event,
+                next_run: mp.Event, run_notify=None):
+    rhostname = 'mininet' + '@' + worker['host']
     
-    config = {
-        'server': 'ipc:///tmp/zmq',
-        'client': 'tcp://*:5555',
-        'publisher': 'tcp://*:5556',
-        'subscriber': 'ipc:///tmp/pubsub'
-    }
-    logger = config_logger('environment', filepath='./logs/environment.log')
-    env = Environment(bdw_paths, logger=logger, mconfig=config, remoteHostname=rhostname)
+    config = middlewareConfig(worker, proxy=FRONTEND == 'router')
+    logger = config_logger('environment_{}'.format(worker_id), filepath='./logs/environment_{}.log'.format(worker_id))
+    if ENVIRONMENT == 'simulator':
+        env = SimulatedEnvironment(bdw_paths, logger=logger, mconfig=config, worker=worker_id, num_workers=len(WORKERS),
+                                   seed=seed)
+    else:
+        env = Environment(bdw_paths, logger=logger, mconfig=config, remoteHostname=rhostname, remotePort=worker['ssh_port'],
+                          worker=worker_id, num_workers=len(WORKERS), seed=seed)
 
     # Lets measure env runs in time
     while not stop_env.is_set():
@@ -62,6 +127,8 @@ def environment(bdw_paths: mp.Array, stop_env: mp.Event, end_of_run: mp.Event):
                 if env.updateEnvironment() == -1:
                     stop_env.set()
                     end_of_run.set()
+                    if run_notify is not None:
+                        run_notify.send(True)
                     break
 
                 # run a single session & measure
@@ -75,97 +142,158 @@ def environment(bdw_paths: mp.Array, stop_env: mp.Event, end_of_run: mp.Event):
                 logger.debug("Time to execute one run: {}s".format(diff))
 
                 end_of_run.set() # set the end of run so our agent knows
+                if run_notify is not None:
+                    run_notify.send(True) # wakes up the I/O loop of the agent
                 # env.spawn_middleware() # restart middleware 
             except Exception as ex:
                 logger.error(ex)
                 break
-        time.sleep(0.1)
+
+        # wait for the agent to hand the episodes over (it clears end_of_run, then sets next_run)
+        if end_of_run.is_set():
+            next_run.wait()
+            next_run.clear()
 
     env.close()
         
 
-def agent():
-    np.random.seed(RANDOM_SEED)
+def fallback_response(request):
+    ''' Built-in policy for requests the agent could not answer within DECISION_BUDGET '''
+    response = [request['StreamID'], lowestRTTPathID(request)]
+    return [str(r).encode('utf-8') for r in response]
 
-    # Create results path
-    if not os.path.exists(SUMMARY_DIR):
-        os.makedirs(SUMMARY_DIR)
 
-    # Spawn request handler
-    tqueue = queue.Queue(1)
-    rhandler = RequestHandler(1, "rhandler-thread", tqueue=tqueue, host=SSH_HOST, port='5555')
-    rhandler.start()
-
-    # Spawn collector thread
-    cqueue = queue.Queue(0)
-    collector = Collector(2, "collector-thread", queue=cqueue, host=SSH_HOST, port='5556')
-    collector.start()
+def local_networks(sess, params):
+    '''
+        Local copy of the networks of a worker (the learner applies the updates):
+        (actor, critic, trainer, policy), policy answers the scheduling requests
+    '''
+    actor, critic, trainer = None, None, None
+    if INFERENCE_ENGINE == 'tf' or WORKER_GRADIENTS:
+        actor = a3c.ActorNetwork(sess,
+                                 state_dim=[S_INFO, S_LEN], action_dim=A_DIM,
+                                 learning_rate=ACTOR_LR_RATE)
+    if WORKER_GRADIENTS:
+        critic = a3c.CriticNetwork(sess,
+                                   state_dim=[S_INFO, S_LEN],
+                                   learning_rate=CRITIC_LR_RATE)
+    sess.run(tf.global_variables_initializer())
+    if WORKER_GRADIENTS:
+        trainer = a3c.FusedTrainer(sess, actor, critic, gae_lambda=GAE_LAMBDA)
+
+    if INFERENCE_ENGINE == 'numpy':
+        policy = NumpyActor(params)
+    else:
+        policy = actor
+    policy.set_network_params(params)
+    return actor, critic, trainer, policy
+
+
+def worker(worker_id: int, worker: dict, seed: int, exp_queue: mp.Queue,
+           snapshot: PolicySnapshot, critic_snapshot: PolicySnapshot):
+    '''
+        One environment worker: serves the scheduling requests of its VM and
+        hands the finished episodes (or their gradients) to the learner
+    '''
+    np.random.seed(RANDOM_SEED + worker_id)
+
+    channel = RequestChannel(budget=DECISION_BUDGET, fallback=fallback_response)
+    cqueue = queue.Queue(COLLECTOR_CAPACITY)
+    stream_log = None if not SPILL_STREAMS else os.path.join(SUMMARY_DIR, "streams_{}.bin".format(worker_id))
 
     # Spawn environment # process -- not a thread
     bdw_paths = mp.Array('i', 2)
     stop_env = mp.Event()
     end_of_run = mp.Event()
-    env = mp.Process(target=environment, args=(bdw_paths, stop_env, end_of_run))
+    next_run = mp.Event()
+    run_listen, run_notify = mp.Pipe(duplex=False) if IO_LOOP else (None, None)
+
+    if IO_LOOP:
+        # Spawn I/O thread: request handler + collector
+        io_loop = IOLoop(1, "io-loop-thread", channel=channel, cqueue=cqueue, host=worker['host'],
+                         request_port=worker['request_port'], publisher_port=worker['publisher_port'],
+                         router=FRONTEND == 'router', stream_log=stream_log, run_notify=run_listen)
+        io_loop.start()
+        collector = io_loop.collector
+        threads = [io_loop]
+    else:
+        # Spawn request handler
+        if FRONTEND == 'router':
+            rhandler = AsyncRequestFrontend(1, "frontend-thread", channel=channel, host=worker['host'], port=worker['request_port'])
+        else:
+            rhandler = RequestHandler(1, "rhandler-thread", channel=channel, host=worker['host'], port=worker['request_port'])
+        rhandler.start()
+
+        # Spawn collector thread
+        collector = Collector(2, "collector-thread", queue=cqueue, host=worker['host'], port=worker['publisher_port'],
+                              stream_log=stream_log)
+        collector.start()
+        threads = [rhandler, collector]
+
+    env = mp.Process(target=environment, args=(worker_id, worker, seed, bdw_paths, stop_env, end_of_run, next_run, run_notify))
     env.start()
 
     # keep record of threads and processes
-    tp_list = [rhandler, collector, env]
+    tp_list = threads + [env]
 
 
     # Main training loop
-    logger = config_logger('agent', './logs/agent.log')
+    logger = config_logger('agent_{}'.format(worker_id), './logs/agent_{}.log'.format(worker_id))
     logger.info("Run Agent until training stops...")
 
-    with tf.Session() as sess, open(LOG_FILE, 'w') as log_file:
-        actor = a3c.ActorNetwork(sess,
-                                 state_dim=[S_INFO, S_LEN], action_dim=A_DIM,
-                                 learning_rate=ACTOR_LR_RATE)
-
-        critic = a3c.CriticNetwork(sess,
-                                   state_dim=[S_INFO, S_LEN],
-                                   learning_rate=CRITIC_LR_RATE)
+    # wait for the initial weights of the learner
+    snapshot.wait()
+    version, params = snapshot.read()
 
-        summary_ops, summary_vars = a3c.build_summaries()
+    log_path = LOG_FILE if len(WORKERS) == 1 else "{}_{}".format(LOG_FILE, worker_id)
+    with tf.Session() as sess, open(log_path, 'w') as log_file:
+        actor, critic, trainer, policy = local_networks(sess, params)
 
-        sess.run(tf.global_variables_initializer())
-        writer = tf.summary.FileWriter(SUMMARY_DIR, sess.graph)  # training monitor
-        saver = tf.train.Saver()  # save neural net parameters
-
-        # # restore neural net parameters
-        nn_model = NN_MODEL
-        if nn_model is not None:  # nn_model is the path to file
-            saver.restore(sess, nn_model)
-            print("Model restored.")
-
-        epoch = EPOCH
         time_stamp = 0
 
         path = DEFAULT_PATH
 
-        action_vec = np.zeros(A_DIM)
-        action_vec[path] = 1
+        # state history + episode buffers per connection (QUIC session)
+        connections = ConnectionTable(S_INFO, S_LEN, max_steps=MAX_CONNECTION_STEPS,
+                                      idle_timeout=CONNECTION_IDLE_TIMEOUT)
+        # idle connections evicted during the run, their episodes are joined at the end of it
+        evicted = {}
 
-        s_batch = [np.zeros((S_INFO, S_LEN))]
-        a_batch = [action_vec]
-        r_batch = []
-        entropy_record = []
+        inference_stats = RunStats()
 
-        actor_gradient_batch = []
-        critic_gradient_batch = []
-        
-        list_states = []
+        # reused for every batch of requests
+        batch_records = np.zeros(MAX_BATCH_SIZE, dtype=REQUEST_RECORD)
+        batch_features = np.empty((MAX_BATCH_SIZE, S_INFO))
+        batch_states = np.empty((MAX_BATCH_SIZE, S_INFO, S_LEN))
         while not end_of_run.is_set():
-            # Get scheduling request from rhandler thread
-            request, ev1 = get_request(tqueue, logger, end_of_run=end_of_run)
+            # Get (a batch of) scheduling requests from rhandler thread
+            # (with the I/O loop, blocks until a request or the end of run, no periodic wake-up)
+            batch = channel.get_batch(end_of_run=end_of_run, window=BATCH_WINDOW, max_size=MAX_BATCH_SIZE,
+                                      idle_check=None if IO_LOOP else IDLE_CHECK)
 
             # end of iterations -> exit loop -> save -> bb
             if stop_env.is_set():
                 break
 
-            if request is None and end_of_run.is_set():
-                logger.info("END_OF_RUN => BATCH UPDATE")
+            # pick up the latest policy published by the learner
+            if snapshot.version() != version:
+                version, params = snapshot.read()
+                policy.set_network_params(params)
+                logger.debug("Policy updated to version {}".format(version))
 
+            if len(batch) == 0 and end_of_run.is_set():
+                logger.info("END_OF_RUN => EPISODES TO LEARNER")
+                inference_stats.report(logger)
+                inference_stats.reset()
+
+                # wait for the end-of-episode markers of the clients, then
                 # get all stream_info from collector's queue
+                incomplete = set()
+                for summary in collector.finish_episodes(timeout=END_OF_EPISODE_TIMEOUT):
+                    if summary['Missing'] > 0 or not summary['EndOfEpisode']:
+                        logger.info("Incomplete episode: {}".format(summary))
+                        incomplete.add(summary['Episode'])
+                logger.info("Collector memory: {}".format(collector.memory_stats()))
                 stream_info = []
                 with cqueue.mutex:
                     for elem in list(cqueue.queue):
@@ -173,197 +301,288 @@ def agent():
                     # clear the queue
                     cqueue.queue.clear()
 
-                # Validate
-                # Proceed to next run
-                # logger.info("len(list_states) {} == len(stream_info) {}".format(len(list_states), len(stream_info)))
-                if len(list_states) != len(stream_info) or len(list_states) == 0:
-                    entropy_record = []
-                    del s_batch[:]
-                    del a_batch[:]
-                    del r_batch[:]
-                    stream_info.clear()
-                    list_states.clear()
-                    end_of_run.clear()
-                    time.sleep(0.01)
-                    continue
-
-                # Re-order rewards
-                stream_info = arrangeStateStreamsInfo(list_states, stream_info)
-                list_ids = [stream['StreamID'] for stream in stream_info]
-                logger.info("all unique: {}".format(allUnique(list_ids, debug=True)))
-                
-                # for i, stream in enumerate(stream_info):
-                #     logger.info(stream)
-                #     logger.info(list_states[i]) # print this on index based
-
-                # For each stream calculate a reward
-                completion_times = []
-                for index,stream in enumerate(stream_info):
-                    path1_smoothed_RTT, path1_bandwidth, path1_packets, \
-                    path1_retransmissions, path1_losses, \
-                    path2_smoothed_RTT, path2_bandwidth, path2_packets, \
-                    path2_retransmissions, path2_losses, \
-                        = getTrainingVariables(list_states[index])
-
-                    normalized_bwd_path0 = (bdw_paths[0] - 1.0) / (100.0 - 1.0)
-                    normalized_bwd_path1 = (bdw_paths[1] - 1.0) / (100.0 - 1.0)
-                    normalized_srtt_path0 = ((path1_smoothed_RTT * 1000.0) - 1.0) / (120.0)
-                    normalized_srtt_path1 = ((path2_smoothed_RTT * 1000.0) - 1.0) / (120.0)
-                    normalized_loss_path0 = ((path1_retransmissions + path1_losses) - 0.0) / 20.0
-                    normalized_loss_path1 = ((path2_retransmissions + path2_losses) - 0.0) / 20.0
-
-                    # aggr_bdw = normalized_bwd_path0 + normalized_bwd_path1
-                    aggr_srtt = normalized_srtt_path0 + normalized_srtt_path1
-                    aggr_loss = normalized_loss_path0 + normalized_loss_path1
-
-                    reward = (a_batch[index][0]* normalized_bwd_path0 + a_batch[index][1]*normalized_bwd_path1) - stream['CompletionTime'] - (0.8*aggr_srtt) - (1.0 * aggr_loss)
-                    r_batch.append(reward)
-                    completion_times.append(stream['CompletionTime'])
-
-                # Check if we have a stream[0] = 0 add -> 0 to r_batch
-                tmp_s_batch = np.stack(s_batch[:], axis=0)
-                tmp_r_batch = np.vstack(r_batch[:])
-                if tmp_s_batch.shape[0] > tmp_r_batch.shape[0]:
-                    logger.debug("s_batch({}) > r_batch({})".format(tmp_s_batch.shape[0], tmp_r_batch.shape[0]))
-                    logger.debug(tmp_s_batch[0])
-                    r_batch.insert(0, 0)
-
-                # Save metrics for debugging
-                # log time_stamp, bit_rate, buffer_size, reward
-                for index, stream in enumerate(stream_info):
-                    path1_smoothed_RTT, path1_bandwidth, path1_packets, \
-                    path1_retransmissions, path1_losses, \
-                    path2_smoothed_RTT, path2_bandwidth, path2_packets, \
-                    path2_retransmissions, path2_losses, \
-                        = getTrainingVariables(list_states[index])
-                    log_file.write(str(time_stamp) + '\t' +
-                                str(PATHS[path]) + '\t' +
-                                str(bdw_paths[0]) + '\t' +
-                                str(bdw_paths[1]) + '\t' +
-                                str(path1_smoothed_RTT) + '\t' +
-                                str(path2_smoothed_RTT) + '\t' +
-                                str(path1_retransmissions+path1_losses) + '\t' +
-                                str(path2_retransmissions+path2_losses) + '\t' +
-                                str(stream['CompletionTime']) + '\t' +
-                                str(stream['Path']) + '\n')
+                for conn in evicted.values():
+                    connections.restore(conn)
+                evicted.clear()
+
+                # one episode per connection
+                conn_streams, unassigned = splitStreamsPerConnection(connections.ids(), stream_info)
+                if len(unassigned) > 0:
+                    logger.info("{} stream completions without a matching connection".format(len(unassigned)))
+
+                run_steps, run_salvaged = 0, 0
+                for conn_id, conn in connections.items():
+                    list_states = conn.list_states
+                    a_batch = conn.a_batch
+                    entropy_record = conn.entropy_record
+                    stream_info = conn_streams[conn_id]
+
+                    # Join the completions to the states (request-path / StreamID),
+                    # strictly if some of them were lost (no guess on the request-paths they leave short)
+                    strict = any(stream.get('Episode') in incomplete for stream in stream_info)
+                    indices, stream_info, missing, extra = joinStatesStreams(list_states, stream_info, strict=strict)
+
+                    # Salvage the steps that joined cleanly, drop the unmatched ones
+                    run_steps += len(list_states)
+                    if len(missing) > 0 or len(extra) > 0:
+                        logger.info("Connection {}: {} states, {} without completion, {} unmatched completions, dropped {}".format(
+                            conn_id, len(list_states), len(missing), len(extra), conn.dropped))
+
+                    # Validate
+                    # Proceed to next connection (nothing left to train on without the first chunk)
+                    if len(indices) < 2:
+                        continue
+                    run_salvaged += len(indices)
+
+                    # Aligned with stream_info
+                    records = np.array(list_states, dtype=REQUEST_RECORD)[indices]
+                    a_batch = np.stack(a_batch, axis=0)[indices]
+                    completion_times = np.array([stream['CompletionTime'] for stream in stream_info])
+                    list_ids = [stream['StreamID'] for stream in stream_info]
+                    logger.info("all unique: {}".format(allUnique(list_ids, debug=True)))
+
+                    # For each stream calculate a reward (from the request records, no re-parsing)
+                    r_batch = request_rewards(records, a_batch, completion_times, bdw_paths)
+
+                    # Save metrics for debugging
+                    # log time_stamp, bit_rate, buffer_size, reward
+                    srtts = records['SmoothedRTT']
+                    losses = records['Retransmissions'] + records['Losses']
+                    for index, stream in enumerate(stream_info):
+                        log_file.write(str(time_stamp) + '\t' +
+                                    str(PATHS[path]) + '\t' +
+                                    str(bdw_paths[0]) + '\t' +
+                                    str(bdw_paths[1]) + '\t' +
+                                    str(srtts[index, 0]) + '\t' +
+                                    str(srtts[index, 1]) + '\t' +
+                                    str(losses[index, 0]) + '\t' +
+                                    str(losses[index, 1]) + '\t' +
+                                    str(stream['CompletionTime']) + '\t' +
+                                    str(stream['Path']) + '\n')
+                        time_stamp += 1
                     log_file.flush()
-                    time_stamp += 1
-
-                # Single Training step
-                # ----------------------------------------------------------------------------------------------------
-                actor_gradient, critic_gradient, td_batch = \
-                    a3c.compute_gradients(s_batch=np.stack(s_batch[1:], axis=0),  # ignore the first chuck
-                                        a_batch=np.vstack(a_batch[1:]),  # since we don't have the
-                                        r_batch=np.vstack(r_batch[1:]),  # control over it
-                                        terminal=True, actor=actor, critic=critic)
-                td_loss = np.mean(td_batch)
-
-                actor_gradient_batch.append(actor_gradient)
-                critic_gradient_batch.append(critic_gradient)
-
-                logger.debug ("====")
-                logger.debug ("Epoch: {}".format(epoch))
-                msg = "TD_loss: {}, Avg_reward: {}, Avg_entropy: {}".format(td_loss, np.mean(r_batch[1:]), np.mean(entropy_record[1:]))
-                logger.debug (msg)
-                logger.debug ("====")
-                # ----------------------------------------------------------------------------------------------------
-
-                # Print summary for tensorflow
-                # ----------------------------------------------------------------------------------------------------
-                summary_str = sess.run(summary_ops, feed_dict={
-                        summary_vars[0]: td_loss,
-                        summary_vars[1]: np.mean(r_batch),
-                        summary_vars[2]: np.mean(entropy_record),
-                        summary_vars[3]: np.mean(completion_times)
-                    })
-
-                writer.add_summary(summary_str, epoch)
-                writer.flush()
-                # ----------------------------------------------------------------------------------------------------
-
-                # Update gradients
-                if len(actor_gradient_batch) >= GRADIENT_BATCH_SIZE:
-                    assert len(actor_gradient_batch) == len(critic_gradient_batch)
-
-                    for i in range(len(actor_gradient_batch)):
-                        actor.apply_gradients(actor_gradient_batch[i])
-                        critic.apply_gradients(critic_gradient_batch[i])
-
-                    epoch += 1
-                    if epoch % MODEL_SAVE_INTERVAL == 0:
-                        save_path = saver.save(sess, SUMMARY_DIR + "/nn_model_ep_" + str(epoch) + ".ckpt")
-
-                entropy_record = []
+
+                    episode = {
+                        'worker': worker_id,
+                        'conn_id': conn_id,
+                        'f_batch': np.stack(conn.f_batch, axis=0),
+                        'indices': indices,
+                        'a_batch': a_batch,
+                        'r_batch': r_batch,
+                        'entropy': np.array(entropy_record),
+                        'completion_times': completion_times
+                    }
+
+                    # Single Training step, on the latest weights of the learner
+                    if WORKER_GRADIENTS:
+                        version, params = snapshot.read()
+                        policy.set_network_params(params)
+                        if actor is not policy:
+                            actor.set_network_params(params)
+                        critic.set_network_params(critic_snapshot.read()[1])
+
+                        episode['actor_gradient'], episode['critic_gradient'], episode['td_loss'] = \
+                            episode_gradients(episode, trainer, S_LEN)
+                        del episode['f_batch'], episode['indices'], episode['a_batch']
+
+                    exp_queue.put(episode)
+
+                if run_steps > 0:
+                    logger.info("Salvaged {}/{} steps ({:.1f}%) of {} connections".format(
+                        run_salvaged, run_steps, 100.0 * run_salvaged / run_steps, len(connections)))
 
                 # Clear all before proceeding to next run
-                del s_batch[:]
-                del a_batch[:]
-                del r_batch[:]
-                stream_info.clear()
-                list_states.clear()
+                connections.clear()
                 end_of_run.clear()
+                next_run.set()
             else:
-                ev1.set() # let `producer` (rh) know we received request
-                list_states.append(request)
-
+                # records of the batch (parsed once by the front end), features of all of them at once
                 # The bandwidth metrics coming from MPQUIC are not correct
                 # constant values not upgraded
-                path1_smoothed_RTT, path1_bandwidth, path1_packets, \
-                path1_retransmissions, path1_losses, \
-                path2_smoothed_RTT, path2_bandwidth, path2_packets, \
-                path2_retransmissions, path2_losses, \
-                    = getTrainingVariables(request)
+                records = batch_records[:len(batch)]
+                for index, slot in enumerate(batch):
+                    records[index] = slot.request
+                features = request_features(records, bdw_paths, out=batch_features[:len(batch)])
+
+                states = batch_states[:len(batch)]
+                batch_connections = []
+                for index in range(len(batch)):
+                    conn = connections.get(int(records[index]['ConnectionID']))
+                    time_stamp += 1  # in ms
+
+                    # enqueue the new column, the oldest one drops out of the window
+                    conn.history.push(features[index])
+                    states[index] = conn.history.window()
+                    batch_connections.append(conn)
+
+                # one forward pass for the whole batch
+                # (requests that already expired were answered by the fallback policy, skip them)
+                dispatch_time = time.time()
+                pending = [index for index, slot in enumerate(batch) if not slot.done()]
+                if len(pending) > 0:
+                    action_probs = policy.predict(states[pending])
+                    entropies = a3c.compute_entropy(action_probs) # one per request
+
+                inference_stats.record('batch_size', len(pending))
+                for slot in batch:
+                    inference_stats.record('decode', slot.decode)
+                    inference_stats.record('batch_wait', dispatch_time - slot.arrival)
+
+                probs_index = 0
+                for index, slot in enumerate(batch):
+                    entropy = None
+                    answered = False
+                    if probs_index < len(pending) and pending[probs_index] == index:
+                        action_prob = action_probs[probs_index]
+                        entropy = entropies[probs_index]
+                        probs_index += 1
+                        action_cumsum = np.cumsum(action_prob)
+                        path = (action_cumsum > np.random.randint(1, RAND_RANGE) / float(RAND_RANGE)).argmax()
+
+                        # prepare response
+                        response = [slot.request['StreamID'], PATHS[path]]
+                        response = [str(r).encode('utf-8') for r in response]
+                        answered = slot.complete(response) # wakes up the waiting request handler
+
+                    if not answered:
+                        # answered by the fallback policy, learn from the action actually taken
+                        fallback_path = lowestRTTPathID(records[index])
+                        path = PATHS.index(fallback_path) if fallback_path in PATHS else DEFAULT_PATH
+
+                    inference_stats.record('fallback', 0 if answered else 1)
+                    inference_stats.record('decision_age', slot.age())
+
+                    action_vec = np.zeros(A_DIM)
+                    action_vec[path] = 1
+
+                    logger.debug("PATH: {}".format(path))
+
+                    # copies: the record / feature buffers are reused
+                    batch_connections[index].store(records[index].copy(), features[index].copy(), action_vec, entropy)
+
+                for conn in connections.evict_idle():
+                    logger.info("Evicted idle connection {} ({} steps)".format(conn.conn_id, conn.steps()))
+                    if conn.conn_id in evicted:
+                        conn.prepend(evicted[conn.conn_id])
+                    evicted[conn.conn_id] = conn
 
-                time_stamp += 1  # in ms
-                last_path = path
+    # send kill signal to all
+    stop_env.set()
+    next_run.set()
+    for thread in threads:
+        thread.stophandler()
 
-                # retrieve previous state
-                if len(s_batch) == 0:
-                    state = np.zeros((S_INFO, S_LEN))
-                else:
-                    state = np.array(s_batch[-1], copy=True)
+    # wait for threads and process to finish gracefully...
+    for tp in tp_list:
+        tp.join()
 
-                # dequeue history record
-                state = np.roll(state, -1, axis=1)
 
-                # this should be S_INFO number of terms
-                state[0, -1] = (bdw_paths[0] - 1.0) / (100.0 - 1.0) # bandwidth path1
-                state[1, -1] = (bdw_paths[1] - 1.0) / (100.0 - 1.0) # bandwidth path2
-                state[2, -1] = ((path1_smoothed_RTT * 1000.0) - 1.0) / (120.0) # max RTT so far 120ms 
-                state[3, -1] = ((path2_smoothed_RTT * 1000.0) - 1.0) / (120.0)
-                state[4, -1] = ((path1_retransmissions + path1_losses) - 0.0) / 20.0
-                state[5, -1] = ((path2_retransmissions + path2_losses) - 0.0) / 20.0
+def vector_worker(worker_id: int, seed: int, exp_queue: mp.Queue,
+                  snapshot: PolicySnapshot, critic_snapshot: PolicySnapshot):
+    '''
+        Simulated worker: sweeps its share of the session (topologies x graphs)
+        NUM_ENVS page loads at a time, one batched forward pass per step
+    '''
+    np.random.seed(RANDOM_SEED + worker_id)
+
+    logger = config_logger('agent_{}'.format(worker_id), './logs/agent_{}.log'.format(worker_id))
+    session = Session(worker=worker_id, num_workers=len(WORKERS), seed=seed)
+    envs = VectorEnv(NUM_ENVS, session, S_INFO, S_LEN, a_dim=A_DIM, seed=seed + worker_id, worker=worker_id)
+
+    snapshot.wait()
+    version, params = snapshot.read()
+
+    with tf.Session() as sess:
+        actor, critic, trainer, policy = local_networks(sess, params)
+
+        start, steps, num_episodes = time.time(), 0, 0
+        states = envs.reset()
+        while envs.active.any():
+            if snapshot.version() != version:
+                version, params = snapshot.read()
+                policy.set_network_params(params)
+
+            action_probs = policy.predict(states)
+            entropies = a3c.compute_entropy(action_probs)
+            thresholds = np.random.randint(1, RAND_RANGE, size=(NUM_ENVS, 1)) / float(RAND_RANGE)
+            actions = (np.cumsum(action_probs, axis=1) > thresholds).argmax(axis=1)
+
+            steps += int(envs.active.sum())
+            states, episodes = envs.step(actions, entropies)
+
+            if len(episodes) > 0 and WORKER_GRADIENTS:
+                # on the latest weights of the learner, once for all the episodes of the step
+                version, params = snapshot.read()
+                policy.set_network_params(params)
+                if actor is not policy:
+                    actor.set_network_params(params)
+                critic.set_network_params(critic_snapshot.read()[1])
+
+            for episode in episodes:
+                logger.info("Graph: {}, page load time: {}s (simulated), {} steps".format(
+                    episode['graph'], episode['page_load_time'], len(episode['a_batch'])))
+                del episode['graph'], episode['page_load_time']
+                if WORKER_GRADIENTS:
+                    episode['actor_gradient'], episode['critic_gradient'], episode['td_loss'] = \
+                        episode_gradients(episode, trainer, S_LEN)
+                    del episode['f_batch'], episode['indices'], episode['a_batch']
+                exp_queue.put(episode)
+            num_episodes += len(episodes)
+
+        elapsed = time.time() - start
+        logger.info("Session done: {} page loads, {} steps in {:.1f}s ({:.0f} steps/s)".format(
+            num_episodes, steps, elapsed, steps / max(elapsed, 1e-9)))
 
-                s_batch.append(state)
 
-                action_prob = actor.predict(np.reshape(state, (1, S_INFO, S_LEN)))
-                action_cumsum = np.cumsum(action_prob)
-                path = (action_cumsum > np.random.randint(1, RAND_RANGE) / float(RAND_RANGE)).argmax()
+def agent():
+    np.random.seed(RANDOM_SEED)
 
-                action_vec = np.zeros(A_DIM)
-                action_vec[path] = 1
-                a_batch.append(action_vec)
+    # Create results path
+    if not os.path.exists(SUMMARY_DIR):
+        os.makedirs(SUMMARY_DIR)
 
-                logger.debug("PATH: {}".format(path))
+    # Spawn learner # process -- parameter holder, applies the updates of all workers
+    exp_queue = mp.Queue()
+    snapshot = PolicySnapshot(actor_param_shapes((S_INFO, S_LEN), A_DIM))
+    critic_snapshot = PolicySnapshot(actor_param_shapes((S_INFO, S_LEN), 1)) # same layers, single output
+    learner_config = {
+        's_info': S_INFO,
+        's_len': S_LEN,
+        'a_dim': A_DIM,
+        'actor_lr_rate': ACTOR_LR_RATE,
+        'critic_lr_rate': CRITIC_LR_RATE,
+        'gradient_batch_size': GRADIENT_BATCH_SIZE,
+        'gae_lambda': GAE_LAMBDA,
+        'model_save_interval': MODEL_SAVE_INTERVAL,
+        'summary_dir': SUMMARY_DIR,
+        'nn_model': NN_MODEL,
+        'epoch': EPOCH
+    }
+    trainer = mp.Process(target=learner, args=(exp_queue, snapshot, critic_snapshot, learner_config))
+    trainer.start()
+
+    # Spawn workers # processes -- one per VM, each runs its share of the session
+    seed = np.random.randint(RAND_RANGE)
+    workers = []
+    for worker_id, worker_config in enumerate(WORKERS):
+        if ENVIRONMENT == 'vector':
+            w = mp.Process(target=vector_worker, args=(worker_id, seed, exp_queue, snapshot, critic_snapshot))
+        else:
+            w = mp.Process(target=worker, args=(worker_id, worker_config, seed, exp_queue, snapshot, critic_snapshot))
+        w.start()
+        workers.append(w)
 
-                entropy_record.append(a3c.compute_entropy(action_prob[0]))
+    logger = config_logger('agent', './logs/agent.log')
+    logger.info("Run {} workers until training stops...".format(len(workers)))
 
-                # prepare response
-                response = [request['StreamID'], PATHS[path]]
-                response = [str(r).encode('utf-8') for r in response]
-                ev2 = threading.Event()
-                put_response((response, ev2), tqueue, logger)
-                ev2.wait() # blocks until `consumer` (i.e. rh) receives response
+    for w in workers:
+        w.join()
 
-    # send kill signal to all
-    stop_env.set()
-    rhandler.stophandler()
-    collector.stophandler()
+    # learner drains the pending episodes first
+    exp_queue.put(None)
+    trainer.join()
+    logger.info("Training done")
 
-    # wait for threads and process to finish gracefully...
-    for tp in tp_list:
-        tp.join()
-    
 
 def main():
     agent()
@@ -0,0 +1,141 @@
+import threading
+import asyncio
+import time
+import zmq
+import zmq.asyncio
+
+
+from utils.logger import config_logger
+from utils.wire_format import encode_response, reject_response, split_envelope, UnsupportedFormat
+from utils.featurizer import Featurizer
+from .channel import RequestChannel
+
+class AsyncRequestFrontend(threading.Thread):
+    ''' Alternative to RequestHandler built on a zmq ROUTER socket and asyncio.
+        Accepts interleaved requests from many clients (REQ sockets of MPQUIC sessions,
+        or the middleware in proxy mode), passes all of them on to the agent at once
+        and replies out of order, routed by the identity envelope of each request
+    '''
+    def __init__(self, threadID: int, threadName: str, channel: RequestChannel, host:str="localhost", port:str="5555", bind:bool=False):
+        threading.Thread.__init__(self)
+
+        # Threading variables
+        self._threadID = threadID
+        self._threadName = threadName
+        self.__channel = channel
+        self.__loop = None
+        self.__stoprequest = None
+        self.__stopped = threading.Event()
+
+        self.__logger = config_logger(name='async_frontend', filepath='./logs/frontend.log')
+
+        # ZMQ endpoint: connect to the middleware (default) or bind for MPQUIC clients to connect directly
+        self.__host = host
+        self.__port = port
+        self.__bind = bind
+
+        self.__inflight = 0
+        self.__featurizer = Featurizer()
+
+    def run(self):
+        self.pinfo("Run Async Request Frontend")
+        self.__loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop)
+        self.__stoprequest = asyncio.Event()
+        if self.__stopped.is_set():
+            self.__stoprequest.set()
+
+        try:
+            self.__loop.run_until_complete(self.serve())
+        finally:
+            self.__loop.close()
+        self.pinfo("AsyncRequestFrontend closing gracefully...")
+
+    async def serve(self):
+        context = zmq.asyncio.Context()
+        server = context.socket(zmq.ROUTER)
+        if self.__bind:
+            server.bind("tcp://*:%s" % self.__port)
+        else:
+            server.connect("tcp://%s:%s" % (self.__host, self.__port))
+
+        stop = asyncio.ensure_future(self.__stoprequest.wait())
+        replies = set()
+        try:
+            while True:
+                recv = asyncio.ensure_future(server.recv_multipart(copy=False))
+                done, _ = await asyncio.wait([recv, stop], return_when=asyncio.FIRST_COMPLETED)
+                if stop in done:
+                    recv.cancel()
+                    break
+
+                try:
+                    envelope, body = split_envelope(recv.result())
+                    start = time.perf_counter()
+                    record, fmt = self.__featurizer.parse(body[1])
+                    decode = time.perf_counter() - start
+                except UnsupportedFormat as ex:
+                    self.pinfo(ex)
+                    await server.send_multipart(envelope + reject_response(body))
+                    continue
+                except Exception as ex:
+                    self.pdebug(ex)
+                    continue
+
+                reply = asyncio.ensure_future(self.reply(server, envelope, record, fmt, decode))
+                replies.add(reply)
+                reply.add_done_callback(replies.discard)
+        finally:
+            stop.cancel()
+            for reply in replies:
+                reply.cancel()
+            server.close(linger=0)
+            context.term()
+
+    async def reply(self, server, envelope, record, fmt, decode):
+        loop = asyncio.get_event_loop()
+        response = loop.create_future()
+
+        def on_complete(slot):
+            # called from the agent thread
+            try:
+                loop.call_soon_threadsafe(self.__resolve, response, slot.response)
+            except RuntimeError:
+                pass # front end already stopped, nobody to reply to
+
+        self.__inflight += 1
+        self.pdebug("Request StreamID {} ({} in flight)".format(record['StreamID'], self.__inflight))
+        slot = self.__channel.submit(record, on_complete=on_complete, decode=decode)
+        try:
+            remaining = self.__channel.remaining(slot)
+            if remaining is None:
+                result = await response
+            else:
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(response), remaining)
+                except asyncio.TimeoutError:
+                    result = self.__channel.expire(slot)
+        finally:
+            self.__inflight -= 1
+
+        # give back response, routed back to the sender by its envelope
+        await server.send_multipart(envelope + encode_response(result, fmt))
+
+    @staticmethod
+    def __resolve(future, result):
+        if not future.done():
+            future.set_result(result)
+
+    def pdebug(self, msg):
+        self.__logger.debug(msg)
+
+    def pinfo(self, msg):
+        self.__logger.info(msg)
+
+    def stophandler(self):
+        self.__stopped.set()
+        if self.__loop is not None and self.__stoprequest is not None:
+            try:
+                self.__loop.call_soon_threadsafe(self.__stoprequest.set)
+            except RuntimeError:
+                pass # loop already closed
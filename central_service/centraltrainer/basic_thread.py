@@ -36,7 +36,7 @@ class BasicThread(threading.Thread):
                 resp = self._queue.get(True, 0.05)
                 return resp
             except queue.Empty:
-                self.pinfo("Queue is empty")
+                self.pdebug("Queue is empty")
                 continue
 
     def putrequest(self, data):
@@ -54,6 +54,9 @@ class BasicThread(threading.Thread):
     def pinfo(self, msg):
         self.__logger.info(msg)
 
+    def pwarning(self, msg):
+        self.__logger.warning(msg)
+
     def stophandler(self):
         self._stoprequest.set()
 
@@ -0,0 +1,100 @@
+'''
+    Round-trip time per decision between the request handler and the agent:
+    old Queue(1) + double Event rendezvous vs RequestChannel slots.
+    The "agent" answers immediately, so only the handoff cost is measured.
+
+    python -m centraltrainer.benchmark_channel [decisions]
+'''
+import threading, queue
+import multiprocessing as mp
+import logging
+import sys
+import time
+import numpy as np
+
+from utils.queue_ops import get_request, put_response
+from .channel import RequestChannel
+
+DECISIONS = 5000
+REQUEST = {'StreamID': 5, 'RequestPath': '/index.html'}
+RESPONSE = [b'5', b'1']
+
+
+def rendezvous_rtt(decisions):
+    ''' Previous protocol: RequestHandler.putrequest/getresponse and agent get_request/put_response '''
+    tqueue = queue.Queue(1)
+    stop = mp.Event()
+    logger = logging.getLogger('benchmark')
+
+    def agent():
+        while not stop.is_set():
+            request, ev1 = get_request(tqueue, logger, end_of_run=stop)
+            if request is None:
+                break
+            ev1.set()
+            ev2 = threading.Event()
+            put_response((RESPONSE, ev2), tqueue, logger)
+            ev2.wait()
+
+    thread = threading.Thread(target=agent)
+    thread.start()
+
+    rtts = np.zeros(decisions)
+    for i in range(decisions):
+        start = time.perf_counter()
+        ev1 = threading.Event()
+        tqueue.put((REQUEST, ev1), True, 0.05)
+        ev1.wait()
+        while True:
+            try:
+                response, ev2 = tqueue.get(True, 0.05)
+                break
+            except queue.Empty:
+                continue
+        ev2.set()
+        rtts[i] = time.perf_counter() - start
+
+    stop.set()
+    thread.join()
+    return rtts
+
+
+def channel_rtt(decisions):
+    channel = RequestChannel()
+    stop = mp.Event()
+
+    def agent():
+        while True:
+            batch = channel.get_batch(end_of_run=stop)
+            if len(batch) == 0:
+                break
+            for slot in batch:
+                slot.complete(RESPONSE)
+
+    thread = threading.Thread(target=agent)
+    thread.start()
+
+    rtts = np.zeros(decisions)
+    for i in range(decisions):
+        start = time.perf_counter()
+        slot = channel.submit(REQUEST)
+        slot.wait()
+        rtts[i] = time.perf_counter() - start
+
+    stop.set()
+    thread.join()
+    return rtts
+
+
+def main():
+    decisions = int(sys.argv[1]) if len(sys.argv) > 1 else DECISIONS
+
+    print("{:>12} {:>10} {:>10} {:>10} {:>10}".format("protocol", "p50(us)", "p99(us)", "max(us)", "mean(us)"))
+    for name, fn in [('rendezvous', rendezvous_rtt), ('channel', channel_rtt)]:
+        rtts = fn(decisions) * 1e6
+        print("{:>12} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            name, np.percentile(rtts, 50), np.percentile(rtts, 99), np.max(rtts), np.mean(rtts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import threading, queue
+import time
+
+
+# How often an idle agent wakes up to check for end of run / stop
+# (does not affect the latency of a decision: a request wakes the agent up immediately)
+IDLE_CHECK = 0.05
+
+
+class RequestSlot:
+    ''' A scheduling request and the place its response is delivered to.
+        The agent completes the slot directly, the request handler blocks on it:
+        a single handoff each way, no shared bidirectional queue
+    '''
+    __slots__ = ('request', 'response', 'arrival', 'decode', 'fallback', '_lock', '_done', '_on_complete')
+
+    def __init__(self, request, on_complete=None, decode=0.0):
+        self.request = request
+        self.response = None
+        self.arrival = time.time()
+        self.decode = decode # (s) spent decoding the request off the wire
+        self.fallback = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._on_complete = on_complete
+
+    def complete(self, response, fallback=False):
+        '''
+            First answer wins (agent or deadline fallback).
+            Returns False if the slot had already been answered
+        '''
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self.response = response
+            self.fallback = fallback
+            self._done.set()
+        # e.g. wake up an asyncio front end (runs in the thread of the agent)
+        if self._on_complete is not None:
+            self._on_complete(self)
+        return True
+
+    def cancel(self):
+        ''' Answers None (shutdown): wakes up the request handler waiting on the slot '''
+        return self.complete(None)
+
+    def age(self):
+        return time.time() - self.arrival
+
+    def wait(self, timeout=None):
+        ''' Returns True when the response is available '''
+        return self._done.wait(timeout)
+
+    def done(self):
+        return self._done.is_set()
+
+
+class RequestChannel:
+    ''' One way channel of RequestSlots: request handler(s) -> agent
+        With a `budget` (s), a request that has not been answered `budget` seconds
+        after its arrival is answered with `fallback(request)` instead
+    '''
+    def __init__(self, budget=None, fallback=None):
+        assert budget is None or fallback is not None
+        self._requests = queue.Queue()
+        self.budget = budget
+        self._fallback = fallback
+
+    def submit(self, request, on_complete=None, decode=0.0):
+        slot = RequestSlot(request, on_complete=on_complete, decode=decode)
+        self._requests.put(slot)
+        return slot
+
+    def get_batch(self, end_of_run=None, window=0.0, max_size=1, idle_check=IDLE_CHECK):
+        '''
+            Blocks until a first request arrives, then keeps collecting the requests
+            that arrive within `window` seconds (at most `max_size`) so that they can
+            share a single forward pass.
+            window == 0 only drains the requests that are already waiting.
+            idle_check None: no periodic wake-up, whoever sets end_of_run calls interrupt()
+            Returns a list of RequestSlot, empty on end of run
+        '''
+        while True:
+            if end_of_run is not None and end_of_run.is_set():
+                return []
+            try:
+                slot = self._requests.get(timeout=idle_check)
+                if slot is None:
+                    continue # interrupted
+                break
+            except queue.Empty:
+                continue
+
+        batch = [slot]
+        deadline = time.time() + window
+        while len(batch) < max_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    slot = self._requests.get(timeout=remaining)
+                else:
+                    slot = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if slot is None:
+                break # interrupted, end_of_run is checked on the next call
+            batch.append(slot)
+        return batch
+
+    def drain(self):
+        ''' Slots still queued (e.g. submitted after the end of run), removed from the channel '''
+        slots = []
+        while True:
+            try:
+                slot = self._requests.get_nowait()
+            except queue.Empty:
+                return slots
+            if slot is not None:
+                slots.append(slot)
+
+    def interrupt(self):
+        ''' Wakes up the agent blocked in get_batch (e.g. to check end_of_run) '''
+        self._requests.put(None)
+
+    def remaining(self, slot):
+        ''' Time left (s) before the slot expires, None without a budget '''
+        if self.budget is None:
+            return None
+        return max(self.budget - slot.age(), 0.0)
+
+    def expire(self, slot):
+        ''' Answer with the fallback policy, unless the agent was faster '''
+        slot.complete(self._fallback(slot.request), fallback=True)
+        return slot.response
+
+    def wait_response(self, slot):
+        '''
+            Blocks until the slot is answered (or expires), no periodic wake-up:
+            returns None if the slot is cancelled (RequestSlot.cancel) before that
+        '''
+        if slot.wait(self.remaining(slot)):
+            return slot.response
+        return self.expire(slot)
+
+    def empty(self):
+        return self._requests.empty()
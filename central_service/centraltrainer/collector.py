@@ -1,67 +1,292 @@
 import threading, queue
 import time
 import zmq
-import logging
 import sys
 import json
+from collections import deque
 
 
+from utils.stream_log import StreamLog
 from .basic_thread import BasicThread
 
+# Finished episodes remembered to drop their late messages (late = seconds, a few runs at most)
+FINISHED_EPISODES = 1024
+
+
+class EpisodeStream:
+    ''' Reorder buffer of the sequenced stream completions of one episode (MPQUIC client run) '''
+    def __init__(self, episode):
+        self.episode = episode
+        self.next_seq = 0       # next sequence number to be delivered
+        self.pending = {}       # out of order: sequence -> stream info
+        self.delivered = 0
+        self.gaps = 0           # times a message arrived ahead of a missing one
+        self.total = None       # known once the end-of-episode marker arrives
+        self.dropped = 0        # delivered, then dropped from the full queue
+        self.skipped = 0        # missing messages given up on, the reorder buffer being full
+
+    def push(self, seq, stream):
+        '''
+            Returns the stream infos that can be delivered in order
+        '''
+        if seq < self.next_seq or seq in self.pending:
+            return [] # duplicate
+        if seq > self.next_seq:
+            if len(self.pending) == 0:
+                self.gaps += 1
+            self.pending[seq] = stream
+            return []
+
+        self.pending[seq] = stream
+        return self.deliver()
+
+    def deliver(self):
+        ready = []
+        while self.next_seq in self.pending:
+            ready.append(self.pending.pop(self.next_seq))
+            self.next_seq += 1
+        self.delivered += len(ready)
+        return ready
+
+    def skip(self):
+        '''
+            Gives up on the missing messages before the first buffered one,
+            returns the stream infos that can then be delivered in order
+        '''
+        first = min(self.pending)
+        self.skipped += first - self.next_seq
+        self.next_seq = first
+        return self.deliver()
+
+    def complete(self):
+        return self.total is not None and self.next_seq >= self.total
+
+    def flush(self):
+        '''
+            Gives up on the missing messages, returns what is still buffered (in order)
+        '''
+        ready = [self.pending[seq] for seq in sorted(self.pending)]
+        self.delivered += len(ready)
+        self.pending.clear()
+        return ready
+
+    def summary(self):
+        total = self.total if self.total is not None else self.delivered
+        return {
+            'Episode': self.episode,
+            'Total': total,
+            'Delivered': self.delivered,
+            'Dropped': self.dropped,
+            'Missing': max(total - self.delivered, self.skipped) + self.dropped,
+            'Gaps': self.gaps,
+            'Skipped': self.skipped,
+            'EndOfEpisode': self.total is not None
+        }
+
+
 class Collector(BasicThread):
-    ''' RequestHandler will receive requests from MPQUIC
-        Pass on the requests to the CentralTrainer
-        Obtain a response (scheduling-related) and send it back
+    ''' Collector receives the stream completions of MPQUIC clients (via the middleware, PUSH/PULL)
+        Messages carry a sequence number per episode: they are reordered and put on the queue in order,
+        gaps are detected and an end-of-episode marker tells when an episode is complete
+        Memory is bounded: the queue should have a maxsize (the oldest completion is dropped when it is full),
+        the full history can be spilled to an append-only StreamLog on disk instead.
+        The reorder buffer of an episode holds at most `reorder_capacity` completions (default: the maxsize
+        of the queue), beyond that the missing ones are given up on and the episode is incomplete
     '''
-    def __init__(self, threadID: int, threadName: str, queue: queue.Queue, host:str="localhost", port:str="5555"):
+    def __init__(self, threadID: int, threadName: str, queue: queue.Queue, host:str="localhost", port:str="5555",
+                 stream_log: str=None, context: zmq.Context=None, reorder_capacity: int=None):
         super().__init__(threadID, threadName, queue)
+        self._reorder_capacity = queue.maxsize if reorder_capacity is None else reorder_capacity
+
+        # Stream times: full history on disk (optional)
+        self._stream_log = StreamLog(stream_log) if stream_log is not None else None
+        self._overflow = 0 # completions dropped from a full queue
 
-        # Stream times
-        self._all_streams = []
+        # Episodes (client runs) of the current run
+        self._episodes = {}
+        self._episodes_cv = threading.Condition()
+        # Episodes already handed over by finish_episodes: their late messages are dropped
+        self._finished = set()
+        self._finished_order = deque()
+        self._late = 0
 
         # ZMQ context
         self.__host = host
         self.__port = port
-        
-        self.__context = zmq.Context()
-        self._subscriber = self.__context.socket(zmq.SUB)
-        self._subscriber.connect("tcp://%s:%s" % (self.__host, self.__port))
-        self._subscriber.subscribe("")
+
+        # shared context: the socket is polled by an IOLoop instead of this thread
+        self.__own_context = context is None
+        self.__context = zmq.Context() if context is None else context
+        self._receiver = self.__context.socket(zmq.PULL)
+        self._receiver.connect("tcp://%s:%s" % (self.__host, self.__port))
 
         self.__poller = zmq.Poller()
-        self.__poller.register(self._subscriber, zmq.POLLIN)
+        self.__poller.register(self._receiver, zmq.POLLIN)
 
     def start(self):
         super().start()
 
     def run(self):
         self.pinfo("Run Collector Thread")
-        
+
         while not self._stoprequest.isSet():
             try:
                 # Poll for a reply => time is ms
                 if (self.__poller.poll(timeout=10)):
-                    # Receive request from middleware
-                    try:
-                        data = self._subscriber.recv_multipart(zmq.NOBLOCK)
-                    except Exception as ex:
-                        self.pdebug(ex)
-
-                    json_data = json.loads(data[1])
-                    self.pinfo(json_data)
-
-                    self._all_streams.append(json_data)
-                    
-                    # put stream info on the Queue (blocking operation)
-                    self.putrequest(json_data)
+                    self.receive()
             except Exception as ex:
                 self.pdebug(ex)
         self.close()
 
+    def receive(self):
+        ''' Handles one message of the socket (readable) '''
+        # Receive stream info from middleware
+        try:
+            data = self._receiver.recv_multipart(zmq.NOBLOCK)
+        except Exception as ex:
+            self.pdebug(ex)
+            return
+
+        json_data = json.loads(data[1])
+        self.pdebug(json_data)
+
+        # (queued under the lock, so that finish_episodes sees them)
+        with self._episodes_cv:
+            for stream in self.sequence(json_data):
+                if self._stream_log is not None:
+                    self._stream_log.append(stream)
+
+                # put stream info on the Queue (never blocks)
+                self.putrequest(stream)
+
+    @property
+    def socket(self):
+        return self._receiver
+
+    def putrequest(self, data):
+        '''
+            Bounded queue: drop the oldest completion rather than block or grow
+        '''
+        while True:
+            try:
+                self._queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.drop(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+    def drop(self, stream):
+        '''
+            A completion lost to the full queue: its episode is incomplete (Dropped / Missing
+            in its summary), the agent does not trust the join of its connection
+        '''
+        self._overflow += 1
+        with self._episodes_cv:
+            episode = self._episodes.get(stream.get('Episode'))
+            if episode is not None:
+                episode.dropped += 1
+                first = episode.dropped == 1
+            else:
+                first = self._overflow == 1 # unsequenced publisher
+        if first:
+            self.pwarning("Queue full ({} completions): dropping the completions of episode {}, starting with StreamID {}".format(
+                self._queue.maxsize, stream.get('Episode'), stream.get('StreamID')))
+
+    def memory_stats(self):
+        '''
+            Metric: completions held in memory and their approximate size (bytes)
+        '''
+        with self._queue.mutex:
+            queued = list(self._queue.queue)
+        with self._episodes_cv:
+            buffered = [stream for episode in self._episodes.values() for stream in episode.pending.values()]
+
+        size = 0
+        for stream in queued + buffered:
+            size += sys.getsizeof(stream) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in stream.items())
+        return {
+            'queued': len(queued),
+            'capacity': self._queue.maxsize,
+            'reorder_buffered': len(buffered),
+            'bytes': size,
+            'overflow': self._overflow,
+            'late': self._late,
+            'spilled': self._stream_log.records if self._stream_log is not None else 0
+        }
+
+    def sequence(self, message):
+        '''
+            Stream infos ready to be delivered (in order) after receiving `message`
+        '''
+        if 'Sequence' not in message:
+            return [message] # unsequenced publisher
+
+        with self._episodes_cv:
+            if message['Episode'] in self._finished:
+                # after the end-of-episode timeout, the run of this episode is gone
+                if not message.get('EndOfEpisode', False):
+                    self._late += 1
+                return []
+
+            episode = self._episodes.get(message['Episode'])
+            if episode is None:
+                episode = self._episodes[message['Episode']] = EpisodeStream(message['Episode'])
+
+            if message.get('EndOfEpisode', False):
+                episode.total = message['Total']
+                ready = []
+            else:
+                ready = episode.push(message['Sequence'], message)
+                if 0 < self._reorder_capacity < len(episode.pending):
+                    if episode.skipped == 0:
+                        self.pwarning("Reorder buffer full ({} completions): episode {} gives up on sequence {}".format(
+                            self._reorder_capacity, episode.episode, episode.next_seq))
+                    ready += episode.skip()
+                if len(episode.pending) > 0:
+                    self.pdebug("Episode {}: waiting for {}, {} buffered".format(
+                        episode.episode, episode.next_seq, len(episode.pending)))
+
+            if episode.complete():
+                self._episodes_cv.notify_all()
+            return ready
+
+    def finish_episodes(self, timeout=None):
+        '''
+            Called at the end of a run: waits (at most `timeout` s) until every episode
+            got its end-of-episode marker and all its messages, then puts the messages
+            still waiting for a missing one on the queue.
+            Returns one summary per episode (Total, Delivered, Missing, Gaps, Skipped, EndOfEpisode)
+            and forgets about them: their messages that arrive later are dropped (counted as late)
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        with self._episodes_cv:
+            while not all(episode.complete() for episode in self._episodes.values()):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._episodes_cv.wait(remaining)
+
+            summaries = []
+            for episode in self._episodes.values():
+                for stream in episode.flush():
+                    self.putrequest(stream)
+                summaries.append(episode.summary())
+                self._finished.add(episode.episode)
+                self._finished_order.append(episode.episode)
+            while len(self._finished_order) > FINISHED_EPISODES:
+                self._finished.discard(self._finished_order.popleft())
+            self._episodes.clear()
+        return summaries
+
     def close(self):
-        self._subscriber.close()
-        self.__context.term()
-        self.pinfo("RequestHandler closing gracefully...")
+        if self._stream_log is not None:
+            self._stream_log.close()
+        self._receiver.close()
+        if self.__own_context:
+            self.__context.term()
+        self.pinfo("Collector closing gracefully...")
 
 
 
@@ -70,4 +295,4 @@ if __name__ == "__main__":
 
     cthread = Collector(1, 'collector', queue=tqueue)
     cthread.start()
-    cthread.join()
\ No newline at end of file
+    cthread.join()
@@ -0,0 +1,200 @@
+import threading, queue
+import collections
+import time
+import zmq
+
+
+from utils.logger import config_logger
+from utils.wire_format import encode_response, reject_response, split_envelope, UnsupportedFormat
+from utils.featurizer import Featurizer
+from .channel import RequestChannel
+from .collector import Collector
+
+class IOLoop(threading.Thread):
+    ''' Single I/O thread of a worker, replaces RequestHandler (or AsyncRequestFrontend) + Collector:
+        one zmq context and one poller over
+            - the request socket (REP, or ROUTER for interleaved requests: middleware with -proxy)
+            - the stream completions socket (PULL, handled by the Collector)
+            - an internal wake-up socket: the agent completed a slot, or stophandler()
+            - optionally the end-of-run notification of the environment process (Connection)
+        The poll timeout is the earliest decision deadline of the requests in flight, so the
+        thread only wakes up on I/O, a response or an expiring request (no idle polling)
+    '''
+    def __init__(self, threadID: int, threadName: str, channel: RequestChannel, cqueue: queue.Queue,
+                 host:str="localhost", request_port:str="5555", publisher_port:str="5556",
+                 router:bool=False, stream_log: str=None, run_notify=None):
+        threading.Thread.__init__(self)
+
+        # Threading variables
+        self._threadID = threadID
+        self._threadName = threadName
+        self.__channel = channel
+        self.__stopped = False
+
+        self.__logger = config_logger(name='io_loop', filepath='./logs/io_loop.log')
+
+        # ZMQ context, shared by all the sockets of the worker
+        self.__context = zmq.Context()
+        self.__router = router
+        self._server = self.__context.socket(zmq.ROUTER if router else zmq.REP)
+        self._server.connect("tcp://%s:%s" % (host, request_port))
+
+        # not started: its socket is polled here
+        self.collector = Collector(threadID + 1, "collector-thread", queue=cqueue, host=host, port=publisher_port,
+                                   stream_log=stream_log, context=self.__context)
+
+        # wake-up: any thread -> io loop
+        endpoint = "inproc://io-loop-wakeup-{}".format(id(self))
+        self.__wakeup = self.__context.socket(zmq.PAIR)
+        self.__wakeup.bind(endpoint)
+        self.__waker = self.__context.socket(zmq.PAIR)
+        self.__waker.connect(endpoint)
+        self.__waker_lock = threading.Lock() # zmq sockets are not thread safe
+
+        # end of run: environment process -> io loop -> agent (channel.interrupt)
+        self.__run_notify = run_notify
+
+        self.__poller = zmq.Poller()
+        self.__poller.register(self._server, zmq.POLLIN)
+        self.__poller.register(self.collector.socket, zmq.POLLIN)
+        self.__poller.register(self.__wakeup, zmq.POLLIN)
+        if run_notify is not None:
+            self.__poller.register(run_notify, zmq.POLLIN)
+
+        # requests in flight: slot -> (envelope, wire format), answered slots waiting to be sent back
+        self.__inflight = collections.OrderedDict()
+        self.__answered = collections.deque()
+
+        self.__featurizer = Featurizer()
+
+    def run(self):
+        self.pinfo("Run I/O Loop")
+        while not self.__stopped:
+            try:
+                events = dict(self.__poller.poll(timeout=self.next_timeout()))
+
+                if self.__wakeup in events:
+                    self.drain_wakeup()
+
+                if self.__run_notify is not None and self.__run_notify.fileno() in events:
+                    self.__run_notify.recv()
+                    self.pinfo("End of run")
+                    self.__channel.interrupt()
+
+                if self.collector.socket in events:
+                    self.collector.receive()
+
+                if self._server in events:
+                    self.receive()
+
+                self.expire()
+                self.reply()
+            except Exception as ex:
+                self.pdebug(ex)
+        self.close()
+
+    def receive(self):
+        ''' Hands a scheduling request over to the agent '''
+        try:
+            frames = self._server.recv_multipart(zmq.NOBLOCK, copy=False)
+        except zmq.Again:
+            return
+
+        if self.__router:
+            envelope, body = split_envelope(frames)
+        else:
+            envelope, body = [], frames
+
+        # binary or JSON, answered in the same format
+        start = time.perf_counter()
+        try:
+            record, fmt = self.__featurizer.parse(body[1])
+        except UnsupportedFormat as ex:
+            self.pinfo(ex)
+            self._server.send_multipart(envelope + reject_response(body))
+            return
+        decode = time.perf_counter() - start
+        self.pdebug(record)
+
+        slot = self.__channel.submit(record, on_complete=self.on_complete, decode=decode)
+        self.__inflight[slot] = (envelope, fmt)
+        if not self.__router:
+            # REP: one request at a time, the next one is read once this one is answered
+            self.__poller.modify(self._server, 0)
+
+    def on_complete(self, slot):
+        ''' Called by whoever answers the slot (agent thread, or expire in this thread) '''
+        self.__answered.append(slot)
+        if threading.current_thread() is not self:
+            self.wakeup()
+
+    def reply(self):
+        while len(self.__answered) > 0:
+            slot = self.__answered.popleft()
+            inflight = self.__inflight.pop(slot, None)
+            if inflight is None:
+                continue
+
+            envelope, fmt = inflight
+            self.pdebug(slot.response)
+            # give back response (routed back to the sender by its envelope)
+            self._server.send_multipart(envelope + encode_response(slot.response, fmt))
+            if not self.__router:
+                self.__poller.modify(self._server, zmq.POLLIN)
+
+    def expire(self):
+        ''' Requests past their decision budget are answered by the fallback policy '''
+        for slot in list(self.__inflight):
+            remaining = self.__channel.remaining(slot)
+            if remaining is not None and remaining <= 0.0:
+                self.__channel.expire(slot)
+
+    def next_timeout(self):
+        ''' Poll timeout (ms): until the earliest decision deadline, None (block) without one '''
+        deadlines = [self.__channel.remaining(slot) for slot in self.__inflight]
+        deadlines = [remaining for remaining in deadlines if remaining is not None]
+        if len(deadlines) == 0:
+            return None
+        return max(min(deadlines) * 1000.0, 0.0)
+
+    def wakeup(self):
+        with self.__waker_lock:
+            try:
+                self.__waker.send(b'', zmq.NOBLOCK)
+            except zmq.ZMQError:
+                pass # a wake-up is already pending, or the loop is closed
+
+    def drain_wakeup(self):
+        while True:
+            try:
+                self.__wakeup.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
+    def pdebug(self, msg):
+        self.__logger.debug(msg)
+
+    def pinfo(self, msg):
+        self.__logger.info(msg)
+
+    def stophandler(self):
+        self.__stopped = True
+        self.wakeup()
+
+    def close(self):
+        self.collector.close()
+        self._server.close(linger=0)
+        with self.__waker_lock:
+            self.__waker.close()
+        self.__wakeup.close()
+        self.__context.term()
+        self.pinfo("IOLoop closing gracefully...")
+
+
+
+if __name__ == "__main__":
+    channel = RequestChannel()
+
+    io_loop = IOLoop(1, 'test-io-loop', channel=channel, cqueue=queue.Queue())
+    io_loop.start()
+    io_loop.join()
@@ -1,26 +1,27 @@
-import threading, queue
+import threading
 import time
 import zmq
-import logging
-import sys
-import json
 
 
 from utils.logger import config_logger
+from utils.wire_format import encode_response, reject_response, UnsupportedFormat
+from utils.featurizer import Featurizer
+from .channel import RequestChannel
 
 class RequestHandler(threading.Thread):
     ''' RequestHandler will receive requests from MPQUIC
         Pass on the requests to the agent
         Obtain a response (scheduling-related) and send it back
     '''
-    def __init__(self, threadID: int, threadName: str, tqueue: queue.Queue, host:str="localhost", port:str="5555"):
+    def __init__(self, threadID: int, threadName: str, channel: RequestChannel, host:str="localhost", port:str="5555"):
         threading.Thread.__init__(self)
 
         # Threading variables
         self._threadID = threadID
         self._threadName = threadName
-        self.__tqueue = tqueue
+        self.__channel = channel
         self.__stoprequest = threading.Event()
+        self.__slot = None # waiting for the agent, cancelled by stophandler
 
         self.__logger = config_logger(name='request_handler', filepath='./logs/rhandler.log')
 
@@ -35,6 +36,8 @@ class RequestHandler(threading.Thread):
         self.__poller = zmq.Poller()
         self.__poller.register(self._server, zmq.POLLIN)
 
+        self.__featurizer = Featurizer()
+
     def run(self):
         self.pinfo("Run Request Handler")
         while not self.__stoprequest.isSet():
@@ -43,48 +46,38 @@ class RequestHandler(threading.Thread):
                 if (self.__poller.poll(timeout=50)):
                     # Receive request from middleware
                     try:
-                        data = self._server.recv_multipart(zmq.NOBLOCK)
+                        data = self._server.recv_multipart(zmq.NOBLOCK, copy=False)
                     except Exception as ex:
                         self.pdebug(ex)
 
-                    json_data = json.loads(data[1])
-                    self.pinfo(json_data)
-                    
-                    # put request on the Queue (blocking operation)
-                    ev1 = threading.Event()
-                    self.putrequest(json_data, ev1)
-                    ev1.wait() # blocks until `consumer` (i.e. agent) receives request
+                    # binary or JSON, answered in the same format
+                    start = time.perf_counter()
+                    try:
+                        record, fmt = self.__featurizer.parse(data[1])
+                    except UnsupportedFormat as ex:
+                        self.pinfo(ex)
+                        self._server.send_multipart(reject_response(data))
+                        continue
+                    decode = time.perf_counter() - start
+                    self.pdebug(record)
                     
-                    response, ev2 = self.getresponse()
-                    ev2.set() # lets `producer` (i.e. agent) know the response has been received
-
-                    self.pinfo(response)
-                    self.pinfo("Got my response from agent -- forwarding to quic")
+                    # hand the request over to the agent and block until it completes the slot
+                    slot = self.__slot = self.__channel.submit(record, decode=decode)
+                    if self.__stoprequest.is_set():
+                        slot.cancel() # stophandler may have missed it
+                    response = self.__channel.wait_response(slot)
+                    self.__slot = None
+                    if response is None:
+                        break
+
+                    self.pdebug(response)
                     
                     # give back response
-                    self._server.send_multipart(response)
+                    self._server.send_multipart(encode_response(response, fmt))
             except Exception as ex:
                 self.pdebug(ex)
         self.close()
 
-    def getresponse(self):
-        while not self.__stoprequest.isSet():
-            try:
-                resp, flag = self.__tqueue.get(True, 0.05)
-                return resp, flag
-            except queue.Empty:
-                self.pinfo("Queue is empty")
-                continue
-
-    def putrequest(self, data, flag):
-        while not self.__stoprequest.isSet():
-            try:
-                self.__tqueue.put((data, flag), True, 0.05)
-                break
-            except Exception as ex:
-                self.pinfo("Cannot put item into Queue")
-                self.pdebug(ex)
-
     def pdebug(self, msg):
         self.__logger.debug(msg)
 
@@ -93,6 +86,9 @@ class RequestHandler(threading.Thread):
 
     def stophandler(self):
         self.__stoprequest.set()
+        slot = self.__slot
+        if slot is not None:
+            slot.cancel()
 
     def close(self):
         self._server.close()
@@ -102,8 +98,8 @@ class RequestHandler(threading.Thread):
 
 
 if __name__ == "__main__":
-    tqueue = queue.Queue()
+    channel = RequestChannel()
 
-    rh = RequestHandler(1, 'test-requesthandler', tqueue=tqueue)
+    rh = RequestHandler(1, 'test-requesthandler', channel=channel)
     rh.start()
     rh.join()
\ No newline at end of file
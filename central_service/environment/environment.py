@@ -8,6 +8,7 @@ import os
 import random
 
 from .experiences.quic_web_browse import launchTests
+from .experiences.core.core import sshOptions
 from utils.logger import config_logger
 
 
@@ -19,22 +20,24 @@ class Session:
         This class loads and parses one by one all configurations
         for our environment!
         It is utilized by both agent and environment
+        With several workers, worker i only runs every num_workers-th pair
     '''
-    def __init__(self, topologies='./environment/topos.json', dgraphs='./environment/train_graphs.json'):
+    def __init__(self, topologies='./environment/topos.json', dgraphs='./environment/train_graphs.json', worker=0, num_workers=1, seed=None):
         self._index = 0
 
         self._topologies, self._len_topo = self.loadTopologies(topologies)
         self._graphs, self._len_graph  = self.loadDependencyGraphs(dgraphs)
 
-        self._pairs = self.generatePairs()
+        self._pairs = self.generatePairs(seed)[worker::num_workers]
 
-    def generatePairs(self):
+    def generatePairs(self, seed=None):
         tuple_list = []
         for i in range(self._len_topo):
             for j in range(self._len_graph):
                 tuple_list.append((i, j))
 
-        return random.sample(tuple_list, len(tuple_list))
+        # workers share the seed -> same shuffle, their shares do not overlap
+        return random.Random(seed).sample(tuple_list, len(tuple_list))
 
     def loadTopologies(self, file):
         topos = []
@@ -58,6 +61,21 @@ class Session:
             return -1
         return self._index 
 
+    def nextPair(self):
+        ''' (topology, graph) of the current run, then moves to the next one. None once all have been run '''
+        if self._index >= len(self._pairs):
+            return None
+        pair = self.getCurrentTopo(), self.getCurrentGraph()
+        self._index += 1
+        return pair
+
+    def rewind(self):
+        ''' Start over from the first pair (same order) '''
+        self._index = 0
+
+    def __len__(self):
+        return len(self._pairs)
+
     def getCurrentTopo(self):
         topo = self._topologies[self._pairs[self._index][0]]
         return topo
@@ -71,15 +89,26 @@ class Session:
         return int(topo['paths'][0]['bandwidth']), int(topo['paths'][1]['bandwidth'])
 
 
+def middlewareConfig(worker, proxy=False):
+    ''' Endpoints of the middleware of a worker (request / publisher ports of WORKERS entries) '''
+    return {
+        'server': 'ipc:///tmp/zmq',
+        'client': 'tcp://*:{}'.format(worker['request_port']),
+        'publisher': 'tcp://*:{}'.format(worker['publisher_port']),
+        'subscriber': 'ipc:///tmp/pubsub',
+        'proxy': proxy
+    }
+
+
 class Environment:
-    def __init__(self, bdw_paths, logger, mconfig, remoteHostname="mininet@192.168.122.157", remotePort="22"):
+    def __init__(self, bdw_paths, logger, mconfig, remoteHostname="mininet@192.168.122.157", remotePort="22", worker=0, num_workers=1, seed=None):
         self._totalRuns = 0
         self._logger = logger
 
         # Session object
-        self.session = Session()
-        self.curr_topo = Session().getCurrentTopo()
-        self.curr_graph = Session().getCurrentGraph()
+        self.session = Session(worker=worker, num_workers=num_workers, seed=seed)
+        self.curr_topo = self.session.getCurrentTopo()
+        self.curr_graph = self.session.getCurrentGraph()
         self.bdw_paths = bdw_paths
 
         # Spawn Middleware
@@ -89,11 +118,15 @@ class Environment:
         self.spawn_middleware()
 
     def construct_cmd(self, config):
-        return "{} -sv {} -cl {} -pub {} -sub {}".format(MIDDLEWARE_BIN_REMOTE_PATH,
+        cmd = "{} -sv {} -cl {} -pub {} -sub {}".format(MIDDLEWARE_BIN_REMOTE_PATH,
                                                     config['server'], 
                                                     config['client'], 
                                                     config['publisher'], 
                                                     config['subscriber'])
+        # ROUTER/DEALER forwarding of interleaved requests (for the AsyncRequestFrontend)
+        if config.get('proxy', False):
+            cmd += " -proxy"
+        return cmd
 
     def spawn_middleware(self):
         ''' This method might seem more like a restart.
@@ -102,7 +135,7 @@ class Environment:
         '''
         self.stop_middleware()
         time.sleep(0.5)
-        ssh_cmd = ["ssh", "-p", self._remotePort, self._remoteHostname, self._spawn_cmd]
+        ssh_cmd = ["ssh", "-p", self._remotePort] + sshOptions() + [self._remoteHostname, self._spawn_cmd]
         subprocess.Popen(ssh_cmd, 
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE, 
@@ -110,7 +143,7 @@ class Environment:
 
     def stop_middleware(self):
         kill_cmd = "killall {}".format(MIDDLEWARE_BIN_REMOTE_PATH)
-        ssh_cmd = ["ssh", "-p", self._remotePort, self._remoteHostname, kill_cmd]
+        ssh_cmd = ["ssh", "-p", self._remotePort] + sshOptions() + [self._remoteHostname, kill_cmd]
         subprocess.Popen(ssh_cmd,
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE,
@@ -143,7 +176,7 @@ class Environment:
         message = "Run Number: {}, Graph: {}" 
         self._logger.info(message.format(self._totalRuns, self.curr_graph))
 
-        launchTests(self.curr_topo, self.curr_graph)
+        launchTests(self.curr_topo, self.curr_graph, self._remoteHostname, self._remotePort)
 
     def close(self):
         self.stop_middleware()
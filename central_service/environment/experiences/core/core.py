@@ -14,8 +14,31 @@ import threading
 # THREAD_TIMEOUT = 7200
 THREAD_TIMEOUT = 45
 
+""" Reuse one SSH connection per remote (multiplexing) for all the ssh / scp of the experiments """
+# each run issues a dozen of them (put topo/xp, sysctl, mpPerf, post processing),
+# without it each one pays a full SSH handshake.
+# Opt-in: needs a writable ~/.ssh and leaves the master connections up for ControlPersist
+SSH_MULTIPLEXING = False
+SSH_CONTROL_OPTIONS = ["-o", "ControlMaster=auto", "-o", "ControlPath=~/.ssh/cm-%r@%h:%p", "-o", "ControlPersist=10m"]
+
+""" Clean mininet (sudo mn -c) before every experiment """
+# False: only before the first experiment on a remote and after one that failed,
+# minitopo tears its topology down at the end of a successful experiment
+CLEAN_EVERY_RUN = False
+
+""" Keep the mininet topology up between experiments (minitopo mpPerf.py -p) """
+# only the tc parameters of the links are reapplied for each new topology,
+# a clean (after a failure) also stops the process holding the topology
+PERSISTENT_TOPOLOGY = False
+
+# remotes ("hostname:port") left clean by their last experiment, kept across ExperienceLaunchers
+_cleanRemotes = set()
+
 
 """ Some useful functions """
+def sshOptions():
+    """ Options of every ssh / scp command (SSH_CONTROL_OPTIONS with SSH_MULTIPLEXING) """
+    return SSH_CONTROL_OPTIONS if SSH_MULTIPLEXING else []
 
 
 def check_directory_exists(directory):
@@ -134,24 +157,33 @@ class ExperienceLauncher(object):
             thread.start()
             self.threads.append(thread)
 
+    def sshCmd(self, num):
+        return ["ssh", "-p", self.remotePorts[num]] + sshOptions() + [self.remoteHostnames[num]]
+
+    def scpCmd(self, num):
+        return ["scp", "-P", self.remotePorts[num]] + sshOptions()
+
+    def remoteKey(self, num):
+        return self.remoteHostnames[num] + ":" + self.remotePorts[num]
+
     def putOnRemote(self, num, filename, path):
-        cmd = "scp -P " + self.remotePorts[num] + " " + filename + " " + self.remoteHostnames[num] + ":" + path
-        if subprocess.call(cmd.split()) != 0:
+        cmd = self.scpCmd(num) + [filename, self.remoteHostnames[num] + ":" + path]
+        if subprocess.call(cmd) != 0:
             raise Exception("File " + filename + " could not be put on remote server at path " + path)
 
     def pullHereFromRemote(self, num, filename, path, newFilename):
-        cmd = "scp -P " + self.remotePorts[num] + " " + self.remoteHostnames[num] + ":" + path + "/" + filename + " " + newFilename
-        if subprocess.call(cmd.split()) != 0:
+        cmd = self.scpCmd(num) + [self.remoteHostnames[num] + ":" + path + "/" + filename, newFilename]
+        if subprocess.call(cmd) != 0:
             raise Exception("File " + filename + " could not be pull from remote server at path " + path)
 
     def changeMptcpEnabled(self, num, value):
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num], "sudo sysctl net.mptcp.mptcp_enabled=" + str(value)]
+        cmd = self.sshCmd(num) + ["sudo sysctl net.mptcp.mptcp_enabled=" + str(value)]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of mptcp_enabled at " + str(value))
 
     def changeOpenBup(self, num, value):
         """ Also disable the oracle if openBup is enabled """
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num],
+        cmd = self.sshCmd(num) + [
                "echo " + str(value).split('-')[0] + " | sudo tee /sys/module/mptcp_fullmesh/parameters/open_bup"]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of open_bup at " + str(value))
@@ -179,27 +211,27 @@ class ExperienceLauncher(object):
         else:
             sloss_threshold, sretrans_threshold, rto_ms_threshold, idle_periods_threshold, timer_period_ms = "0", "0", "0", "0", "500"
 
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num],
+        cmd = self.sshCmd(num) + [
                "echo " + sloss_threshold + " | sudo tee /sys/module/mptcp_oracle/parameters/sloss_threshold"]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of sloss_threshold at " + sloss_threshold)
 
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num],
+        cmd = self.sshCmd(num) + [
                "echo " + sretrans_threshold + " | sudo tee /sys/module/mptcp_oracle/parameters/sretrans_threshold"]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of sretrans_threshold at " + sretrans_threshold)
 
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num],
+        cmd = self.sshCmd(num) + [
                "echo " + rto_ms_threshold + " | sudo tee /sys/module/mptcp_oracle/parameters/rto_ms_threshold"]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of rto_ms_threshold at " + rto_ms_threshold)
 
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num],
+        cmd = self.sshCmd(num) + [
                "echo " + idle_periods_threshold + " | sudo tee /sys/module/mptcp_oracle/parameters/idle_periods_threshold"]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of idle_periods_threshold at " + idle_periods_threshold)
 
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num],
+        cmd = self.sshCmd(num) + [
                "echo " + timer_period_ms + " | sudo tee /sys/module/mptcp_oracle/parameters/timer_period_ms"]
         if subprocess.call(cmd) != 0:
             raise Exception("Cannot change value of timer_period_ms at " + timer_period_ms)
@@ -218,7 +250,12 @@ class ExperienceLauncher(object):
             self.pullHereFromRemote(num, remoteFilename, remotePath, os.path.join(kwargs["workingDir"], localFilename))
 
     def cleanMininet(self, num):
-        cmd = ["ssh", "-p", self.remotePorts[num], self.remoteHostnames[num], "timeout 20 sudo mn -c"]
+        clean = "timeout 20 sudo mn -c"
+        if PERSISTENT_TOPOLOGY:
+            # SIGTERM: the server stops its topology on exit, wait for it before mn -c
+            clean = "sudo pkill -f 'mpPerf.py [-]s'; " \
+                    "timeout 20 sh -c 'while pgrep -f \"mpPerf.py [-]s\" > /dev/null; do sleep 0.2; done'; " + clean
+        cmd = self.sshCmd(num) + [clean]
         devnull = open(os.devnull, 'w')
         if subprocess.call(cmd, stdout=devnull, stderr=devnull) != 0:
             # raise Exception("Cannot clean mininet for thread " + str(num))
@@ -241,11 +278,19 @@ class ExperienceLauncher(object):
         if "openBup" in kwargs:
             self.changeOpenBup(num, kwargs["openBup"])
 
-        self.cleanMininet(num)
-        cmd = 'ssh -p ' + self.remotePorts[num] + ' ' + self.remoteHostnames[num] + \
+        if CLEAN_EVERY_RUN or self.remoteKey(num) not in _cleanRemotes:
+            self.cleanMininet(num)
+        cmd = ' '.join(self.sshCmd(num)) + \
               ' "cd ' + kwargs["tmpfs"] + '; sudo ~/git/minitopo/src/mpPerf.py -x ' + os.path.basename(kwargs["xpAbsPath"]) + ' -t ' + \
-              os.path.basename(kwargs["topoAbsPath"]) + '"'
-        MinitopoCommand(num, self.remoteHostnames[num], self.remotePorts[num], cmd, kwargs["workingDir"], self.testOkList).run(timeout=THREAD_TIMEOUT)
+              os.path.basename(kwargs["topoAbsPath"]) + (' -p' if PERSISTENT_TOPOLOGY else '') + '"'
+        command = MinitopoCommand(num, self.remoteHostnames[num], self.remotePorts[num], cmd, kwargs["workingDir"], self.testOkList)
+        command.run(timeout=THREAD_TIMEOUT)
+
+        # a failed experiment may leave its topology behind: clean before the next one
+        if self.testOkList[num] and command.process is not None and command.process.returncode == 0:
+            _cleanRemotes.add(self.remoteKey(num))
+        else:
+            _cleanRemotes.discard(self.remoteKey(num))
 
     def threadLaunchXp(self, num, **kwargs):
         global testOkList
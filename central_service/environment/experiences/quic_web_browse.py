@@ -44,6 +44,7 @@ def getPostProcessingList(**kwargs):
     else:
         toReturn.append(("quic_client.log", "quic_client.log"))
         toReturn.append(("quic_server.log", "quic_server.log"))
+        toReturn.append(("quic_build.log", "quic_build.log"))
 
     toReturn.append(("netstat_client_before", "netstat_client_before"))
     toReturn.append(("netstat_server_before", "netstat_server_before"))
@@ -53,8 +54,9 @@ def getPostProcessingList(**kwargs):
     return toReturn
 
 
-def quicTests(topos=DEFAULT_TOPOLOGY, graph="www.google.com_", protocol="mptcp", tmpfs="/mnt/tmpfs"): #work path
-    experienceLauncher = ExperienceLauncher(REMOTE_SERVER_RUNNER_HOSTNAME, REMOTE_SERVER_RUNNER_PORT)
+def quicTests(topos=DEFAULT_TOPOLOGY, graph="www.google.com_", protocol="mptcp", tmpfs="/mnt/tmpfs",
+              remoteHostnames=REMOTE_SERVER_RUNNER_HOSTNAME, remotePorts=REMOTE_SERVER_RUNNER_PORT): #work path
+    experienceLauncher = ExperienceLauncher(remoteHostnames, remotePorts)
 
     def testsXp(**kwargs):
         def testsMultipath(**kwargs):
@@ -135,7 +137,7 @@ def generateExperimentalDesignRandomTopos(nbMptcpTopos=10, pathsPerTopo=2, bandw
     return mptcpTopos
 
 
-def launchTests(topology, graph):
+def launchTests(topology, graph, remoteHostname=REMOTE_SERVER_RUNNER_HOSTNAME[0], remotePort=REMOTE_SERVER_RUNNER_PORT[0]):
     # topology = [
     #     {'netem': [(0, 0, 'loss 1.56%'), (1, 0, 'loss 1.19%')], 
     #     'paths': [
@@ -143,4 +145,4 @@ def launchTests(topology, graph):
     #         {'bandwidth': '45', 'delay': '13.3', 'queuingDelay': '0.063'}
     #     ]}
     # ]
-    quicTests(topology, graph)
\ No newline at end of file
+    quicTests(topology, graph, remoteHostnames=[remoteHostname], remotePorts=[remotePort])
\ No newline at end of file
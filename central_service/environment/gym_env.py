@@ -0,0 +1,344 @@
+'''
+    Gym-style interface of the environment: one step = one scheduling decision.
+        env = makeSimulatorEnv(seed=42)        # or makeMininetEnv(WORKERS[0])
+        state = env.reset()                    # (S_INFO, S_LEN), first request of a page load
+        state, reward, done, info = env.step(action)
+
+    The reward of a decision is only known once its stream completes: a step returns
+    the rewards of the decisions whose streams completed since the previous step
+    (request_rewards), the ones still in flight at the end are credited to the last step.
+    info['episode'] of the last step is the episode of the page load, as the learner gets it.
+
+    The page load itself runs in a backend: SimulatorBackend (PageLoad, in process) or
+    MininetBackend (Environment + IOLoop, the middleware and MPQUIC answer the requests).
+    SubprocVectorEnv steps several of them at once, one subprocess each.
+'''
+import functools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import numpy as np
+
+from .environment import Environment, Session, middlewareConfig
+from .simulator import PageLoad, loadObjects, DEPENDENCY_GRAPHS_DIR
+from .vector_env import requestRecord, makeEpisode
+from centraltrainer.channel import RequestChannel
+from centraltrainer.io_loop import IOLoop
+from utils.featurizer import REQUEST_RECORD, request_features, request_rewards, lowestRTTPathID
+from utils.state_history import StateHistory
+from utils.logger import config_logger
+
+PATHS = [1, 3] # path ids of the actions
+
+
+class SimulatorBackend:
+    ''' Page loads of the simulator, over the pairs of a Session (starts over once they are all run) '''
+    def __init__(self, session, seed=None, graphs_dir=DEPENDENCY_GRAPHS_DIR):
+        self.session = session
+        self._graphs_dir = graphs_dir
+        self._rng = np.random.RandomState(seed)
+        self._objects = {}
+        self._sim = None
+        self._seen = 0
+        self.bdw = (1, 1)
+        self.conn_id = 0
+
+    def start(self):
+        ''' First request of the next page load '''
+        # at most one full pass over the session (e.g. empty graphs never issue a request)
+        for _ in range(len(self.session)):
+            pair = self.session.nextPair()
+            if pair is None:
+                self.session.rewind()
+                pair = self.session.nextPair()
+
+            topo, graph = pair
+            if graph not in self._objects:
+                self._objects[graph] = loadObjects(os.path.join(self._graphs_dir, graph, graph + '.json'))
+            self.conn_id = int(self._rng.randint(1, 2**62))
+            self._sim = PageLoad(topo, self._objects[graph], self._rng, connection_id=self.conn_id)
+            self._seen = 0
+            self.bdw = (int(topo['paths'][0]['bandwidth']), int(topo['paths'][1]['bandwidth']))
+
+            record = self.next()
+            if record is not None:
+                return record
+        raise RuntimeError("No page load of the session issues a request ({} pairs)".format(len(self.session)))
+
+    def next(self):
+        ''' Next request (REQUEST_RECORD values), None at the end of the page load '''
+        request = self._sim.request()
+        return None if request is None else requestRecord(request)
+
+    def send(self, path_id):
+        ''' Answers the current request, returns the path actually used '''
+        self._sim.assign(path_id)
+        return path_id
+
+    def poll(self):
+        ''' Stream completions since the last call '''
+        completions = self._sim.completions[self._seen:]
+        self._seen = len(self._sim.completions)
+        return completions
+
+    def finish(self):
+        return self.poll()
+
+    def close(self):
+        pass
+
+
+class MininetBackend:
+    '''
+        Page loads in mininet: Environment.run() in a thread, the scheduling requests and
+        stream completions through an IOLoop. A request not answered within `budget` (s)
+        is answered by the lowest smoothed-RTT path (the client does not wait forever)
+    '''
+    def __init__(self, env, host='localhost', request_port='5555', publisher_port='5556', router=False,
+                 budget=None, end_of_episode_timeout=1.0):
+        self.env = env
+        self.channel = RequestChannel(budget=budget, fallback=self.fallback if budget is not None else None)
+        self.cqueue = queue.Queue()
+        self.io_loop = IOLoop(1, "gym-io-loop", channel=self.channel, cqueue=self.cqueue, host=host,
+                              request_port=request_port, publisher_port=publisher_port, router=router)
+        self.io_loop.start()
+        self._end_of_episode_timeout = end_of_episode_timeout
+        self._run = None
+        self._run_done = threading.Event()
+        self._slot = None
+        self.conn_id = 0
+
+    @staticmethod
+    def fallback(record):
+        return [str(record['StreamID']).encode('utf-8'), str(lowestRTTPathID(record)).encode('utf-8')]
+
+    @property
+    def bdw(self):
+        return (self.env.bdw_paths[0], self.env.bdw_paths[1])
+
+    def start(self):
+        # the last pair of the session is run too, then the next page load starts over
+        if self.env.updateEnvironment() == -1:
+            self.env.session.rewind()
+
+        self._run_done.clear()
+        self._run = threading.Thread(target=self.runPageLoad, daemon=True)
+        self._run.start()
+        return self.next()
+
+    def runPageLoad(self):
+        try:
+            self.env.run()
+        finally:
+            self._run_done.set()
+            self.channel.interrupt()
+
+    def next(self):
+        batch = self.channel.get_batch(end_of_run=self._run_done, idle_check=None)
+        if len(batch) == 0:
+            self._run.join()
+            # requests queued once the run was over: answered now, not left to the next page load
+            for slot in self.channel.drain():
+                slot.complete(self.fallback(slot.request), fallback=True)
+            return None
+        self._slot = batch[0]
+        self.conn_id = int(self._slot.request['ConnectionID'])
+        return self._slot.request
+
+    def send(self, path_id):
+        slot, self._slot = self._slot, None
+        if slot.complete([str(slot.request['StreamID']).encode('utf-8'), str(path_id).encode('utf-8')]):
+            return path_id
+        return int(slot.response[1]) # too late, answered by the fallback
+
+    def poll(self):
+        completions = []
+        while True:
+            try:
+                completions.append(self.cqueue.get_nowait())
+            except queue.Empty:
+                return completions
+
+    def finish(self):
+        ''' Waits for the end-of-episode markers, then the remaining completions '''
+        self.io_loop.collector.finish_episodes(timeout=self._end_of_episode_timeout)
+        return self.poll()
+
+    def close(self):
+        self.io_loop.stophandler()
+        self.io_loop.join()
+        self.env.close()
+
+
+class PageLoadEnv:
+    ''' reset() / step(action) over a backend, see the module docstring '''
+    def __init__(self, backend, s_info=6, s_len=8, paths=PATHS, worker=0):
+        self.backend = backend
+        self.paths = list(paths)
+        self.num_actions = len(self.paths)
+        self.state_shape = (s_info, s_len)
+        self.worker = worker
+
+        self._history = StateHistory(s_info, s_len)
+        self._record = np.zeros(1, dtype=REQUEST_RECORD)
+        self._features = np.empty((1, s_info))
+        # RequestPath -> steps of the page load not rewarded yet, in order. Completions are
+        # matched as joinStatesStreams does: the server side StreamID (MininetBackend) is not the
+        # one of the request, the same request-path requested several times is matched in order
+        self._steps = {}
+        self._clear()
+
+    def _clear(self):
+        self.list_states, self.f_batch, self.actions = [], [], []
+        self._completions = []
+        self._steps.clear()
+
+    def _observe(self, record):
+        self._record[0] = record
+        request_features(self._record, self.backend.bdw, out=self._features)
+        self._history.push(self._features[0])
+        return self._history.window().copy()
+
+    def _rewards(self, completions):
+        ''' Sum of the rewards of the decisions of these completions '''
+        steps, times = [], []
+        for stream in completions:
+            pending = self._steps.get(stream['Path'])
+            if not pending:
+                continue
+            # same StreamID if any, otherwise the first request of this path
+            step = next((step for step in pending
+                         if self.list_states[step]['StreamID'] == stream['StreamID']), pending[0])
+            pending.remove(step)
+            steps.append(step)
+            times.append(stream['CompletionTime'])
+        if len(steps) == 0:
+            return 0.0
+        records = np.array([self.list_states[step] for step in steps], dtype=REQUEST_RECORD)
+        a_batch = np.eye(self.num_actions)[[self.actions[step] for step in steps]]
+        return float(np.sum(request_rewards(records, a_batch, times, self.backend.bdw)))
+
+    def reset(self):
+        self._history.reset()
+        self._clear()
+        return self._observe(self.backend.start())
+
+    def step(self, action):
+        path_id = self.backend.send(self.paths[int(action)])
+        action = self.paths.index(path_id) if path_id in self.paths else int(action)
+
+        self._steps.setdefault(self._record[0]['RequestPath'], []).append(len(self.list_states))
+        self.list_states.append(self._record[0].copy())
+        self.f_batch.append(self._features[0].copy())
+        self.actions.append(action)
+
+        record = self.backend.next()
+        done = record is None
+        completions = self.backend.finish() if done else self.backend.poll()
+        self._completions.extend(completions)
+        reward = self._rewards(completions)
+
+        info = {'path': path_id}
+        if not done:
+            return self._observe(record), reward, False, info
+
+        info['episode'] = makeEpisode(self.list_states, self.f_batch, self.actions, self._completions,
+                                      self.backend.bdw, a_dim=self.num_actions, worker=self.worker,
+                                      conn_id=self.backend.conn_id)
+        return self._history.window().copy(), reward, True, info
+
+    def close(self):
+        self.backend.close()
+
+
+def makeSimulatorEnv(seed=None, worker=0, num_workers=1, graphs_dir=DEPENDENCY_GRAPHS_DIR, **kwargs):
+    ''' Simulated environment over the share `worker` of the session '''
+    session = Session(worker=worker, num_workers=num_workers, seed=seed)
+    backend = SimulatorBackend(session, seed=None if seed is None else seed + worker, graphs_dir=graphs_dir)
+    return PageLoadEnv(backend, worker=worker, **kwargs)
+
+
+def makeMininetEnv(worker, worker_id=0, num_workers=1, seed=None, router=False, budget=0.1, **kwargs):
+    ''' Environment of a VM of WORKERS (mininet + MPQUIC + middleware) '''
+    logger = config_logger('environment_{}'.format(worker_id), filepath='./logs/environment_{}.log'.format(worker_id))
+    env = Environment([0, 0], logger=logger, mconfig=middlewareConfig(worker, proxy=router),
+                      remoteHostname='mininet' + '@' + worker['host'], remotePort=worker['ssh_port'],
+                      worker=worker_id, num_workers=num_workers, seed=seed)
+    backend = MininetBackend(env, host=worker['host'], request_port=worker['request_port'],
+                             publisher_port=worker['publisher_port'], router=router, budget=budget)
+    return PageLoadEnv(backend, worker=worker_id, **kwargs)
+
+
+def subprocWorker(remote, parent_remote, make_env):
+    ''' Loop of a SubprocVectorEnv process: (command, data) -> result, resets at the end of a page load '''
+    parent_remote.close()
+    env = make_env()
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == 'step':
+                state, reward, done, info = env.step(data)
+                if done:
+                    info['terminal_state'] = state
+                    state = env.reset()
+                remote.send((state, reward, done, info))
+            elif command == 'reset':
+                remote.send(env.reset())
+            elif command == 'close':
+                break
+    finally:
+        env.close()
+        remote.close()
+
+
+class SubprocVectorEnv:
+    '''
+        One PageLoadEnv per subprocess (make_env callables, must be picklable e.g.
+        functools.partial(makeSimulatorEnv, seed=42, worker=i, num_workers=n)), stepped together.
+        A finished page load is reset in its process, its last state is in info['terminal_state']
+    '''
+    def __init__(self, env_fns):
+        self.num_envs = len(env_fns)
+        self.remotes, work_remotes = zip(*[mp.Pipe() for _ in env_fns])
+        self.processes = []
+        for work_remote, remote, make_env in zip(work_remotes, self.remotes, env_fns):
+            process = mp.Process(target=subprocWorker, args=(work_remote, remote, make_env), daemon=True)
+            process.start()
+            work_remote.close()
+            self.processes.append(process)
+        self.closed = False
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(('reset', None))
+        return np.stack([remote.recv() for remote in self.remotes])
+
+    def step_async(self, actions):
+        for remote, action in zip(self.remotes, actions):
+            remote.send(('step', int(action)))
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        states, rewards, dones, infos = zip(*results)
+        return np.stack(states), np.array(rewards), np.array(dones), list(infos)
+
+    def step(self, actions):
+        ''' (N,) actions -> (N, S_INFO, S_LEN) states, (N,) rewards, (N,) dones, N infos '''
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+
+def simulatorVectorEnv(num_envs, seed=None, **kwargs):
+    ''' SubprocVectorEnv of `num_envs` simulators, each on its own share of the session '''
+    return SubprocVectorEnv([functools.partial(makeSimulatorEnv, seed=seed, worker=i, num_workers=num_envs, **kwargs)
+                             for i in range(num_envs)])
@@ -0,0 +1,323 @@
+'''
+    Discrete-event simulator of a page load over multipath QUIC, a stand-in for
+    mininet + MPQUIC (Environment.run -> launchTests) on a single machine.
+    Same inputs: a topos.json entry (bandwidth, delay, queuingDelay per path, netem loss)
+    and a dependency graph (objs, Firefox download order of client_browse_deptree).
+    Same outputs: one scheduling request per stream (Path1/Path2 PathStats as in zclient.go)
+    and one stream completion per object (StreamInfo of zpublisher.go).
+
+    Model, per path: the responses queue behind each other on a FIFO bottleneck link
+    (bandwidth, tc), after the propagation delay (delay, one way) and each packet is
+    lost with the netem probability; a stream with losses takes one more RTT to recover.
+    The queuing delay seen by the RTT samples is capped by queuingDelay.
+'''
+import heapq
+import json
+import math
+import os
+import re
+from collections import deque
+
+import numpy as np
+import zmq
+
+from .environment import Environment
+from utils.wire_format import encode_request, decode_response
+
+DEPENDENCY_GRAPHS_DIR = './environment/dependency_graphs'
+
+MSS = 1350 # bytes of payload per QUIC packet
+
+# MPQUIC path ids of the client interfaces (path 0 is the handshake path)
+PATH_IDS = [1, 3, 5, 7]
+
+# Object sizes (bytes) when the graph does not give them, by download type
+DEFAULT_OBJECT_SIZES = {
+    'html': 30000,
+    'css': 15000,
+    'javascript': 40000,
+    'image': 20000,
+    'font': 25000,
+    'other': 10000
+}
+
+# Same timeout as globalTimeout in zclient.go
+REQUEST_TIMEOUT = 2500 # ms
+
+
+def objectKind(download_type):
+    ''' Download type of the graph -> key of DEFAULT_OBJECT_SIZES (same matching as the Go client) '''
+    if 'html' in download_type:
+        return 'html'
+    if 'css' in download_type:
+        return 'css'
+    if 'javascript' in download_type or 'js' in download_type:
+        return 'javascript'
+    if 'image' in download_type:
+        return 'image'
+    if '4' in download_type or 'octet-stream' in download_type:
+        return 'font'
+    return 'other'
+
+
+def loadObjects(graph_file):
+    ''' Objects of a dependency graph: [{'id', 'path', 'kind', 'size'}] in the order of the graph '''
+    with open(graph_file, 'r') as fp:
+        graph = json.load(fp)
+
+    objects = []
+    for obj in graph['objs']:
+        kind = objectKind(obj['download']['type'])
+        size = obj['download'].get('size', obj.get('size', DEFAULT_OBJECT_SIZES[kind]))
+        objects.append({'id': obj['id'], 'path': obj['path'], 'kind': kind, 'size': int(size)})
+    return objects
+
+
+def firefoxWaves(objects):
+    '''
+        Download order of fireFoxGet: css/js and the unclassified objects first,
+        html, fonts and images once all the css/js are complete.
+        Returns (first wave, second wave), the css/js of the first wave block the second one
+    '''
+    first = [obj for obj in objects if obj['kind'] in ('css', 'javascript', 'other')]
+    second = [obj for obj in objects if obj['kind'] in ('html', 'font', 'image')]
+    return first, second
+
+
+def netemLoss(topology, index):
+    ''' Loss probability of path `index` from the netem commands ("loss 1.69%") '''
+    for netem in topology.get('netem', []):
+        if int(netem[0]) == index:
+            match = re.search(r'loss\s+([0-9.]+)%', str(netem[2]))
+            if match:
+                return float(match.group(1)) / 100.0
+    return 0.0
+
+
+class SimPath:
+    ''' One path of the topology and the statistics MPQUIC reports for it '''
+    def __init__(self, path_id, bandwidth, delay, queuing_delay=0.0, loss=0.0):
+        self.path_id = path_id
+        self.rate = float(bandwidth) * 1e6 / 8.0        # bytes/s
+        self.base_rtt = 2.0 * float(delay) / 1000.0     # s
+        self.max_queuing = float(queuing_delay)          # s
+        self.loss = float(loss)
+
+        self.free_at = 0.0              # the link is busy until
+        self.srtt = self.base_rtt       # sample of the handshake
+        self.packets = 0
+        self.retransmissions = 0
+        self.losses = 0
+
+    @classmethod
+    def fromTopology(cls, topology):
+        return [cls(PATH_IDS[i], path['bandwidth'], path['delay'], path.get('queuingDelay', 0.0), netemLoss(topology, i))
+                for i, path in enumerate(topology['paths'])]
+
+    def send(self, now, size, rng):
+        '''
+            Response of `size` bytes requested at `now` on this path.
+            Returns (completion time, rtt sample, lost packets)
+        '''
+        packets = max(int(math.ceil(size / float(MSS))), 1)
+        lost = rng.binomial(packets, self.loss) if self.loss > 0 else 0
+        self.packets += packets + lost
+
+        arrival = now + self.base_rtt / 2.0
+        start = max(arrival, self.free_at)
+        queuing = min(start - arrival, self.max_queuing)
+        self.free_at = start + (packets + lost) * MSS / self.rate
+
+        rtt = self.base_rtt + queuing
+        done = self.free_at + self.base_rtt / 2.0 + (rtt if lost > 0 else 0.0)
+        return done, rtt, lost
+
+    def complete(self, rtt, lost):
+        self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.retransmissions += lost
+        self.losses += lost
+
+    def stats(self):
+        ''' PathStats of zclient.go '''
+        return {
+            'PathID': self.path_id,
+            'SmoothedRTT': self.srtt,
+            'Bandwidth': int(self.rate * 8),
+            'Packets': self.packets,
+            'Retransmissions': self.retransmissions,
+            'Losses': self.losses
+        }
+
+
+class PageLoad:
+    '''
+        One page load (episode) of the simulator, advanced one scheduling decision at a time:
+            while (request = sim.request()) is not None: sim.assign(path_id)
+        request() runs the clock until the next stream needs a path,
+        the stream completions are appended to `completions` as they happen
+    '''
+    def __init__(self, topology, objects, rng, connection_id=0, first_stream_id=5):
+        self.paths = SimPath.fromTopology(topology)
+        self._by_id = {path.path_id: path for path in self.paths}
+        self._rng = rng
+        self.connection_id = connection_id
+        self.time = 0.0
+
+        self._events = []           # (time, seq, stream, path, rtt, lost)
+        self._ready = deque()       # streams waiting for a scheduling decision
+        self._next_stream = first_stream_id
+        self._seq = 0
+        self.completions = []
+
+        first, self._second = firefoxWaves(objects)
+        self._blocking = sum(1 for obj in first if obj['kind'] in ('css', 'javascript'))
+        self._issue(first)
+        if self._blocking == 0:
+            self._issue(self._second)
+            self._second = []
+
+    def _issue(self, objects):
+        for obj in objects:
+            self._ready.append({'obj': obj, 'StreamID': self._next_stream, 'start': self.time})
+            self._next_stream += 2
+
+    def request(self):
+        ''' Request of the next stream to schedule, None once the page is loaded '''
+        while len(self._ready) == 0 and len(self._events) > 0:
+            self._complete(heapq.heappop(self._events))
+        if len(self._ready) == 0:
+            return None
+
+        stream = self._ready[0]
+        request = {
+            'ConnectionID': self.connection_id,
+            'StreamID': stream['StreamID'],
+            'RequestPath': stream['obj']['path']
+        }
+        for i, path in enumerate(self.paths):
+            request['Path{}'.format(i + 1)] = path.stats()
+        return request
+
+    def assign(self, path_id):
+        ''' Sends the pending stream on path `path_id` (the first path if unknown, e.g. no answer) '''
+        stream = self._ready.popleft()
+        path = self._by_id.get(path_id, self.paths[0])
+        done, rtt, lost = path.send(self.time, stream['obj']['size'], self._rng)
+        stream['PathID'] = path.path_id
+        heapq.heappush(self._events, (done, self._seq, stream, path, rtt, lost))
+        self._seq += 1
+
+    def _complete(self, event):
+        done, _, stream, path, rtt, lost = event
+        self.time = done
+        path.complete(rtt, lost)
+        obj = stream['obj']
+        self.completions.append({
+            'ConnectionID': self.connection_id,
+            'StreamID': stream['StreamID'],
+            'ObjectID': obj['id'],
+            'CompletionTime': done - stream['start'],
+            'Path': obj['path']
+        })
+
+        if obj['kind'] in ('css', 'javascript') and self._blocking > 0:
+            self._blocking -= 1
+            if self._blocking == 0:
+                self._issue(self._second)
+                self._second = []
+
+    def done(self):
+        return len(self._ready) == 0 and len(self._events) == 0 and len(self._second) == 0
+
+    def pageLoadTime(self):
+        return self.time
+
+
+class SimulatedEnvironment(Environment):
+    '''
+        Environment backed by the simulator instead of mininet: no middleware, the
+        simulated client binds the endpoints of the middleware (mconfig 'client' and
+        'publisher'), so the agent serves it through the same sockets and messages.
+        Simulated time does not depend on how long the agent takes to answer
+    '''
+    def __init__(self, bdw_paths, logger, mconfig, worker=0, num_workers=1, seed=None,
+                 graphs_dir=DEPENDENCY_GRAPHS_DIR, **kwargs):
+        self._mconfig = mconfig
+        self._graphs_dir = graphs_dir
+        self._rng = np.random.RandomState(None if seed is None else seed + worker)
+        self._episode = "sim-{}-{}".format(os.getpid(), worker)
+
+        self._context = zmq.Context()
+        self._client = None
+        self._publisher = self._context.socket(zmq.PUSH)
+        self._publisher.bind(mconfig['publisher'])
+        super().__init__(bdw_paths, logger, mconfig, worker=worker, num_workers=num_workers, seed=seed, **kwargs)
+
+    def spawn_middleware(self):
+        ''' REQ socket of the simulated client, may send again without a reply (late replies are dropped) '''
+        if self._client is None:
+            self._client = self._context.socket(zmq.REQ)
+            self._client.setsockopt(zmq.REQ_RELAXED, 1)
+            self._client.setsockopt(zmq.REQ_CORRELATE, 1)
+            self._client.bind(self._mconfig['client'])
+
+    def stop_middleware(self):
+        if self._client is not None:
+            self._client.close(linger=0)
+            self._client = None
+
+    def graphFile(self, graph):
+        return os.path.join(self._graphs_dir, graph, graph + '.json')
+
+    def decide(self, request):
+        ''' Scheduling request to the agent, returns the PathID (None without an answer) '''
+        if len(self.curr_topo[0]['paths']) == 2:
+            body = encode_request(request)
+        else:
+            body = json.dumps(request).encode('utf-8')
+        self._client.send_multipart([str(request['StreamID']).encode('utf-8'), body])
+
+        if self._client.poll(REQUEST_TIMEOUT) == 0:
+            self._logger.info("No answer for StreamID {}".format(request['StreamID']))
+            return None
+
+        path_id = decode_response(self._client.recv_multipart())
+        if path_id is None:
+            # binary rejected, same request in JSON
+            self._client.send_multipart([str(request['StreamID']).encode('utf-8'), json.dumps(request).encode('utf-8')])
+            if self._client.poll(REQUEST_TIMEOUT) == 0:
+                return None
+            path_id = decode_response(self._client.recv_multipart())
+        return path_id
+
+    def publish(self, message):
+        self._publisher.send_multipart([b'', json.dumps(message).encode('utf-8')])
+
+    def run(self):
+        self._totalRuns += 1
+        message = "Run Number: {}, Graph: {}"
+        self._logger.info(message.format(self._totalRuns, self.curr_graph))
+
+        episode = "{}-{}".format(self._episode, self._totalRuns)
+        sim = PageLoad(self.curr_topo[0], loadObjects(self.graphFile(self.curr_graph)), self._rng,
+                       connection_id=int(self._rng.randint(1, 2**62)))
+
+        published = 0
+        while True:
+            request = sim.request()
+            # stream completions up to now, sequenced as by ZPublisher
+            for stream in sim.completions[published:]:
+                stream.update({'Episode': episode, 'Sequence': published})
+                self.publish(stream)
+                published += 1
+            if request is None:
+                break
+            sim.assign(self.decide(request))
+
+        self.publish({'Episode': episode, 'Sequence': published, 'EndOfEpisode': True, 'Total': published})
+        self._logger.info("Page load time: {}s (simulated), {} streams".format(sim.pageLoadTime(), published))
+
+    def close(self):
+        super().close()
+        self._publisher.close(linger=1000)
+        self._context.term()
@@ -0,0 +1,168 @@
+'''
+    Vectorized simulated environment: N page loads (topology, graph pairs of a Session)
+    advance in lockstep, one scheduling decision each per step, and their states come
+    out as one (N, S_INFO, S_LEN) array, ready for a single batched predict.
+    A finished page load is turned into an episode (same dict the agent sends to the
+    learner) and its slot is refilled with the next pair of the Session.
+'''
+import os
+import numpy as np
+
+from .simulator import PageLoad, loadObjects, DEPENDENCY_GRAPHS_DIR
+from utils.featurizer import REQUEST_RECORD, request_features, request_rewards
+from utils.wire_format import PATH_STATS_KEYS
+from utils.state_history import BatchStateHistory
+from utils.data_transf import joinStatesStreams
+
+
+def requestRecord(request):
+    ''' Request dict -> values of a REQUEST_RECORD (as Featurizer.parse, path 1 first) '''
+    path1 = [request['Path1'][key] for key in PATH_STATS_KEYS]
+    path2 = [request['Path2'][key] for key in PATH_STATS_KEYS]
+    if path1[0] != 1:
+        path1, path2 = path2, path1
+    return (request['StreamID'], request['ConnectionID'], request['RequestPath']) + tuple(zip(path1, path2))
+
+
+def makeEpisode(list_states, f_batch, actions, stream_info, bdw, a_dim=2, entropy_record=(), worker=0, conn_id=0):
+    '''
+        Steps of a page load (REQUEST_RECORD values, features, path indices) + its stream
+        completions -> episode of the learner (same dict as the worker of the agent builds)
+    '''
+    records = np.array(list_states, dtype=REQUEST_RECORD)
+    keys = [{'RequestPath': path, 'StreamID': stream_id}
+            for path, stream_id in zip(records['RequestPath'].tolist(), records['StreamID'].tolist())]
+    indices, stream_info, _, _ = joinStatesStreams(keys, stream_info)
+    records = records[indices]
+    a_batch = np.eye(a_dim)[np.asarray(actions, dtype=int)[indices]]
+    completion_times = np.array([stream['CompletionTime'] for stream in stream_info])
+
+    return {
+        'worker': worker,
+        'conn_id': conn_id,
+        'f_batch': np.stack(f_batch, axis=0),
+        'indices': indices,
+        'a_batch': a_batch,
+        'r_batch': request_rewards(records, a_batch, completion_times, bdw),
+        'entropy': np.array(entropy_record),
+        'completion_times': completion_times
+    }
+
+
+class EpisodeSlot:
+    ''' One page load of the vector and its episode buffers '''
+    def __init__(self, sim, topology, graph, bdw):
+        self.sim = sim
+        self.topology = topology
+        self.graph = graph
+        self.bdw = bdw
+        self.list_states = []       # REQUEST_RECORD values
+        self.f_batch = []
+        self.actions = []
+        self.entropy_record = []
+
+
+class VectorEnv:
+    '''
+        states = envs.reset()
+        while envs.active.any():
+            states, episodes = envs.step(actions, entropies)
+        actions: (N,) index of the path (PATHS order), ignored for the inactive slots
+        (no pair left in the Session)
+    '''
+    def __init__(self, num_envs, session, s_info, s_len, a_dim=2, seed=None, worker=0,
+                 graphs_dir=DEPENDENCY_GRAPHS_DIR):
+        self.num_envs = num_envs
+        self.session = session
+        self.a_dim = a_dim
+        self.worker = worker
+        self._graphs_dir = graphs_dir
+        self._rng = np.random.RandomState(seed)
+        self._objects = {} # graph -> objects, loaded once
+
+        self.slots = [None] * num_envs
+        self.active = np.zeros(num_envs, dtype=bool)
+        self.runs = 0
+
+        # reused every step
+        self._records = np.zeros(num_envs, dtype=REQUEST_RECORD)
+        self._values = [None] * num_envs # same as _records, kept for the episodes
+        self._bdw = np.ones((num_envs, 2))
+        self._features = np.empty((num_envs, s_info))
+        self._history = BatchStateHistory(num_envs, s_info, s_len)
+
+    def loadObjects(self, graph):
+        if graph not in self._objects:
+            self._objects[graph] = loadObjects(os.path.join(self._graphs_dir, graph, graph + '.json'))
+        return self._objects[graph]
+
+    def refill(self, index):
+        ''' Starts the next page load in slot `index` until one has a request (inactive if none is left) '''
+        self._history.reset(index)
+        while True:
+            pair = self.session.nextPair()
+            if pair is None:
+                self.slots[index] = None
+                self.active[index] = False
+                return
+
+            topo, graph = pair
+            sim = PageLoad(topo, self.loadObjects(graph), self._rng,
+                           connection_id=int(self._rng.randint(1, 2**62)))
+            bdw = (int(topo['paths'][0]['bandwidth']), int(topo['paths'][1]['bandwidth']))
+            self.runs += 1
+
+            request = sim.request()
+            if request is not None:
+                self.slots[index] = EpisodeSlot(sim, topo, graph, bdw)
+                self.active[index] = True
+                self.setRequest(index, request)
+                self._bdw[index] = bdw
+                return
+
+    def setRequest(self, index, request):
+        self._values[index] = requestRecord(request)
+        self._records[index] = self._values[index]
+
+    def reset(self):
+        self._history.reset()
+        for index in range(self.num_envs):
+            self.refill(index)
+        return self.observe()
+
+    def observe(self):
+        ''' Features of the current requests of all the slots at once, pushed to the histories '''
+        request_features(self._records, self._bdw.T, out=self._features)
+        self._history.push(self._features)
+        return self._history.window()
+
+    def step(self, actions, entropies=None):
+        ''' Returns (states, finished episodes) '''
+        episodes = []
+        for index in np.flatnonzero(self.active):
+            slot = self.slots[index]
+            action = int(actions[index])
+
+            slot.list_states.append(self._values[index])
+            slot.f_batch.append(self._features[index].copy())
+            slot.actions.append(action)
+            if entropies is not None:
+                slot.entropy_record.append(entropies[index])
+
+            slot.sim.assign(slot.sim.paths[action].path_id)
+            request = slot.sim.request()
+            if request is not None:
+                self.setRequest(index, request)
+            else:
+                episodes.append(self.episode(slot))
+                self.refill(index)
+
+        return self.observe(), episodes
+
+    def episode(self, slot):
+        ''' Finished page load -> episode of the learner '''
+        episode = makeEpisode(slot.list_states, slot.f_batch, slot.actions, slot.sim.completions, slot.bdw,
+                              a_dim=self.a_dim, entropy_record=slot.entropy_record,
+                              worker=self.worker, conn_id=slot.sim.connection_id)
+        episode.update({'graph': slot.graph, 'page_load_time': slot.sim.pageLoadTime()})
+        return episode
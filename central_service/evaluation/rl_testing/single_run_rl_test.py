@@ -56,6 +56,8 @@ def load_or_generate_pairs():
 
 def restart_nn_inference(bdw_path1, bdw_path2):
     PYTHON_NN_INFERENCE = 'python3.6'
+    # tf: checkpoint (NN_MODEL), npz: policy exported beforehand with export_policy.py
+    NN_INFERENCE_ENGINE = 'tf'
 
     def send_cmd(cmd):
         import subprocess
@@ -69,7 +71,8 @@ def restart_nn_inference(bdw_path1, bdw_path2):
 
     send_cmd("killall {}".format(PYTHON_NN_INFERENCE))
     time.sleep(0.5)
-    spawn_cmd = "{} {} {} {}".format("python3.6", "./git/nn_testing/nn_inference.py",str(bdw_path1), str(bdw_path2))
+    # npz: no TensorFlow import -> near instant restart
+    spawn_cmd = "{} {} {} {} {}".format("python3.6", "./git/nn_testing/nn_inference.py",str(bdw_path1), str(bdw_path2), NN_INFERENCE_ENGINE)
     send_cmd(spawn_cmd)
 
 
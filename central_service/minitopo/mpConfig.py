@@ -5,11 +5,17 @@ class MpConfig:
 	def __init__(self, topo, param):
 		self.topo = topo
 		self.param = param
+		self.configured = False
+		# False: interfaces and routes are only configured once (persistent topology)
+		self.reconfigure = True
 
 	def configureNetwork(self):
+		if self.configured and not self.reconfigure:
+			return
 		print("Configure interfaces....Generic call ?")
 		self.configureInterfaces()
 		self.configureRoute()
+		self.configured = True
 
 	def getMidL2RInterface(self, id):
 		"get Middle link, left to right interface"
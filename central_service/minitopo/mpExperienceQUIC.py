@@ -1,6 +1,12 @@
 from mpExperience import MpExperience
 from mpParamXp import MpParamXp
+import hashlib
+import json
 import os
+import shutil
+import subprocess
+import tempfile
+import time
 
 
 class MpExperienceQUIC(MpExperience):
@@ -13,6 +19,17 @@ class MpExperienceQUIC(MpExperience):
 
     PING_OUTPUT = "ping.log"
 
+    # Sources, their dependencies and the build cache under one home: `~` is the one
+    # of root when run with sudo
+    HOME = "/home/mininet"
+    GOPATH = HOME + "/go"
+    PROJECTS_DIR = GOPATH + "/src/github.com/lucas-clemente/"
+    # Binaries built once per content hash of their sources (packages built, Go version)
+    BUILD_CACHE = HOME + "/.cache/minitopo/quic"
+    BUILD_CACHE_ENTRIES = 4  # most recent builds kept
+    BUILD_LOG = "quic_build.log"  # build metadata of the experiment
+    BINARIES = ["server_main", "main"]
+
     def __init__(self, xpParamFile, mpTopo, mpConfig):
         MpExperience.__init__(self, xpParamFile, mpTopo, mpConfig)
         self.loadParam()
@@ -64,12 +81,12 @@ class MpExperienceQUIC(MpExperience):
         self.multifile = self.xpParam.getParam(MpParamXp.MULTIFILE)
         self.multipath = self.xpParam.getParam(MpParamXp.QUICMULTIPATH)
         if self.web_browse == "0":
-            self.client_go_file = "~/go/src/github.com/lucas-clemente/" + self.project + "/example/client_benchmarker/main.go"
+            self.client_go_file = MpExperienceQUIC.PROJECTS_DIR + self.project + "/example/client_benchmarker/main.go"
         else:
-            self.client_go_file = "~/go/src/github.com/lucas-clemente/" + self.project + "/example/client_browse_deptree/main.go"
-        self.server_go_file = "~/go/src/github.com/lucas-clemente/" + self.project + "/example/main.go"
+            self.client_go_file = MpExperienceQUIC.PROJECTS_DIR + self.project + "/example/client_browse_deptree/main.go"
+        self.server_go_file = MpExperienceQUIC.PROJECTS_DIR + self.project + "/example/main.go"
 
-        self.certpath = "~/go/src/github.com/lucas-clemente/" + self.project + "/example/"
+        self.certpath = MpExperienceQUIC.PROJECTS_DIR + self.project + "/example/"
         self.graphpath = "/dependency_graphs/"+self.json_file +"/"+self.json_file+".json" #relative path to root
         self.serverpath = "/home/mininet/go/src/github.com/lucas-clemente/server" #root path on server
         self.clientpath = "/home/mininet/go/src/github.com/lucas-clemente/client" #root path on server
@@ -171,12 +188,96 @@ class MpExperienceQUIC(MpExperience):
         print(s)
         return s
 
-    def compileGoFiles(self):
-        cmd = MpExperienceQUIC.GO_BIN + " build " + self.server_go_file
-        self.mpTopo.commandTo(self.mpConfig.server, cmd)
+    def goDependencies(self, goFile):
+        """ Directories of the non standard packages goFile is built from (go list -deps) """
+        env = dict(os.environ, GOPATH=MpExperienceQUIC.GOPATH)
+        out = subprocess.check_output([MpExperienceQUIC.GO_BIN, "list", "-deps", "-f",
+                                       "{{if not .Standard}}{{.Dir}}{{end}}", goFile], env=env)
+        return [d for d in out.decode().splitlines() if d]
+
+    def sourcesHash(self):
+        """
+        Content hash of what the binaries are built from: the Go files of every package
+        of the server and the client (project and GOPATH dependencies, from go list),
+        the modules of the project, the main files and the Go version (standard library).
+        None when the dependencies cannot be listed: no cache for this build
+        """
+        root = MpExperienceQUIC.PROJECTS_DIR + self.project
+        if not os.path.isdir(root):
+            raise Exception("QUIC sources not found: " + root)
+        try:
+            dirs = set(self.goDependencies(self.server_go_file) + self.goDependencies(self.client_go_file))
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        h = hashlib.sha1()
+        h.update((self.server_go_file + "\n" + self.client_go_file + "\n").encode())
+        h.update(subprocess.check_output([MpExperienceQUIC.GO_BIN, "version"]))
+        dirs.add(root) # go.mod / go.sum of the project
+        for d in sorted(dirs):
+            for name in sorted(os.listdir(d)):
+                if name.endswith((".go", ".s", ".c", ".h")) or name in ("go.mod", "go.sum"):
+                    path = os.path.join(d, name)
+                    h.update(path.encode())
+                    with open(path, "rb") as f:
+                        h.update(f.read())
+        return h.hexdigest()
+
+    def buildGoFiles(self):
+        # the dependencies of the same GOPATH as the ones hashed
+        goBuild = "GOPATH=" + MpExperienceQUIC.GOPATH + " " + MpExperienceQUIC.GO_BIN + " build "
+        self.mpTopo.commandTo(self.mpConfig.server, goBuild + self.server_go_file)
         self.mpTopo.commandTo(self.mpConfig.server, "mv main server_main")
-        cmd = MpExperienceQUIC.GO_BIN + " build " + self.client_go_file
-        self.mpTopo.commandTo(self.mpConfig.server, cmd)
+        self.mpTopo.commandTo(self.mpConfig.server, goBuild + self.client_go_file)
+
+    def storeBuild(self, cache):
+        """ Copy the binaries just built into the cache (all or nothing) """
+        if not all(os.path.isfile(b) for b in MpExperienceQUIC.BINARIES):
+            return
+        if not os.path.isdir(MpExperienceQUIC.BUILD_CACHE):
+            os.makedirs(MpExperienceQUIC.BUILD_CACHE)
+        tmp = tempfile.mkdtemp(dir=MpExperienceQUIC.BUILD_CACHE)
+        for b in MpExperienceQUIC.BINARIES:
+            shutil.copy2(b, tmp)
+        try:
+            os.rename(tmp, cache)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        entries = [os.path.join(MpExperienceQUIC.BUILD_CACHE, d) for d in os.listdir(MpExperienceQUIC.BUILD_CACHE)]
+        entries = sorted(entries, key=os.path.getmtime, reverse=True)
+        for old in entries[MpExperienceQUIC.BUILD_CACHE_ENTRIES:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def compileGoFiles(self):
+        """
+        Binaries of the server and the client: from the build cache when their
+        sources did not change, otherwise built (go build) and cached.
+        Build time and cache status go to BUILD_LOG
+        """
+        start = time.time()
+        key = self.sourcesHash()
+        hashTime = time.time() - start
+        cache = os.path.join(MpExperienceQUIC.BUILD_CACHE, key) if key is not None else None
+        cached = cache is not None and all(os.path.isfile(os.path.join(cache, b)) for b in MpExperienceQUIC.BINARIES)
+        if cached:
+            for b in MpExperienceQUIC.BINARIES:
+                shutil.copy2(os.path.join(cache, b), b)
+            os.utime(cache, None)
+        else:
+            self.buildGoFiles()
+            if cache is not None:
+                self.storeBuild(cache)
+
+        with open(MpExperienceQUIC.BUILD_LOG, "w") as f:
+            json.dump({
+                "key": key,
+                "cached": cached,
+                "hash_time": hashTime,
+                "build_time": time.time() - start,
+                "server_go_file": self.server_go_file,
+                "client_go_file": self.client_go_file
+            }, f)
 
     def clean(self):
         MpExperience.clean(self)
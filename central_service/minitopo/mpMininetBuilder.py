@@ -36,6 +36,17 @@ class MpMininetBuilder(Topo):
 		else:
 			return self.net.getNodeByName(who)
 
+	def configureLink(self, fromA, toB, **kwargs):
+		"""
+		Reapply the tc parameters (bw, delay, loss, max_queue_size) of the
+		links between fromA and toB on the running network
+		"""
+		a = self.getHost(fromA)
+		b = self.getHost(toB)
+		for link in self.net.linksBetween(a, b):
+			link.intf1.config(**kwargs)
+			link.intf2.config(**kwargs)
+
 	def stopNetwork(self):
 		if self.net is None:
 			print("Could not stop network... Nothing to stop)")
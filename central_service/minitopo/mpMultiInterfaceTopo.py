@@ -14,6 +14,14 @@ class MpMultiInterfaceTopo(MpTopo):
 			self.addLink(self.switch[-1],self.router, **l.asDict())
 		self.addLink(self.router, self.server)
 
+	def configureLinks(self):
+		"""
+		Reapply the characteristics of the links of topoParam, same as
+		the ones given to addLink
+		"""
+		for l, switch in zip(self.topoParam.linkCharacteristics, self.switch):
+			self.configureLink(switch, self.router, **l.asDict())
+
 	def addOneSwitchPerLink(self, link):
 		return self.addSwitch(MpMultiInterfaceTopo.switchNamePrefix +
 				str(link.id))
@@ -3,10 +3,13 @@
 import sys, getopt
 from mpXpRunner import MpXpRunner
 from mpTopo import MpTopo
+import mpPersistent
 
 topoParamFile = None
 xpParamFile   = None
 topoBuilder   = "mininet"
+persistent    = False
+serve         = False
 
 def printHelp():
 	print("Help Menu")
@@ -14,8 +17,10 @@ def printHelp():
 def parseArgs(argv):
 	global topoParamFile
 	global xpParamFile
+	global persistent
+	global serve
 	try:
-		opts, args = getopt.getopt(argv, "ht:x:", ["topoParam=","xp="])
+		opts, args = getopt.getopt(argv, "ht:x:ps", ["topoParam=","xp=","persistent","serve"])
 	except getopt.GetoptError:
 		printHelp()
 		sys.exit(1)
@@ -28,11 +33,21 @@ def parseArgs(argv):
 		elif opt in ("-t","--topoParam"):
 			print("hey")
 			topoParamFile = arg
-	if topoParamFile is None:
+		elif opt in ("-p","--persistent"):
+			persistent = True
+		elif opt in ("-s","--serve"):
+			serve = True
+	if topoParamFile is None and not serve:
 		print("Missing the topo...")
 		printHelp()
 		sys.exit(1)
 
 if __name__ == '__main__':
 	parseArgs(sys.argv[1:])
-	MpXpRunner(MpTopo.mininetBuilder, topoParamFile, xpParamFile)
+	if serve:
+		# keep the topology up, run the experiments of mpPerf.py -p
+		mpPersistent.serve(MpTopo.mininetBuilder)
+	elif persistent:
+		sys.exit(mpPersistent.runPersistent(topoParamFile, xpParamFile))
+	else:
+		MpXpRunner(MpTopo.mininetBuilder, topoParamFile, xpParamFile)
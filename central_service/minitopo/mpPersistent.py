@@ -0,0 +1,138 @@
+"""
+Persistent topology: one serving process (mpPerf.py -s) keeps the topology
+up and runs the experiments it is sent, one at a time (mpPerf.py -p, same
+-t / -x files as a normal run).
+The shells of the hosts keep the directory the topology was started from,
+so every experiment is expected to run from the same one (tmpfs).
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import traceback
+
+from mpTopo import MpTopo
+
+SOCKET_PATH = "/tmp/minitopo.sock"
+SERVE_LOG = "/tmp/minitopo_serve.log"
+START_TIMEOUT = 30
+STOP = "stop"
+
+
+def terminate(signum, frame):
+	# cleanMininet stops the server with pkill (SIGTERM): exit through the
+	# finally of serve, so that the topology is stopped and the socket removed
+	sys.exit(0)
+
+
+def serve(builderType=MpTopo.mininetBuilder, socketPath=SOCKET_PATH, runner=None):
+	if runner is None:
+		from mpXpRunner import MpPersistentXpRunner
+		runner = MpPersistentXpRunner(builderType)
+	if os.path.exists(socketPath):
+		os.remove(socketPath)
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	server.bind(socketPath)
+	server.listen(1)
+	signal.signal(signal.SIGTERM, terminate)
+	try:
+		while True:
+			conn, _ = server.accept()
+			f = conn.makefile('rw')
+			request = f.readline().rstrip("\n")
+			if request == STOP:
+				reply(f, conn, "ok")
+				break
+			if request:
+				reply(f, conn, "ok" if runXp(runner, request) else "error")
+			else:
+				reply(f, conn, None) # closed without a request (e.g. probe)
+	finally:
+		runner.stopTopo()
+		server.close()
+		if os.path.exists(socketPath):
+			os.remove(socketPath)
+
+
+def runXp(runner, request):
+	try:
+		cwd, topoParamFile, xpParamFile = request.split("\t")
+		os.chdir(cwd)
+		runner.run(topoParamFile, xpParamFile)
+		return True
+	except Exception:
+		traceback.print_exc()
+		# start from a new topology next time
+		try:
+			runner.stopTopo()
+		except Exception:
+			traceback.print_exc()
+		return False
+	finally:
+		sys.stdout.flush()
+
+
+def reply(f, conn, status):
+	try:
+		if status is not None:
+			f.write(status + "\n")
+		f.close()
+	except socket.error:
+		pass # the client is gone (e.g. killed on timeout)
+	conn.close()
+
+
+def connect(socketPath=SOCKET_PATH):
+	conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		conn.connect(socketPath)
+		return conn
+	except socket.error:
+		conn.close()
+		return None
+
+
+def startServer(socketPath=SOCKET_PATH):
+	mpPerf = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mpPerf.py")
+	log = open(SERVE_LOG, "a")
+	# detached from the session of the client (ssh returns once the experiment is done)
+	subprocess.Popen([sys.executable, mpPerf, "-s"], stdin=open(os.devnull), stdout=log,
+			stderr=log, preexec_fn=os.setsid)
+	deadline = time.time() + START_TIMEOUT
+	while time.time() < deadline:
+		conn = connect(socketPath)
+		if conn is not None:
+			return conn
+		time.sleep(0.1)
+	raise Exception("Persistent topology server did not start")
+
+
+def runPersistent(topoParamFile, xpParamFile, socketPath=SOCKET_PATH):
+	"""
+	Runs the experiment in the serving process (started if needed),
+	returns 0 on success
+	"""
+	conn = connect(socketPath)
+	if conn is None:
+		conn = startServer(socketPath)
+	f = conn.makefile('rw')
+	f.write("\t".join([os.getcwd(), os.path.abspath(topoParamFile),
+			os.path.abspath(xpParamFile)]) + "\n")
+	f.flush()
+	reply = f.readline().strip()
+	f.close()
+	conn.close()
+	return 0 if reply == "ok" else 1
+
+
+def stopServer(socketPath=SOCKET_PATH):
+	conn = connect(socketPath)
+	if conn is None:
+		return
+	f = conn.makefile('rw')
+	f.write(STOP + "\n")
+	f.flush()
+	f.readline()
+	conn.close()
@@ -44,6 +44,9 @@ class MpTopo:
 	def addLink(self, fromA, toB, **kwargs):
 		self.topoBuilder.addLink(fromA,toB,**kwargs)
 
+	def configureLink(self, fromA, toB, **kwargs):
+		self.topoBuilder.configureLink(fromA, toB, **kwargs)
+
 	def getCLI(self):
 		self.topoBuilder.getCLI()
 
@@ -53,5 +56,12 @@ class MpTopo:
 	def closeLogFile(self):
 		self.logFile.close()
 
+	def reopenLogFile(self):
+		"""
+		New command log in the current directory (next experiment on the same topology)
+		"""
+		self.logFile.close()
+		self.logFile = open(MpTopo.cmdLog, 'w')
+
 	def stopNetwork(self):
 		self.topoBuilder.stopNetwork()
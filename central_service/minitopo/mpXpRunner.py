@@ -68,3 +68,58 @@ class MpXpRunner:
 
 	def stopTopo(self):
 		self.mpTopo.stopNetwork()
+
+
+class MpPersistentXpRunner(MpXpRunner):
+	"""
+	Keeps the topology up between experiments: the first one builds the
+	hosts, links and routes, the next ones on a compatible topology (same
+	paths and subnets) only reapply the tc parameters of the links
+	"""
+	def __init__(self, builderType):
+		self.builderType = builderType
+		self.topoParam = None
+		self.mpTopo = None
+		self.mpTopoConfig = None
+
+	def run(self, topoParamFile, xpParamFile):
+		self.defParamXp(xpParamFile)
+		topoParam = MpParamTopo(topoParamFile)
+		if self.mpTopo is not None and self.compatible(topoParam):
+			self.updateTopo(topoParam)
+		else:
+			self.stopTopo()
+			self.topoParam = topoParam
+			self.defBuilder(self.builderType)
+			self.defTopo()
+			self.defConfig()
+			self.startTopo()
+			self.mpTopoConfig.reconfigure = False
+		self.runXp()
+		self.mpTopo.logFile.flush()
+
+	def compatible(self, topoParam):
+		old = self.topoParam
+		if len(old.linkCharacteristics) != len(topoParam.linkCharacteristics):
+			return False
+		for key in (MpParamTopo.LSUBNET, MpParamTopo.RSUBNET, MpTopo.topoAttr):
+			if old.getParam(key) != topoParam.getParam(key):
+				return False
+		for a, b in zip(old.linkCharacteristics, topoParam.linkCharacteristics):
+			if a.back_up != b.back_up:
+				return False
+		return True
+
+	def updateTopo(self, topoParam):
+		self.topoParam = topoParam
+		self.mpTopo.topoParam = topoParam
+		self.mpTopo.changeNetem = topoParam.getParam(MpParamTopo.changeNetem)
+		self.mpTopoConfig.param = topoParam
+		self.mpTopo.reopenLogFile()
+		self.mpTopo.configureLinks()
+
+	def stopTopo(self):
+		if self.mpTopo is not None:
+			self.mpTopo.stopNetwork()
+			self.mpTopo.closeLogFile()
+			self.mpTopo = None
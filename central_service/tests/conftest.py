@@ -0,0 +1,14 @@
+# Tests run from anywhere: the modules import each other from the central_service root
+# (as agent.py does) and the loggers write to ./logs, kept out of the tree
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from training.learner import episode_segments, episode_gradients
+from training.returns import discount, discounted_returns, gae_advantages, compute_entropy
+from training.benchmark_returns import loop_returns, loop_discount, loop_entropy
+
+S_INFO, S_LEN, A_DIM = 6, 8, 2
+GAMMA = 0.99
+
+
+def episode(steps=12, seed=0):
+    rng = np.random.RandomState(seed)
+    indices = np.array([i for i in range(steps) if i != 6]) # two segments after the first step
+    return {
+        'f_batch': rng.uniform(0.0, 1.0, size=(steps, S_INFO)),
+        'indices': indices,
+        'a_batch': np.eye(A_DIM)[rng.randint(0, A_DIM, size=len(indices))],
+        'r_batch': rng.normal(size=len(indices)),
+    }
+
+
+def networks(tf, a3c, sess, gae_lambda=None):
+    actor = a3c.ActorNetwork(sess, state_dim=[S_INFO, S_LEN], action_dim=A_DIM, learning_rate=0.0001)
+    critic = a3c.CriticNetwork(sess, state_dim=[S_INFO, S_LEN], learning_rate=0.001)
+    trainer = a3c.FusedTrainer(sess, actor, critic, gae_lambda=gae_lambda)
+    sess.run(tf.global_variables_initializer())
+    return actor, critic, trainer
+
+
+@pytest.mark.parametrize('steps', [1, 2, 100])
+def test_vectorized_returns_match_loops(steps):
+    rng = np.random.RandomState(steps)
+    r_batch = rng.randn(steps, 1)
+    probs = rng.dirichlet(np.ones(A_DIM), size=steps)
+    for bootstrap in (0.0, 0.5):
+        assert np.allclose(discounted_returns(r_batch, bootstrap, GAMMA), loop_returns(r_batch, bootstrap, GAMMA))
+    assert np.allclose(discount(r_batch[:, 0], GAMMA), loop_discount(r_batch[:, 0], GAMMA))
+    assert np.allclose(compute_entropy(probs), [loop_entropy(p) for p in probs])
+
+
+def test_entropy():
+    assert np.allclose(compute_entropy([0.5, 0.5]), np.log(2))
+    assert np.allclose(compute_entropy([[1.0, 0.0], [0.0, 1.0]]), [0.0, 0.0])
+
+
+def test_gae_lambda_one_is_return_minus_value():
+    rng = np.random.RandomState(0)
+    r_batch, v_batch = rng.randn(20, 1), rng.randn(20, 1)
+    for bootstrap in (0.0, 0.5):
+        assert np.allclose(gae_advantages(r_batch, v_batch, bootstrap, GAMMA, 1.0),
+                           discounted_returns(r_batch, bootstrap, GAMMA) - v_batch)
+
+
+def test_terminal_and_bootstrap():
+    ''' the reward of the last step is replaced by the bootstrap value (0 for a terminal state) '''
+    r_batch = np.array([[1.0], [2.0], [3.0]])
+    terminal = discounted_returns(r_batch, 0.0, GAMMA)
+    assert np.allclose(terminal[:, 0], [1.0 + GAMMA * 2.0, 2.0, 0.0])
+    # bootstrapped: + gamma^(T-1-t) * V
+    bootstrapped = discounted_returns(r_batch, 10.0, GAMMA)
+    assert np.allclose(bootstrapped - terminal, 10.0 * GAMMA ** np.array([[2], [1], [0]]))
+
+    v_batch = np.array([[0.5], [1.0], [4.0]])
+    advantages = gae_advantages(r_batch, v_batch, 10.0, GAMMA, 0.0) # lambda 0: the TD errors
+    assert np.allclose(advantages[:, 0], [1.0 + GAMMA * 1.0 - 0.5, 2.0 + GAMMA * 4.0 - 1.0, 10.0 - 4.0])
+    assert np.allclose(gae_advantages(r_batch, v_batch, 0.0, GAMMA, 0.0)[-1], -4.0)
+
+
+def test_segments_of_an_episode():
+    segments = episode_segments(episode(), S_LEN)
+    assert [len(s[0]) for s in segments] == [5, 5]
+    assert [s[3] for s in segments] == [False, True]
+
+
+@pytest.mark.parametrize('gae_lambda', [None, 0.95])
+def test_fused_step_matches_per_episode_step(gae_lambda):
+    ''' accumulate + apply: the same RMSProp step as applying the episode gradients (baseline) '''
+    tf = pytest.importorskip('tensorflow')
+    pytest.importorskip('tflearn')
+    from training import a3c
+
+    results = []
+    for fused in (True, False):
+        with tf.Graph().as_default(), tf.Session() as sess:
+            tf.set_random_seed(0)
+            actor, critic, trainer = networks(tf, a3c, sess, gae_lambda)
+            if len(results) > 0:
+                actor.set_network_params(results[0][2])
+                critic.set_network_params(results[0][3])
+            initial = (actor.get_network_params(), critic.get_network_params())
+
+            for seed in range(3):
+                if fused:
+                    for s_batch, a_batch, r_batch, terminal in episode_segments(episode(seed=seed), S_LEN):
+                        trainer.accumulate(s_batch, a_batch, r_batch, terminal)
+                    assert trainer.pending() == 2
+                    trainer.apply()
+                    assert trainer.pending() == 0
+                else:
+                    actor_g, critic_g, _ = episode_gradients(episode(seed=seed), trainer, S_LEN)
+                    actor.apply_gradients(actor_g)
+                    critic.apply_gradients(critic_g)
+            results.append((actor.get_network_params(), critic.get_network_params()) + initial)
+
+    for fused, baseline in zip(results[0][0] + results[0][1], results[1][0] + results[1][1]):
+        assert np.allclose(fused, baseline, atol=1e-5)
+
+
+@pytest.mark.parametrize('gae_lambda', [None, 0.95])
+@pytest.mark.parametrize('terminal', [True, False])
+def test_fused_targets_match_numpy_reference(gae_lambda, terminal):
+    ''' FusedTrainer.td_batch / R_batch (in-graph reverse_discount) == gae_advantages / discounted_returns '''
+    tf = pytest.importorskip('tensorflow')
+    pytest.importorskip('tflearn')
+    from training import a3c
+
+    s_batch, a_batch, r_batch, _ = episode_segments(episode(), S_LEN)[-1]
+    with tf.Graph().as_default(), tf.Session() as sess:
+        tf.set_random_seed(0)
+        actor, critic, trainer = networks(tf, a3c, sess, gae_lambda)
+        td_batch, R_batch, v_batch = sess.run([trainer.td_batch, trainer.R_batch, critic.out],
+                                              feed_dict=trainer.feed_dict(s_batch, a_batch, r_batch, terminal))
+
+    bootstrap = 0.0 if terminal else v_batch[-1, 0]
+    if gae_lambda is None:
+        R_reference = discounted_returns(r_batch, bootstrap, a3c.GAMMA)
+        td_reference = R_reference - v_batch
+    else:
+        td_reference = gae_advantages(r_batch, v_batch, bootstrap, a3c.GAMMA, gae_lambda)
+        R_reference = td_reference + v_batch
+    assert np.allclose(td_batch, td_reference, atol=1e-5)
+    assert np.allclose(R_batch, R_reference, atol=1e-5)
@@ -0,0 +1,101 @@
+import json
+import socket
+import threading
+
+import zmq
+
+from centraltrainer.async_frontend import AsyncRequestFrontend
+from centraltrainer.channel import RequestChannel
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return str(s.getsockname()[1])
+
+
+def request(stream_id, conn_id=1):
+    path = {'PathID': 1, 'SmoothedRTT': 0.01, 'Bandwidth': 0, 'Packets': 0, 'Retransmissions': 0, 'Losses': 0}
+    return json.dumps({'StreamID': stream_id, 'ConnectionID': conn_id, 'RequestPath': '/{}'.format(stream_id),
+                       'Path1': path, 'Path2': dict(path, PathID=3)}).encode('utf-8')
+
+
+def test_batch_of_concurrent_requests():
+    ''' Requests of several clients in flight at once through the ROUTER front end share one batch '''
+    clients = 4
+    port = free_port()
+    channel = RequestChannel()
+    frontend = AsyncRequestFrontend(1, "frontend-test", channel=channel, port=port, bind=True)
+    frontend.start()
+
+    context = zmq.Context()
+    responses = {}
+
+    def client(stream_id):
+        sock = context.socket(zmq.REQ)
+        sock.connect("tcp://127.0.0.1:%s" % port)
+        sock.send_multipart([str(stream_id).encode('utf-8'), request(stream_id)])
+        if sock.poll(5000):
+            responses[stream_id] = sock.recv_multipart()
+        sock.close(linger=0)
+
+    threads = [threading.Thread(target=client, args=(stream_id,)) for stream_id in range(5, 5 + 2 * clients, 2)]
+    for thread in threads:
+        thread.start()
+    try:
+        # long enough a window for all the clients to get their request through
+        batch = channel.get_batch(window=2.0, max_size=clients)
+        assert len(batch) == clients
+
+        for slot in batch:
+            slot.complete([str(slot.request['StreamID']).encode('utf-8'), b'3'])
+        for thread in threads:
+            thread.join(5)
+        assert sorted(responses) == sorted(int(slot.request['StreamID']) for slot in batch)
+        assert all(int(response[0]) == stream_id and response[1] == b'3' for stream_id, response in responses.items())
+    finally:
+        frontend.stophandler()
+        frontend.join()
+        context.term()
+
+
+def test_window_zero_drains_queued_requests():
+    channel = RequestChannel()
+    for stream_id in (5, 7, 9):
+        channel.submit({'StreamID': stream_id})
+    batch = channel.get_batch(window=0.0, max_size=2)
+    assert [slot.request['StreamID'] for slot in batch] == [5, 7]
+    assert [slot.request['StreamID'] for slot in channel.get_batch(window=0.0, max_size=8)] == [9]
+
+
+def test_wait_response_woken_by_cancel():
+    ''' No periodic wake-up: the handler waiting on a slot returns once it is cancelled '''
+    channel = RequestChannel()
+    slot = channel.submit({'StreamID': 1})
+    responses = []
+    waiter = threading.Thread(target=lambda: responses.append(channel.wait_response(slot)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    assert slot.cancel()
+    waiter.join(1.0)
+    assert not waiter.is_alive() and responses == [None]
+    # the agent answering afterwards is ignored
+    assert not slot.complete([b'1', b'1'])
+
+
+def test_wait_response_expires_with_fallback():
+    channel = RequestChannel(budget=0.05, fallback=lambda request: [b'1', b'3'])
+    slot = channel.submit({'StreamID': 1})
+    assert channel.wait_response(slot) == [b'1', b'3'] and slot.fallback
+
+
+def test_drain_after_end_of_run():
+    channel = RequestChannel()
+    end_of_run = threading.Event()
+    end_of_run.set()
+    channel.interrupt()
+    slot = channel.submit({'StreamID': 1}) # arrived after the end of the run
+    assert channel.get_batch(end_of_run=end_of_run, idle_check=None) == []
+    assert channel.drain() == [slot] and channel.empty()
@@ -0,0 +1,102 @@
+import queue
+
+import pytest
+
+from centraltrainer.collector import Collector
+
+
+@pytest.fixture
+def collector():
+    collector = Collector(1, "collector-test", queue=queue.Queue(100), port="5999")
+    yield collector
+    collector.close()
+
+
+def completion(seq, episode='e1', conn_id=7):
+    return {'Episode': episode, 'Sequence': seq, 'ConnectionID': conn_id, 'StreamID': 5 + 2 * seq,
+            'Path': '/{}'.format(seq), 'CompletionTime': 0.1}
+
+
+def end_of_episode(total, episode='e1'):
+    return {'Episode': episode, 'Sequence': total, 'EndOfEpisode': True, 'Total': total}
+
+
+def test_late_completions_are_dropped(collector):
+    assert collector.sequence(completion(0)) == [completion(0)]
+    # the end-of-episode timeout expires with message 1 still in flight
+    summary, = collector.finish_episodes(timeout=0.0)
+    assert summary['Delivered'] == 1 and not summary['EndOfEpisode']
+
+    # the rest of the episode shows up during the next run: not delivered again
+    assert collector.sequence(completion(1)) == []
+    assert collector.sequence(end_of_episode(2)) == []
+    assert collector.memory_stats()['late'] == 1
+    assert collector.finish_episodes(timeout=0.0) == []
+
+    # other episodes are not affected
+    assert collector.sequence(completion(0, episode='e2')) == [completion(0, episode='e2')]
+
+
+def test_overflow_marks_the_episode_incomplete():
+    collector = Collector(1, "collector-test", queue=queue.Queue(2), port="5999")
+    try:
+        for seq in range(3):
+            for stream in collector.sequence(completion(seq)):
+                collector.putrequest(stream)
+        collector.sequence(end_of_episode(3))
+
+        # the oldest completion made room for the last one
+        assert [stream['Sequence'] for stream in collector._queue.queue] == [1, 2]
+        summary, = collector.finish_episodes(timeout=0.0)
+        assert summary['EndOfEpisode'] and summary['Dropped'] == 1 and summary['Missing'] == 1
+        assert collector.memory_stats()['overflow'] == 1
+    finally:
+        collector.close()
+
+
+def test_out_of_order_completions(collector):
+    assert collector.sequence(completion(1)) == []
+    assert collector.sequence(completion(2)) == []
+    assert collector.sequence(completion(1)) == [] # duplicate
+    assert collector.sequence(completion(0)) == [completion(0), completion(1), completion(2)]
+    assert collector.sequence(completion(0)) == [] # duplicate of a delivered one
+
+    collector.sequence(end_of_episode(3))
+    summary, = collector.finish_episodes(timeout=0.0)
+    assert summary == {'Episode': 'e1', 'Total': 3, 'Delivered': 3, 'Dropped': 0, 'Missing': 0, 'Gaps': 1,
+                       'Skipped': 0, 'EndOfEpisode': True}
+
+
+def test_end_of_episode_with_a_missing_completion(collector):
+    delivered = []
+    for message in (completion(0), completion(2), completion(3), end_of_episode(4)):
+        delivered += collector.sequence(message)
+    assert delivered == [completion(0)]
+
+    # message 1 never arrives: what waited behind it is released, in order
+    summary, = collector.finish_episodes(timeout=0.05)
+    assert [stream['Sequence'] for stream in collector._queue.queue] == [2, 3]
+    assert summary['Missing'] == 1 and summary['Delivered'] == 3 and summary['EndOfEpisode']
+
+
+def test_reorder_buffer_is_bounded():
+    collector = Collector(1, "collector-test", queue=queue.Queue(3), port="5999")
+    try:
+        # message 0 is missing: at most 3 completions wait for it, then it is given up on
+        delivered = []
+        for seq in range(1, 5):
+            delivered += collector.sequence(completion(seq))
+        assert [stream['Sequence'] for stream in delivered] == [1, 2, 3, 4]
+        assert collector.memory_stats()['reorder_buffered'] == 0
+        assert collector.sequence(completion(0)) == [] # too late
+
+        collector.sequence(end_of_episode(5))
+        summary, = collector.finish_episodes(timeout=0.0)
+        assert summary['Skipped'] == 1 and summary['Missing'] == 1 and summary['Delivered'] == 4
+    finally:
+        collector.close()
+
+
+def test_unsequenced_messages_pass_through(collector):
+    message = {'StreamID': 5, 'Path': '/', 'CompletionTime': 0.1}
+    assert collector.sequence(message) == [message]
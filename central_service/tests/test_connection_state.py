@@ -0,0 +1,29 @@
+from utils.connection_state import ConnectionTable
+
+
+def test_evicted_connection_restored_for_the_join():
+    table = ConnectionTable(6, 8, max_steps=10, idle_timeout=1.0)
+    conn = table.get(7)
+    conn.store('r0', 'f0', 'a0', 0.5)
+    conn.store('r1', 'f1', 'a1', None)
+
+    evicted, = table.evict_idle(now=conn.last_seen + 2.0)
+    assert evicted is conn and len(table) == 0
+
+    # the connection comes back: a new state, the evicted steps go first at the end of the run
+    table.get(7).store('r2', 'f2', 'a2', 0.7)
+    table.restore(evicted)
+
+    restored, = [state for conn_id, state in table.items() if conn_id == 7]
+    assert restored.list_states == ['r0', 'r1', 'r2']
+    assert restored.f_batch == ['f0', 'f1', 'f2'] and restored.a_batch == ['a0', 'a1', 'a2']
+    assert restored.entropy_record == [0.5, 0.7]
+
+
+def test_evicted_connection_restored_alone():
+    table = ConnectionTable(6, 8, max_steps=10, idle_timeout=1.0)
+    conn = table.get(3)
+    conn.store('r0', 'f0', 'a0', 0.5)
+    evicted, = table.evict_idle(now=conn.last_seen + 2.0)
+    table.restore(evicted)
+    assert table.ids() == [3] and table.items()[0][1].steps() == 1
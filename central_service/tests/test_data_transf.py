@@ -0,0 +1,74 @@
+from utils.data_transf import splitStreamsPerConnection, joinStatesStreams, DEFAULT_CONNECTION
+
+PAGE = ['/index.html', '/style.css', '/app.js']
+
+
+def states(conn_id, first_stream_id=5):
+    return [{'ConnectionID': conn_id, 'StreamID': first_stream_id + 2 * i, 'RequestPath': path}
+            for i, path in enumerate(PAGE)]
+
+
+def completions(conn_id, first_stream_id=5, order=(2, 0, 1)):
+    return [{'ConnectionID': conn_id, 'StreamID': first_stream_id + 2 * i, 'Path': PAGE[i], 'CompletionTime': 0.1 * i}
+            for i in order]
+
+
+def test_two_connection_episode():
+    ''' Same page loaded over two connections: each one joins its own completions only '''
+    conn_states = {11: states(11), 22: states(22)}
+    stream_info = completions(11) + completions(22, order=(1, 2, 0))
+
+    per_connection, unassigned = splitStreamsPerConnection(list(conn_states), stream_info)
+    assert unassigned == []
+    for conn_id, conn_streams in per_connection.items():
+        assert all(stream['ConnectionID'] == conn_id for stream in conn_streams)
+        indices, streams, missing, extra = joinStatesStreams(conn_states[conn_id], conn_streams)
+        assert list(indices) == [0, 1, 2] and missing == [] and extra == []
+        assert [stream['Path'] for stream in streams] == PAGE
+
+
+def test_completions_without_connection_id():
+    legacy = [dict(stream) for stream in completions(11)]
+    for stream in legacy:
+        del stream['ConnectionID']
+
+    # single connection: attributed to it
+    per_connection, unassigned = splitStreamsPerConnection([11], legacy)
+    assert len(per_connection[11]) == 3 and unassigned == []
+
+    # several connections: cannot tell which one
+    per_connection, unassigned = splitStreamsPerConnection([11, 22], legacy)
+    assert per_connection == {11: [], 22: []} and len(unassigned) == 3
+    assert DEFAULT_CONNECTION not in per_connection
+
+
+def test_strict_join_leaves_ambiguous_paths_missing():
+    ''' /a.js requested twice, one of its completions was lost: no guess on which one '''
+    states = [{'StreamID': 5, 'RequestPath': '/index.html'}, {'StreamID': 7, 'RequestPath': '/a.js'},
+              {'StreamID': 9, 'RequestPath': '/a.js'}]
+    # client side stream ids, not the ones of the requests
+    stream_info = [{'StreamID': 105, 'Path': '/index.html'}, {'StreamID': 109, 'Path': '/a.js'}]
+
+    indices, _, missing, extra = joinStatesStreams(states, [dict(s) for s in stream_info])
+    assert list(indices) == [0, 1] and missing == [2]
+
+    indices, _, missing, extra = joinStatesStreams(states, [dict(s) for s in stream_info], strict=True)
+    assert list(indices) == [0] and missing == [1, 2] and len(extra) == 1
+
+
+def test_join_duplicate_and_missing_ids():
+    states = [{'StreamID': 5, 'RequestPath': '/a.js'}, {'StreamID': 7, 'RequestPath': '/a.js'},
+              {'StreamID': 9, 'RequestPath': '/b.css'}, {'StreamID': 11, 'RequestPath': '/c.png'}]
+    stream_info = [
+        {'StreamID': 7, 'Path': '/a.js', 'CompletionTime': 0.7},    # exact match of the second /a.js
+        {'StreamID': 99, 'Path': '/a.js', 'CompletionTime': 0.5},   # other id: the first /a.js left
+        {'StreamID': 9, 'Path': '/b.css', 'CompletionTime': 0.9},
+        {'StreamID': 9, 'Path': '/b.css', 'CompletionTime': 0.9},   # duplicate
+        {'StreamID': 13, 'Path': '/d.html', 'CompletionTime': 1.3}, # no such request
+    ]                                                               # /c.png never completed
+    indices, streams, missing, extra = joinStatesStreams(states, stream_info)
+
+    assert list(indices) == [0, 1, 2] and missing == [3]
+    assert [s['CompletionTime'] for s in streams] == [0.5, 0.7, 0.9]
+    assert [s['StreamID'] for s in streams] == [5, 7, 9] # ids of the states
+    assert sorted(s['Path'] for s in extra) == ['/b.css', '/d.html']
@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from utils.featurizer import Featurizer, request_features, lowestRTTPathID
+from utils.wire_format import encode_request
+
+
+def request(stream_id, rtt1=0.01, rtt2=0.02, first=3):
+    paths = {1: {'PathID': 1, 'SmoothedRTT': rtt1, 'Bandwidth': 0, 'Packets': 10, 'Retransmissions': 1, 'Losses': 2},
+             3: {'PathID': 3, 'SmoothedRTT': rtt2, 'Bandwidth': 0, 'Packets': 20, 'Retransmissions': 0, 'Losses': 4}}
+    other = 1 if first == 3 else 3
+    return {'StreamID': stream_id, 'ConnectionID': 9, 'RequestPath': '/{}'.format(stream_id),
+            'Path1': paths[first], 'Path2': paths[other]}
+
+
+def test_paths_in_path_id_order():
+    featurizer = Featurizer()
+    for frame in (encode_request(request(5)), json.dumps(request(5)).encode('utf-8')):
+        record, _ = featurizer.parse(frame)
+        assert list(record['PathID']) == [1, 3]
+        assert list(record['SmoothedRTT']) == [0.01, 0.02]
+        assert list(record['Losses']) == [2, 4]
+        assert lowestRTTPathID(record) == 1
+
+
+def test_ring_wrap_around():
+    ''' A record is reused after `capacity` more requests, copies stay valid '''
+    featurizer = Featurizer(capacity=4)
+    first, _ = featurizer.parse(encode_request(request(5)))
+    kept = first.copy()
+    records = [featurizer.parse(encode_request(request(7 + 2 * i)))[0] for i in range(4)]
+
+    assert records[-1]['StreamID'] == 13
+    assert first['StreamID'] == 13 # same slot of the ring, overwritten
+    assert kept['StreamID'] == 5 and kept['RequestPath'] == '/5'
+    assert [r['StreamID'] for r in records[:3]] == [7, 9, 11]
+
+
+def test_features():
+    featurizer = Featurizer()
+    record, _ = featurizer.parse(encode_request(request(5)))
+    features = request_features(record, (10, 100))
+    expected = [(10 - 1.0) / 99.0, 1.0, (10.0 - 1.0) / 120.0, (20.0 - 1.0) / 120.0, 3 / 20.0, 4 / 20.0]
+    assert np.allclose(features[0], expected)
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from environment import gym_env
+from environment.gym_env import PageLoadEnv
+
+
+def request(stream_id, path, srtt):
+    # REQUEST_RECORD values, path 1 first
+    return (stream_id, 7, path, (1, 3), (srtt, 0.02), (10, 10), (100, 100), (0, 1), (0, 0))
+
+
+class FakeBackend:
+    '''
+        Page load of 3 requests, /a requested twice. The completions carry
+        server side StreamIDs (as under MininetBackend), not the ones of the requests
+    '''
+    bdw = (10, 10)
+    conn_id = 7
+
+    def __init__(self, server_ids=True):
+        self.requests = [request(5, '/a', 0.01), request(7, '/b', 0.05), request(9, '/a', 0.03)]
+        offset = 1000 if server_ids else 0
+        # completions seen after each step, the last ones at the end of the page load
+        self.completions = [
+            [],
+            [{'StreamID': 7 + offset, 'Path': '/b', 'CompletionTime': 0.4}],
+            [{'StreamID': 5 + offset, 'Path': '/a', 'CompletionTime': 0.1},
+             {'StreamID': 9 + offset, 'Path': '/a', 'CompletionTime': 0.2}],
+        ]
+        self._next = 0
+        self._step = 0
+
+    def start(self):
+        self._next = self._step = 0
+        return self.next()
+
+    def next(self):
+        if self._next == len(self.requests):
+            return None
+        self._next += 1
+        return self.requests[self._next - 1]
+
+    def send(self, path_id):
+        return path_id
+
+    def poll(self):
+        self._step += 1
+        return self.completions[self._step - 1]
+
+    finish = poll
+
+    def close(self):
+        pass
+
+
+def run(backend, actions):
+    env = PageLoadEnv(backend)
+    env.reset()
+    rewards = []
+    for action in actions:
+        _, reward, done, info = env.step(action)
+        rewards.append(reward)
+    assert done
+    return rewards, info['episode']
+
+
+@pytest.mark.parametrize('actions', [[0, 1, 0], [1, 1, 0]])
+def test_rewards_with_server_stream_ids(actions):
+    rewards, episode = run(FakeBackend(server_ids=True), actions)
+    expected, _ = run(FakeBackend(server_ids=False), actions)
+
+    assert rewards[0] == 0.0
+    assert rewards[1] != 0.0 and rewards[2] != 0.0
+    np.testing.assert_allclose(rewards, expected)
+    # every decision is rewarded once, as in the episode of the learner
+    assert episode['indices'].tolist() == [0, 1, 2]
+    np.testing.assert_allclose(sum(rewards), episode['r_batch'].sum())
+
+
+class FakeSession:
+    ''' Pairs of a Session whose page loads never issue a request '''
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.index = 0
+
+    def nextPair(self):
+        if self.index >= len(self.pairs):
+            return None
+        self.index += 1
+        return self.pairs[self.index - 1]
+
+    def rewind(self):
+        self.index = 0
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+class EmptyPageLoad:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def request(self):
+        return None
+
+
+@pytest.mark.parametrize('pairs', [0, 3])
+def test_session_without_requests(monkeypatch, pairs):
+    monkeypatch.setattr(gym_env, 'loadObjects', lambda filepath: [])
+    monkeypatch.setattr(gym_env, 'PageLoad', EmptyPageLoad)
+    topo = {'paths': [{'bandwidth': 10}, {'bandwidth': 10}]}
+    backend = gym_env.SimulatorBackend(FakeSession([(topo, 'graph{}'.format(i)) for i in range(pairs)]), seed=0)
+    with pytest.raises(RuntimeError, match='issues a request'):
+        backend.start()
@@ -0,0 +1,49 @@
+import os
+import signal
+import subprocess
+import sys
+
+from utils.logger import config_logger, flush_logs
+
+NN_TESTING = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'nn_testing')
+
+
+def test_default_format_is_text(workdir):
+    log = config_logger('logger-test-text', './logs/text.log')
+    log.info('hello')
+    flush_logs()
+    with open('./logs/text.log') as fp:
+        line, = fp.read().splitlines()
+    assert line.endswith(' - logger-test-text - INFO - hello')
+
+
+def test_message_format(workdir):
+    log = config_logger('logger-test-raw', './logs/raw.log', fmt='%(message)s')
+    log.info('0.1\t1\t')
+    flush_logs()
+    with open('./logs/raw.log') as fp:
+        assert fp.read() == '0.1\t1\t\n'
+
+
+SIGTERM_SCRIPT = '''
+import signal, sys
+from logger import config_logger
+log = config_logger('nn_inference', sys.argv[1], fmt='%(message)s')
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+for i in range(1000):
+    log.info(str(i))
+print('ready', flush=True)
+signal.pause()
+'''
+
+
+def test_lines_written_on_sigterm(workdir):
+    # nn_inference.py is restarted with killall: the queued lines must reach the file
+    logfile = os.path.join(str(workdir), 'log')
+    proc = subprocess.Popen([sys.executable, '-c', SIGTERM_SCRIPT, logfile],
+                            cwd=NN_TESTING, stdout=subprocess.PIPE)
+    assert proc.stdout.readline().strip() == b'ready'
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 0
+    with open(logfile) as fp:
+        assert fp.read().splitlines() == [str(i) for i in range(1000)]
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from training.numpy_actor import NumpyActor, actor_param_shapes, conv_1d_same, S_INFO, S_LEN, A_DIM
+
+NN_TESTING = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'nn_testing')
+SHARED_MODULES = ['numpy_actor', 'wire_format', 'featurizer', 'state_history', 'connection_state', 'logger']
+
+
+def fixed_params(seed=0):
+    rng = np.random.RandomState(seed)
+    return [rng.normal(0.0, 0.3, size=shape).astype(np.float32) for shape in actor_param_shapes()]
+
+
+def fixed_states(count=64, seed=1):
+    # normalized features, a bit outside [0, 1] as well
+    return np.random.RandomState(seed).uniform(-0.5, 1.5, size=(count, S_INFO, S_LEN))
+
+
+def test_conv_1d_same_reference():
+    ''' Against a direct 'same' convolution (tflearn/TF pad the extra step after) '''
+    rng = np.random.RandomState(0)
+    x = rng.normal(size=(3, 5, 2)).astype(np.float32)
+    W = rng.normal(size=(4, 1, 2, 7)).astype(np.float32)
+    b = rng.normal(size=(7,)).astype(np.float32)
+
+    expected = np.tile(b, (3, 5, 1))
+    for t in range(5):
+        for k in range(4):
+            step = t + k - 1 # pad_before = (4 - 1) // 2
+            if 0 <= step < 5:
+                expected[:, t, :] += x[:, step, :] @ W[k, 0]
+    assert np.allclose(conv_1d_same(x, W, b), expected, atol=1e-5)
+
+
+def test_npz_round_trip(tmp_path):
+    actor = NumpyActor(fixed_params())
+    actor.save_npz(str(tmp_path / 'policy.npz'))
+    exported = NumpyActor.from_npz(str(tmp_path / 'policy.npz'))
+    states = fixed_states()
+    assert np.array_equal(actor.predict(states), exported.predict(states))
+
+
+def test_nn_testing_shares_the_modules():
+    ''' nn_testing runs flat (python3 nn_inference.py), its modules are symlinks to these ones '''
+    for name in SHARED_MODULES:
+        path = os.path.join(NN_TESTING, name + '.py')
+        assert os.path.islink(path), name
+    subprocess.check_call([sys.executable, '-c', 'import ' + ', '.join(SHARED_MODULES)], cwd=NN_TESTING)
+
+
+def test_conv_1d_same_matches_tflearn():
+    tf = pytest.importorskip('tensorflow')
+    tflearn = pytest.importorskip('tflearn')
+
+    rng = np.random.RandomState(0)
+    x = rng.normal(size=(3, 1, S_LEN)).astype(np.float32) # [batch, steps, channels], as split_2/split_3
+    W = rng.normal(size=(4, 1, S_LEN, 16)).astype(np.float32)
+    b = rng.normal(size=(16,)).astype(np.float32)
+
+    with tf.Graph().as_default(), tf.Session() as sess:
+        inputs = tf.placeholder(tf.float32, shape=[None, 1, S_LEN])
+        conv = tflearn.conv_1d(inputs, 16, 4, activation='linear', scope='conv')
+        sess.run(tf.global_variables_initializer())
+        sess.run([tf.assign(conv.W, W), tf.assign(conv.b, b)])
+        expected = sess.run(conv, feed_dict={inputs: x})
+    assert np.allclose(conv_1d_same(x, W, b), expected, atol=1e-5)
+
+
+def test_forward_pass_matches_actor_network():
+    tf = pytest.importorskip('tensorflow')
+    pytest.importorskip('tflearn')
+    from training import a3c
+
+    params = fixed_params()
+    states = fixed_states()
+    with tf.Graph().as_default(), tf.Session() as sess:
+        actor = a3c.ActorNetwork(sess, state_dim=[S_INFO, S_LEN], action_dim=A_DIM, learning_rate=0.0001)
+        sess.run(tf.global_variables_initializer())
+        actor.set_network_params(params)
+        expected = actor.predict(states)
+    assert np.allclose(NumpyActor(params).predict(states), expected, atol=1e-5)
@@ -0,0 +1,86 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+MINITOPO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'minitopo')
+sys.path.insert(0, MINITOPO)
+
+import mpPersistent
+
+# serving process with a runner that records its calls instead of running mininet
+SERVE_SCRIPT = '''
+import sys
+import mpPersistent
+
+class FakeRunner:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def run(self, topoParamFile, xpParamFile):
+        self.record('run', topoParamFile, xpParamFile)
+        if xpParamFile.endswith('fail'):
+            raise Exception('experiment failed')
+
+    def stopTopo(self):
+        self.record('stopTopo')
+
+    def record(self, *call):
+        with open(self.calls, 'a') as f:
+            f.write(' '.join(call) + '\\n')
+
+mpPersistent.serve(socketPath=sys.argv[1], runner=FakeRunner(sys.argv[2]))
+'''
+
+
+@pytest.fixture
+def server(workdir):
+    socket_path = str(workdir / 'minitopo.sock')
+    calls = str(workdir / 'calls')
+    proc = subprocess.Popen([sys.executable, '-c', SERVE_SCRIPT, socket_path, calls], cwd=MINITOPO)
+    deadline = time.time() + 10
+    probe = mpPersistent.connect(socket_path)
+    while probe is None:
+        assert proc.poll() is None and time.time() < deadline
+        time.sleep(0.05)
+        probe = mpPersistent.connect(socket_path)
+    probe.close() # served as a connection without a request
+    yield proc, socket_path, calls
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+
+
+def read_calls(calls):
+    with open(calls) as f:
+        return f.read().splitlines()
+
+
+def test_run_and_stop(server, workdir):
+    proc, socket_path, calls = server
+    assert mpPersistent.runPersistent('topo', 'xp', socketPath=socket_path) == 0
+    assert mpPersistent.runPersistent('topo', 'xp_fail', socketPath=socket_path) == 1
+    mpPersistent.stopServer(socketPath=socket_path)
+    assert proc.wait(timeout=10) == 0
+
+    topo, xp = str(workdir / 'topo'), str(workdir / 'xp')
+    assert read_calls(calls) == [
+        'run {} {}'.format(topo, xp),
+        'run {} {}_fail'.format(topo, xp),
+        'stopTopo', # a failed experiment starts from a new topology
+        'stopTopo', # exit
+    ]
+    assert not os.path.exists(socket_path)
+
+
+def test_sigterm_stops_the_topology(server, workdir):
+    # cleanMininet: pkill -f 'mpPerf.py [-]s'
+    proc, socket_path, calls = server
+    assert mpPersistent.runPersistent('topo', 'xp', socketPath=socket_path) == 0
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 0
+    assert read_calls(calls)[-1] == 'stopTopo'
+    assert not os.path.exists(socket_path)
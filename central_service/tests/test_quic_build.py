@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'minitopo'))
+
+from mpExperienceQUIC import MpExperienceQUIC
+
+pytestmark = pytest.mark.skipif(not os.path.isfile(MpExperienceQUIC.GO_BIN), reason="go is not installed")
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def xp(workdir, monkeypatch):
+    # GOPATH layout of the mininet VM: the example imports a package of another repository
+    gopath = str(workdir / 'go')
+    monkeypatch.setattr(MpExperienceQUIC, 'GOPATH', gopath)
+    monkeypatch.setattr(MpExperienceQUIC, 'PROJECTS_DIR', gopath + '/src/github.com/lucas-clemente/')
+    monkeypatch.setenv('GO111MODULE', 'off')
+    write(gopath + '/src/github.com/dep/dep/dep.go', 'package dep\n\nconst Version = 1\n')
+    example = gopath + '/src/github.com/lucas-clemente/quic-go/example/main.go'
+    write(example, 'package main\n\nimport "github.com/dep/dep"\n\nfunc main() { println(dep.Version) }\n')
+
+    xp = MpExperienceQUIC.__new__(MpExperienceQUIC)
+    xp.project = 'quic-go'
+    xp.server_go_file = xp.client_go_file = example
+    return xp
+
+
+def test_hash_covers_gopath_dependencies(xp):
+    key = xp.sourcesHash()
+    assert key is not None and xp.sourcesHash() == key
+    write(MpExperienceQUIC.GOPATH + '/src/github.com/dep/dep/dep.go', 'package dep\n\nconst Version = 2\n')
+    assert xp.sourcesHash() != key
+
+
+def test_missing_sources(xp):
+    xp.project = 'mp-quic'
+    with pytest.raises(Exception, match='QUIC sources not found'):
+        xp.sourcesHash()
+
+
+def test_no_cache_without_dependencies(xp):
+    # go list fails (e.g. missing package): built without the cache
+    write(xp.server_go_file, 'package main\n\nimport "github.com/missing/missing"\n\nfunc main() {}\n')
+    assert xp.sourcesHash() is None
@@ -0,0 +1,45 @@
+import numpy as np
+
+from utils.state_history import StateHistory, BatchStateHistory, build_windows
+
+S_INFO, S_LEN = 6, 8
+
+
+def rolled_states(features):
+    ''' States as the agent built them before the ring buffer: np.roll + write the last column '''
+    state = np.zeros((S_INFO, S_LEN))
+    states = []
+    for f in features:
+        state = np.roll(state, -1, axis=1)
+        state[:, -1] = f
+        states.append(state.copy())
+    return np.array(states)
+
+
+def test_history_matches_np_roll():
+    features = np.random.RandomState(0).uniform(size=(3 * S_LEN + 3, S_INFO))
+    history = StateHistory(S_INFO, S_LEN)
+    windows = []
+    for f in features:
+        history.push(f)
+        windows.append(history.window().copy())
+    assert np.array_equal(np.array(windows), rolled_states(features))
+
+
+def test_build_windows_matches_np_roll():
+    features = np.random.RandomState(1).uniform(size=(2 * S_LEN + 5, S_INFO))
+    assert np.array_equal(build_windows(features, S_LEN), rolled_states(features))
+    # shorter than the window: zero history in front
+    assert np.array_equal(build_windows(features[:3], S_LEN), rolled_states(features[:3]))
+
+
+def test_batch_history_reset_of_one_row():
+    features = np.random.RandomState(2).uniform(size=(S_LEN + 2, 2, S_INFO))
+    batch = BatchStateHistory(2, S_INFO, S_LEN)
+    for f in features:
+        batch.push(f)
+    batch.reset(0)
+    batch.push(features[0])
+
+    assert np.array_equal(batch.window()[0], rolled_states(features[:1, 0])[-1])
+    assert np.array_equal(batch.window()[1], rolled_states(np.concatenate([features[:, 1], features[:1, 1]]))[-1])
@@ -0,0 +1,17 @@
+from utils.stream_log import StreamLog, load_stream_log, STREAM_RECORD
+
+
+def test_empty_stream_log(workdir):
+    # a run that logged nothing
+    StreamLog('streams.log').close()
+    records = load_stream_log('streams.log')
+    assert len(records) == 0 and records.dtype == STREAM_RECORD
+
+
+def test_stream_log_round_trip(workdir):
+    log = StreamLog('streams.log')
+    log.append({'Episode': 'e1', 'Sequence': 3, 'StreamID': 5, 'ConnectionID': 7, 'CompletionTime': 0.25,
+                'Path': '/index.html', 'ObjectID': 'o1'})
+    log.close()
+    record, = load_stream_log('streams.log')
+    assert record['episode'] == b'e1' and record['sequence'] == 3 and record['completion_time'] == 0.25
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from utils.wire_format import (encode_request, decode_request, encode_response, decode_response, reject_response,
+                               request_format, split_envelope, UnsupportedFormat, FORMAT_BINARY, FORMAT_JSON, WIRE_VERSION, REJECT)
+
+
+def request(stream_id=7, conn_id=2**63 + 5):
+    return {
+        'StreamID': stream_id,
+        'ConnectionID': conn_id,
+        'Path1': {'PathID': 3, 'SmoothedRTT': 0.042, 'Bandwidth': 10, 'Packets': 100, 'Retransmissions': 2, 'Losses': 1},
+        'Path2': {'PathID': 1, 'SmoothedRTT': 0.012, 'Bandwidth': 20, 'Packets': 50, 'Retransmissions': 0, 'Losses': 0},
+        'RequestPath': '/static/ünïcode.js',
+    }
+
+
+def test_binary_round_trip():
+    frame = encode_request(request())
+    assert frame[0] == WIRE_VERSION
+    decoded, fmt = decode_request(frame)
+    assert fmt == FORMAT_BINARY
+    assert decoded == request()
+
+
+def test_json_request():
+    decoded, fmt = decode_request(json.dumps(request()).encode('utf-8'))
+    assert fmt == FORMAT_JSON and decoded == request()
+
+
+def test_response_in_the_format_of_the_request():
+    response = [b'7', b'3']
+    assert encode_response(response, FORMAT_JSON) == response
+    assert decode_response(encode_response(response, FORMAT_JSON)) == 3
+    assert encode_response(response, FORMAT_BINARY) == [b'7', bytes((WIRE_VERSION, 3))]
+    assert decode_response(encode_response(response, FORMAT_BINARY)) == 3
+
+
+def test_reject():
+    frames = [b'7', b'\x09garbage']
+    with pytest.raises(UnsupportedFormat):
+        request_format(frames[1])
+    with pytest.raises(UnsupportedFormat):
+        request_format(b'')
+    rejected = reject_response(frames)
+    assert rejected == [b'7', REJECT]
+    assert decode_response(rejected) is None # the client falls back to JSON
+
+
+def test_split_envelope():
+    body = [b'7', encode_request(request())]
+    assert split_envelope([b'id1', b'id2', b''] + body) == ([b'id1', b'id2', b''], body)
@@ -2,6 +2,8 @@ import numpy as np
 import tensorflow as tf
 import tflearn
 
+from training.returns import discount, discounted_returns, gae_advantages, compute_entropy
+
 
 GAMMA = 0.99
 A_DIM = 2
@@ -43,19 +45,14 @@ class ActorNetwork(object):
         self.act_grad_weights = tf.placeholder(tf.float32, [None, 1])
 
         # Compute the objective (log action_vector and entropy)
-        self.obj = tf.reduce_sum(tf.multiply(
-                       tf.log(tf.reduce_sum(tf.multiply(self.out, self.acts),
-                                            reduction_indices=1, keep_dims=True)),
-                       -self.act_grad_weights)) \
-                   + ENTROPY_WEIGHT * tf.reduce_sum(tf.multiply(self.out,
-                                                           tf.log(self.out + ENTROPY_EPS)))
+        self.obj = self.objective(self.act_grad_weights)
 
         # Combine the gradients here
         self.actor_gradients = tf.gradients(self.obj, self.network_params)
 
         # Optimization Op
-        self.optimize = tf.train.RMSPropOptimizer(self.lr_rate).\
-            apply_gradients(zip(self.actor_gradients, self.network_params))
+        self.optimizer = tf.train.RMSPropOptimizer(self.lr_rate)
+        self.optimize = self.optimizer.apply_gradients(zip(self.actor_gradients, self.network_params))
 
     def create_actor_network(self):
         with tf.variable_scope('actor'):
@@ -80,6 +77,15 @@ class ActorNetwork(object):
 
             return inputs, out
 
+    def objective(self, act_grad_weights):
+        """ Policy gradient objective weighted by act_grad_weights (the advantages) """
+        return tf.reduce_sum(tf.multiply(
+                   tf.log(tf.reduce_sum(tf.multiply(self.out, self.acts),
+                                        reduction_indices=1, keep_dims=True)),
+                   -act_grad_weights)) \
+               + ENTROPY_WEIGHT * tf.reduce_sum(tf.multiply(self.out,
+                                                       tf.log(self.out + ENTROPY_EPS)))
+
     def train(self, inputs, acts, act_grad_weights):
 
         self.sess.run(self.optimize, feed_dict={
@@ -147,14 +153,14 @@ class CriticNetwork(object):
         self.td = tf.subtract(self.td_target, self.out)
 
         # Mean square error
-        self.loss = tflearn.mean_square(self.td_target, self.out)
+        self.loss = self.objective(self.td_target)
 
         # Compute critic gradient
         self.critic_gradients = tf.gradients(self.loss, self.network_params)
 
         # Optimization Op
-        self.optimize = tf.train.RMSPropOptimizer(self.lr_rate).\
-            apply_gradients(zip(self.critic_gradients, self.network_params))
+        self.optimizer = tf.train.RMSPropOptimizer(self.lr_rate)
+        self.optimize = self.optimizer.apply_gradients(zip(self.critic_gradients, self.network_params))
 
     def create_critic_network(self):
         with tf.variable_scope('critic'):
@@ -179,6 +185,10 @@ class CriticNetwork(object):
 
             return inputs, out
 
+    def objective(self, td_target):
+        """ Mean square error of V(s) against td_target """
+        return tflearn.mean_square(td_target, self.out)
+
     def train(self, inputs, td_target):
         return self.sess.run([self.loss, self.optimize], feed_dict={
             self.inputs: inputs,
@@ -216,61 +226,114 @@ class CriticNetwork(object):
         })
 
 
-def compute_gradients(s_batch, a_batch, r_batch, terminal, actor, critic):
+class FusedTrainer(object):
     """
-    batch of s, a, r is from samples in a sequence
-    the format is in np.array([batch_size, s/a/r_dim])
-    terminal is True when sequence ends as a terminal state
+    Single-pass training step of an actor/critic pair.
+    One sess.run computes V(s), the returns and advantages, and the actor and
+    critic gradients, either returned (compute) or accumulated in graph
+    variables (accumulate). apply() runs both optimizers on the sum of the
+    accumulated gradients and resets them, in one more sess.run.
+    Accumulate the segments of one episode, then apply: one RMSProp step per
+    episode on its summed gradient, as with the gradients of episode_gradients
+    applied one at a time (same effective learning rate).
+    The accumulators are local variables, they are not saved in checkpoints.
     """
-    assert s_batch.shape[0] == a_batch.shape[0]
-    assert s_batch.shape[0] == r_batch.shape[0]
-    ba_size = s_batch.shape[0]
-
-    v_batch = critic.predict(s_batch)
-
-    R_batch = np.zeros(r_batch.shape)
-
-    if terminal:
-        R_batch[-1, 0] = 0  # terminal state
-    else:
-        R_batch[-1, 0] = v_batch[-1, 0]  # boot strap from last state
-
-    for t in reversed(range(ba_size - 1)):
-        R_batch[t, 0] = r_batch[t] + GAMMA * R_batch[t + 1, 0]
-
-    td_batch = R_batch - v_batch
-
-    actor_gradients = actor.get_gradients(s_batch, a_batch, td_batch)
-    critic_gradients = critic.get_gradients(s_batch, R_batch)
-
-    return actor_gradients, critic_gradients, td_batch
-
-
-def discount(x, gamma):
-    """
-    Given vector x, computes a vector y such that
-    y[i] = x[i] + gamma * x[i+1] + gamma^2 x[i+2] + ...
-    """
-    out = np.zeros(len(x))
-    out[-1] = x[-1]
-    for i in reversed(range(len(x)-1)):
-        out[i] = x[i] + gamma*out[i+1]
-    assert x.ndim >= 1
-    # More efficient version:
-    # scipy.signal.lfilter([1],[1,-gamma],x[::-1], axis=0)[::-1]
-    return out
-
-
-def compute_entropy(x):
+    def __init__(self, sess, actor, critic, gamma=GAMMA, gae_lambda=None):
+        self.sess = sess
+        self.actor = actor
+        self.critic = critic
+
+        # Rewards of the episode and whether it ends in a terminal state
+        self.r_batch = tf.placeholder(tf.float32, [None, 1])
+        self.terminal = tf.placeholder(tf.bool, [])
+
+        values = critic.out[:, 0]
+        bootstrap = tf.cond(self.terminal, lambda: tf.constant(0.0), lambda: values[-1])
+
+        # same convention as the NumPy reference (discounted_returns / gae_advantages):
+        # the last reward is replaced by the bootstrap value
+        rewards = tf.concat([self.r_batch[:-1, 0], [bootstrap]], axis=0)
+        if gae_lambda is None:
+            returns = reverse_discount(rewards, gamma)
+            td = returns - values
+        else:
+            deltas = tf.concat([rewards[:-1] + gamma * values[1:] - values[:-1],
+                                [bootstrap - values[-1]]], axis=0)
+            td = reverse_discount(deltas, gamma * gae_lambda)
+            returns = td + values
+
+        # targets, not differentiated through
+        self.td_batch = tf.stop_gradient(tf.expand_dims(td, 1))
+        self.R_batch = tf.stop_gradient(tf.expand_dims(returns, 1))
+
+        self.actor_gradients = tf.gradients(actor.objective(self.td_batch), actor.network_params)
+        self.critic_gradients = tf.gradients(critic.objective(self.R_batch), critic.network_params)
+
+        # In-graph accumulation
+        params = actor.network_params + critic.network_params
+        gradients = self.actor_gradients + self.critic_gradients
+        self.accumulators = [tf.Variable(tf.zeros(param.get_shape()), trainable=False,
+                                         collections=[tf.GraphKeys.LOCAL_VARIABLES])
+                             for param in params]
+        self.count = tf.Variable(0.0, trainable=False, collections=[tf.GraphKeys.LOCAL_VARIABLES])
+
+        self.accumulate_op = tf.group(
+            [acc.assign_add(grad) for acc, grad in zip(self.accumulators, gradients)]
+            + [self.count.assign_add(1.0)])
+
+        n_actor = len(actor.network_params)
+        # same optimizers (and RMSProp slots) as actor.optimize / critic.optimize
+        apply_op = tf.group(
+            actor.optimizer.apply_gradients(zip(self.accumulators[:n_actor], actor.network_params)),
+            critic.optimizer.apply_gradients(zip(self.accumulators[n_actor:], critic.network_params)))
+        with tf.control_dependencies([apply_op]):
+            self.apply_op = tf.group(
+                [acc.assign(tf.zeros_like(acc)) for acc in self.accumulators]
+                + [self.count.assign(0.0)])
+
+        self.sess.run(tf.variables_initializer(self.accumulators + [self.count]))
+
+    def feed_dict(self, s_batch, a_batch, r_batch, terminal):
+        return {
+            self.actor.inputs: s_batch,
+            self.critic.inputs: s_batch,
+            self.actor.acts: a_batch,
+            self.r_batch: r_batch,
+            self.terminal: terminal
+        }
+
+    def compute(self, s_batch, a_batch, r_batch, terminal):
+        """ Actor and critic gradients of a segment and its td_batch, in one sess.run """
+        return self.sess.run([self.actor_gradients, self.critic_gradients, self.td_batch],
+                             feed_dict=self.feed_dict(s_batch, a_batch, r_batch, terminal))
+
+    def accumulate(self, s_batch, a_batch, r_batch, terminal):
+        """ Adds the gradients of the episode to the accumulators, returns td_batch """
+        _, td_batch = self.sess.run([self.accumulate_op, self.td_batch],
+                                    feed_dict=self.feed_dict(s_batch, a_batch, r_batch, terminal))
+        return td_batch
+
+    def pending(self):
+        """ Number of accumulated segments (training batches), since the last apply """
+        return int(self.sess.run(self.count))
+
+    def apply(self):
+        """ One optimizer step on the accumulated gradients (one episode), resets them """
+        self.sess.run(self.apply_op)
+
+    def apply_gradients(self, actor_gradients, critic_gradients):
+        """ actor.apply_gradients + critic.apply_gradients (e.g. gradients of a worker) in one sess.run """
+        feed_dict = {i: d for i, d in zip(self.actor.actor_gradients, actor_gradients)}
+        feed_dict.update({i: d for i, d in zip(self.critic.critic_gradients, critic_gradients)})
+        self.sess.run([self.actor.optimize, self.critic.optimize], feed_dict=feed_dict)
+
+
+def reverse_discount(x, gamma):
     """
-    Given vector x, computes the entropy
-    H(x) = - sum( p * log(p))
+    In-graph version of discount: y[i] = x[i] + gamma * y[i+1]
     """
-    H = 0.0
-    for i in range(len(x)):
-        if 0 < x[i] < 1:
-            H -= x[i] * np.log(x[i])
-    return H
+    return tf.scan(lambda acc, x_t: x_t + gamma * acc, x,
+                   initializer=tf.constant(0.0), reverse=True, back_prop=False)
 
 
 def build_summaries():
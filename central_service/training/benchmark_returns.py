@@ -0,0 +1,85 @@
+'''
+    Returns / advantages / entropy of an episode:
+    previous per-step Python loops vs the vectorized versions in training.returns
+    (their values are checked in tests/test_a3c.py).
+
+    python -m training.benchmark_returns [repeats]
+'''
+import sys
+import time
+import numpy as np
+
+from training import returns
+
+GAMMA = 0.99 # as in a3c
+A_DIM = 2
+
+EPISODE_LENGTHS = [100, 1000, 10000]
+REPEATS = 20
+
+
+def loop_returns(r_batch, bootstrap, gamma):
+    ''' R_batch as it was built before, one step at a time '''
+    ba_size = r_batch.shape[0]
+    R_batch = np.zeros(r_batch.shape)
+    R_batch[-1, 0] = bootstrap
+    for t in reversed(range(ba_size - 1)):
+        R_batch[t, 0] = r_batch[t, 0] + gamma * R_batch[t + 1, 0]
+    return R_batch
+
+
+def loop_discount(x, gamma):
+    out = np.zeros(len(x))
+    out[-1] = x[-1]
+    for i in reversed(range(len(x)-1)):
+        out[i] = x[i] + gamma*out[i+1]
+    return out
+
+
+def loop_entropy(x):
+    H = 0.0
+    for i in range(len(x)):
+        if 0 < x[i] < 1:
+            H -= x[i] * np.log(x[i])
+    return H
+
+
+def timeit(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+    np.random.seed(42)
+
+    print("{:>8} {:>10} {:>12} {:>12} {:>9}".format("steps", "op", "loop(us)", "vector(us)", "speedup"))
+    for steps in EPISODE_LENGTHS:
+        r_batch = np.random.randn(steps, 1)
+        v_batch = np.random.randn(steps, 1)
+        probs = np.random.dirichlet(np.ones(A_DIM), size=steps)
+
+        cases = [
+            ('returns', lambda: loop_returns(r_batch, 0.0, GAMMA),
+                        lambda: returns.discounted_returns(r_batch, 0.0, GAMMA)),
+            ('discount', lambda: loop_discount(r_batch[:, 0], GAMMA),
+                         lambda: returns.discount(r_batch[:, 0], GAMMA)),
+            # once per request before, once per episode (or per batch of requests) now
+            ('entropy', lambda: [loop_entropy(p) for p in probs],
+                        lambda: returns.compute_entropy(probs)),
+            ('gae', None,
+                    lambda: returns.gae_advantages(r_batch, v_batch, 0.0, GAMMA, 0.95)),
+        ]
+        for name, loop_fn, vector_fn in cases:
+            vector = timeit(vector_fn, repeats) * 1e6
+            if loop_fn is None:
+                print("{:>8} {:>10} {:>12} {:>12.1f} {:>9}".format(steps, name, "-", vector, "-"))
+                continue
+            loop = timeit(loop_fn, repeats) * 1e6
+            print("{:>8} {:>10} {:>12.1f} {:>12.1f} {:>8.1f}x".format(steps, name, loop, vector, loop / vector))
+
+
+if __name__ == "__main__":
+    main()
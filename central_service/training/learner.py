@@ -0,0 +1,167 @@
+import os
+import numpy as np
+
+from utils.logger import config_logger
+from utils.state_history import build_windows
+
+
+def episode_segments(episode, s_len):
+    '''
+        Training batches of an episode, one per contiguous run of the steps that
+        joined with a completion (episode['indices']): [(s_batch, a_batch, r_batch, terminal)].
+        Only the run that reaches the end of the episode is terminal,
+        the others bootstrap from V(s) of their last step.
+        The first step is left out since we don't have the control over it
+    '''
+    s_batch = build_windows(episode['f_batch'], s_len)
+    last = len(episode['f_batch']) - 1
+    indices = np.asarray(episode['indices'])
+    a_batch = np.vstack(episode['a_batch'])
+    r_batch = np.reshape(episode['r_batch'], (-1, 1))
+
+    keep = indices > 0
+    indices, a_batch, r_batch = indices[keep], a_batch[keep], r_batch[keep]
+
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    segments = []
+    for idx, a, r in zip(np.split(indices, breaks), np.split(a_batch, breaks), np.split(r_batch, breaks)):
+        if len(idx) > 0:
+            segments.append((s_batch[idx], a, r, idx[-1] == last))
+    return segments
+
+
+def episode_gradients(episode, trainer, s_len):
+    ''' Single training step on an episode (one sess.run per segment): (actor_gradient, critic_gradient, td_loss) '''
+    actor_gradient, critic_gradient, td_batches = None, None, []
+    for s_batch, a_batch, r_batch, terminal in episode_segments(episode, s_len):
+        actor_g, critic_g, td_batch = trainer.compute(s_batch, a_batch, r_batch, terminal=terminal)
+        if actor_gradient is None:
+            actor_gradient, critic_gradient = actor_g, critic_g
+        else:
+            actor_gradient = [g + s for g, s in zip(actor_gradient, actor_g)]
+            critic_gradient = [g + s for g, s in zip(critic_gradient, critic_g)]
+        td_batches.append(td_batch)
+    return actor_gradient, critic_gradient, np.mean(np.concatenate(td_batches))
+
+
+def learner(exp_queue, snapshot, critic_snapshot, config):
+    '''
+        Learner process of the actor/learner split, also the parameter holder
+        of the workers (A3C).
+        Consumes finished episodes from `exp_queue`, applies their gradients and
+        publishes the new actor / critic weights to `snapshot` / `critic_snapshot`,
+        so the serving side (agent workers) never blocks on training.
+        Stops at the None put on `exp_queue` after the last episode.
+
+        An episode is a dict with the per-step feature vectors (f_batch), the steps
+        that joined with a completion (indices) and, for those, the actions (a_batch),
+        rewards (r_batch) and completion times, plus the entropy.
+        Workers that compute the gradients on their own copy of the networks
+        send them along (actor_gradient, critic_gradient, td_loss),
+        otherwise they are computed and accumulated in graph (FusedTrainer).
+        Either way, one optimizer step per episode (as before the split), the new
+        weights are published every `gradient_batch_size` episodes.
+    '''
+    # TensorFlow lives only in this process
+    import tensorflow as tf
+    from training import a3c
+
+    logger = config_logger('learner', './logs/learner.log')
+    logger.info("Run Learner until training stops...")
+
+    s_info, s_len = config['s_info'], config['s_len']
+
+    with tf.Session() as sess:
+        actor = a3c.ActorNetwork(sess,
+                                 state_dim=[s_info, s_len], action_dim=config['a_dim'],
+                                 learning_rate=config['actor_lr_rate'])
+
+        critic = a3c.CriticNetwork(sess,
+                                   state_dim=[s_info, s_len],
+                                   learning_rate=config['critic_lr_rate'])
+
+        trainer = a3c.FusedTrainer(sess, actor, critic, gae_lambda=config['gae_lambda'])
+
+        summary_ops, summary_vars = a3c.build_summaries()
+
+        sess.run(tf.global_variables_initializer())
+        writer = tf.summary.FileWriter(config['summary_dir'], sess.graph)  # training monitor
+        saver = tf.train.Saver()  # save neural net parameters
+
+        # # restore neural net parameters
+        nn_model = config['nn_model']
+        if nn_model is not None:  # nn_model is the path to file
+            saver.restore(sess, nn_model)
+            logger.info("Model restored.")
+
+        # serving side waits for the first weights
+        snapshot.publish(actor.get_network_params())
+        critic_snapshot.publish(critic.get_network_params())
+
+        epoch = config['epoch']
+        # gradients computed by the workers
+        actor_gradient_batch = []
+        critic_gradient_batch = []
+        pending = 0
+
+        while True:
+            episode = exp_queue.get()
+            if episode is None:
+                break
+
+            # Single Training step
+            # ----------------------------------------------------------------------------------------------------
+            if 'actor_gradient' in episode:
+                actor_gradient_batch.append(episode['actor_gradient'])
+                critic_gradient_batch.append(episode['critic_gradient'])
+                td_loss = episode['td_loss']
+            else:
+                td_batches = [trainer.accumulate(s_batch, a_batch, r_batch, terminal=terminal)
+                              for s_batch, a_batch, r_batch, terminal in episode_segments(episode, s_len)]
+                td_loss = np.mean(np.concatenate(td_batches))
+                # the step of this episode, its gradients never leave the graph
+                trainer.apply()
+            pending += 1
+            r_batch = episode['r_batch']
+
+            logger.debug ("====")
+            logger.debug ("Epoch: {}, Worker: {}, Connection: {}".format(epoch, episode['worker'], episode['conn_id']))
+            msg = "TD_loss: {}, Avg_reward: {}, Avg_entropy: {}".format(td_loss, np.mean(r_batch[1:]), np.mean(episode['entropy'][1:]))
+            logger.debug (msg)
+            logger.debug ("====")
+            # ----------------------------------------------------------------------------------------------------
+
+            # Print summary for tensorflow
+            # ----------------------------------------------------------------------------------------------------
+            summary_str = sess.run(summary_ops, feed_dict={
+                    summary_vars[0]: td_loss,
+                    summary_vars[1]: np.mean(r_batch),
+                    summary_vars[2]: np.mean(episode['entropy']),
+                    summary_vars[3]: np.mean(episode['completion_times'])
+                })
+
+            writer.add_summary(summary_str, epoch)
+            writer.flush()
+            # ----------------------------------------------------------------------------------------------------
+
+            # Update gradients
+            if pending >= config['gradient_batch_size']:
+                assert len(actor_gradient_batch) == len(critic_gradient_batch)
+
+                for i in range(len(actor_gradient_batch)):
+                    trainer.apply_gradients(actor_gradient_batch[i], critic_gradient_batch[i])
+
+                actor_gradient_batch = []
+                critic_gradient_batch = []
+                pending = 0
+
+                # new policy for the serving side
+                snapshot.publish(actor.get_network_params())
+                critic_snapshot.publish(critic.get_network_params())
+
+                epoch += 1
+                if epoch % config['model_save_interval'] == 0:
+                    saver.save(sess, os.path.join(config['summary_dir'], "nn_model_ep_" + str(epoch) + ".ckpt"))
+
+        saver.save(sess, os.path.join(config['summary_dir'], "nn_model_ep_" + str(epoch) + ".ckpt"))
+        logger.info("Learner closing gracefully...")
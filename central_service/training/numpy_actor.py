@@ -0,0 +1,169 @@
+import json
+import numpy as np
+
+
+S_INFO = 6
+S_LEN = 8
+A_DIM = 2
+
+# Layers of a3c.ActorNetwork in creation order (= order of actor.get_network_params())
+# (name in create_actor_network, tflearn scope, type, input rows of the state)
+ACTOR_LAYERS = [
+    ('split_0', 'FullyConnected', 'fc', (0, 1)),
+    ('split_1', 'FullyConnected_1', 'fc', (1, 2)),
+    ('split_2', 'Conv1D', 'conv1d', (2, 3)),
+    ('split_3', 'Conv1D_1', 'conv1d', (3, 4)),
+    ('split_4', 'FullyConnected_2', 'fc', (4, 5)),
+    ('split_5', 'FullyConnected_3', 'fc', (5, 6)),
+    ('dense_net_0', 'FullyConnected_4', 'fc', None),
+    ('out', 'FullyConnected_5', 'fc', None),
+]
+
+# version of the exported policy (.npz) layout, bump on incompatible changes
+POLICY_FORMAT = 1
+
+
+def actor_param_shapes(s_dim=(S_INFO, S_LEN), a_dim=A_DIM, filters=128, filter_size=4):
+    '''
+        Shapes of actor.get_network_params(), known without building the graph
+        (e.g. to allocate shared memory for the weights)
+    '''
+    shapes = []
+    merged = 0
+    for _, _, kind, _ in ACTOR_LAYERS[:-2]:
+        if kind == 'fc':
+            shapes += [(1, filters), (filters,)]
+        else:
+            shapes += [(filter_size, 1, s_dim[1], filters), (filters,)]
+        merged += filters # conv_1d runs over a single step, flattens to `filters`
+    shapes += [(merged, filters), (filters,)]
+    shapes += [(filters, a_dim), (a_dim,)]
+    return shapes
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def softmax(x):
+    e = np.exp(x - np.max(x, axis=1, keepdims=True))
+    return e / np.sum(e, axis=1, keepdims=True)
+
+
+def conv_1d_same(x, W, b):
+    '''
+        tflearn.conv_1d (stride 1, padding 'same') on input [batch, steps, channels]
+        W has the tflearn shape [filter_size, 1, in_channels, nb_filter]
+    '''
+    filter_size = W.shape[0]
+    steps = x.shape[1]
+    pad_total = filter_size - 1
+    pad_before = pad_total // 2
+    xpad = np.pad(x, ((0, 0), (pad_before, pad_total - pad_before), (0, 0)), mode='constant')
+
+    out = np.zeros((x.shape[0], steps, W.shape[3]), dtype=x.dtype)
+    for k in range(filter_size):
+        # only taps that hit a real (non padded) step contribute
+        if k + steps <= pad_before or k >= pad_before + steps:
+            continue
+        out += np.matmul(xpad[:, k:k + steps, :], W[k, 0])
+    out += b
+    return out
+
+
+class NumpyActor:
+    '''
+        Pure NumPy forward pass of a3c.ActorNetwork (serving only, no gradients).
+        Reproduces the branch layout of create_actor_network:
+        fully_connected on the last value of rows 0, 1, 4, 5,
+        conv_1d over the history of rows 2, 3, concat, dense relu, softmax
+    '''
+    def __init__(self, params, s_dim=(S_INFO, S_LEN), a_dim=A_DIM):
+        self.s_dim = s_dim
+        self.a_dim = a_dim
+        self.set_network_params(params)
+
+    @classmethod
+    def from_checkpoint(cls, nn_model, scope='actor'):
+        ''' Load the actor weights straight from a tf.train.Saver checkpoint (no graph/session needed) '''
+        import tensorflow as tf
+
+        reader = tf.train.NewCheckpointReader(nn_model)
+        params = []
+        for _, layer_scope, _, _ in ACTOR_LAYERS:
+            params.append(reader.get_tensor('{}/{}/W'.format(scope, layer_scope)))
+            params.append(reader.get_tensor('{}/{}/b'.format(scope, layer_scope)))
+        return cls(params)
+
+    @classmethod
+    def from_npz(cls, filepath):
+        '''
+            Load a policy written by save_npz. Only needs NumPy, so the inference server
+            can (re)start in milliseconds without importing TensorFlow
+        '''
+        with np.load(filepath, allow_pickle=False) as data:
+            spec = json.loads(str(data['spec']))
+            if spec['format'] != POLICY_FORMAT:
+                raise ValueError("Unsupported policy format {} in {}".format(spec['format'], filepath))
+
+            layers = [(l['name'], l['type'], tuple(l['rows']) if l['rows'] is not None else None) for l in spec['layers']]
+            expected = [(name, kind, rows) for name, _, kind, rows in ACTOR_LAYERS]
+            if layers != expected:
+                raise ValueError("Layer spec in {} does not match ActorNetwork".format(filepath))
+
+            params = []
+            for name, _, _ in layers:
+                params.append(data[name + '/W'])
+                params.append(data[name + '/b'])
+        return cls(params, s_dim=tuple(spec['s_dim']), a_dim=spec['a_dim'])
+
+    def save_npz(self, filepath):
+        ''' Single self-describing file: weights + layer spec '''
+        spec = {
+            'format': POLICY_FORMAT,
+            's_dim': list(self.s_dim),
+            'a_dim': self.a_dim,
+            'layers': [{'name': name, 'type': kind, 'rows': list(rows) if rows is not None else None}
+                       for name, _, kind, rows in ACTOR_LAYERS]
+        }
+        arrays = {'spec': np.array(json.dumps(spec))}
+        for (name, _, _, _), (W, b) in zip(ACTOR_LAYERS, self._layers):
+            arrays[name + '/W'] = W
+            arrays[name + '/b'] = b
+        np.savez(filepath, **arrays)
+
+    def get_network_params(self):
+        return [p for layer in self._layers for p in layer]
+
+    def set_network_params(self, params):
+        ''' params in the order of ActorNetwork.get_network_params() '''
+        assert len(params) == 2 * len(ACTOR_LAYERS)
+        self._layers = []
+        for i in range(len(ACTOR_LAYERS)):
+            W = np.asarray(params[2 * i], dtype=np.float32)
+            b = np.asarray(params[2 * i + 1], dtype=np.float32)
+            self._layers.append((W, b))
+
+    def predict(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.float32)
+        assert inputs.ndim == 3 and inputs.shape[1:] == tuple(self.s_dim)
+
+        branches = []
+        for (name, _, kind, rows), (W, b) in zip(ACTOR_LAYERS[:-2], self._layers[:-2]):
+            if kind == 'fc':
+                # inputs[:, i:i+1, -1]
+                x = inputs[:, rows[0]:rows[1], -1]
+                branches.append(relu(np.matmul(x, W) + b))
+            else:
+                # inputs[:, i:i+1, :] -> conv_1d -> flatten
+                x = inputs[:, rows[0]:rows[1], :]
+                conv = relu(conv_1d_same(x, W, b))
+                branches.append(conv.reshape(conv.shape[0], -1))
+
+        merge_net = np.concatenate(branches, axis=1)
+
+        W, b = self._layers[-2]
+        dense_net_0 = relu(np.matmul(merge_net, W) + b)
+
+        W, b = self._layers[-1]
+        return softmax(np.matmul(dense_net_0, W) + b)
@@ -0,0 +1,55 @@
+import multiprocessing as mp
+import numpy as np
+
+
+class PolicySnapshot:
+    '''
+        Double-buffered policy weights in shared memory, learner -> serving side.
+        The learner writes the inactive buffer and then flips it active,
+        readers copy the active buffer, so a publish never blocks on a reader
+        for longer than one copy and readers never see half-written weights.
+    '''
+    def __init__(self, shapes):
+        self._shapes = [tuple(shape) for shape in shapes]
+        self._sizes = [int(np.prod(shape)) for shape in self._shapes]
+        total = sum(self._sizes)
+
+        self._buffers = [mp.RawArray('f', total), mp.RawArray('f', total)]
+        self._active = mp.RawValue('i', 0)
+        self._version = mp.RawValue('l', 0) # 0 -> nothing published yet
+        self._lock = mp.Lock()
+        self._published = mp.Event()
+
+    def version(self):
+        return self._version.value
+
+    def publish(self, params):
+        ''' params in the order of ActorNetwork.get_network_params() '''
+        inactive = 1 - self._active.value
+        buffer = np.frombuffer(self._buffers[inactive], dtype=np.float32)
+        offset = 0
+        for param, size in zip(params, self._sizes):
+            buffer[offset:offset + size] = np.ravel(param)
+            offset += size
+
+        with self._lock:
+            self._active.value = inactive
+            self._version.value += 1
+        self._published.set()
+
+    def wait(self, timeout=None):
+        ''' Blocks until the first weights are published, returns False on timeout '''
+        return self._published.wait(timeout)
+
+    def read(self):
+        ''' (version, params), copies of the latest published weights '''
+        with self._lock:
+            version = self._version.value
+            buffer = np.array(np.frombuffer(self._buffers[self._active.value], dtype=np.float32))
+
+        params = []
+        offset = 0
+        for shape, size in zip(self._shapes, self._sizes):
+            params.append(buffer[offset:offset + size].reshape(shape))
+            offset += size
+        return version, params
@@ -0,0 +1,54 @@
+# NumPy returns / advantages / entropy of an episode (no TensorFlow):
+# the reference of the in-graph FusedTrainer (a3c.py), the entropy of the decisions of the agent
+import numpy as np
+from scipy.signal import lfilter
+
+
+def discounted_returns(r_batch, bootstrap, gamma):
+    """
+    NumPy reference of FusedTrainer.R_batch (checked against it in tests/test_a3c.py)
+    R[-1] = bootstrap, R[t] = r[t] + gamma * R[t+1]
+    (the reward of the last step is replaced by the bootstrap value)
+    returns np.array([batch_size, 1])
+    """
+    rewards = np.array(r_batch, dtype=np.float64).reshape(-1)
+    rewards[-1] = bootstrap
+    return discount(rewards, gamma).reshape(-1, 1)
+
+
+def gae_advantages(r_batch, v_batch, bootstrap, gamma, lam):
+    """
+    NumPy reference of FusedTrainer.td_batch with gae_lambda (tests/test_a3c.py)
+    Generalized advantage estimation, A[t] = sum_k (gamma * lam)^k delta[t+k]
+    with delta[t] = r[t] + gamma * V[t+1] - V[t], and delta[-1] = bootstrap - V[-1]
+    as in discounted_returns. lam = 1 gives the same advantages as R - V.
+    returns np.array([batch_size, 1])
+    """
+    rewards = np.asarray(r_batch, dtype=np.float64).reshape(-1)
+    values = np.asarray(v_batch, dtype=np.float64).reshape(-1)
+
+    deltas = np.empty_like(values)
+    deltas[:-1] = rewards[:-1] + gamma * values[1:] - values[:-1]
+    deltas[-1] = bootstrap - values[-1]
+    return discount(deltas, gamma * lam).reshape(-1, 1)
+
+
+def discount(x, gamma):
+    """
+    Given vector x, computes a vector y such that
+    y[i] = x[i] + gamma * x[i+1] + gamma^2 x[i+2] + ...
+    """
+    assert x.ndim >= 1
+    # reverse discounted cumulative sum: y[i] = x[i] + gamma * y[i+1]
+    return lfilter([1], [1, -gamma], x[::-1], axis=0)[::-1]
+
+
+def compute_entropy(x):
+    """
+    Given vector x, computes the entropy
+    H(x) = - sum( p * log(p))
+    For a batch of distributions (2d), one entropy per row
+    """
+    x = np.asarray(x, dtype=np.float64)
+    valid = (x > 0) & (x < 1)
+    return -np.sum(np.where(valid, x * np.log(np.where(valid, x, 1.0)), 0.0), axis=-1)
@@ -0,0 +1,99 @@
+# Per-connection state of the agent
+# (state history + episode buffers) so one agent can serve several QUIC sessions
+import time
+
+try:
+    from .state_history import StateHistory
+except ImportError:
+    # loaded flat, as nn_testing/connection_state.py (a symlink to this file) next to nn_inference.py
+    from state_history import StateHistory
+
+
+class ConnectionState:
+    '''
+        Everything the agent keeps for one connection.
+        Episode buffers are bounded by `max_steps`, further steps are only
+        used for inference (history) and counted as dropped
+    '''
+    def __init__(self, conn_id, s_info, s_len, max_steps):
+        self.conn_id = conn_id
+        self.history = StateHistory(s_info, s_len)
+        self.max_steps = max_steps
+
+        # episode: per-step feature vectors, actions, request records, entropy
+        self.f_batch = []
+        self.a_batch = []
+        self.list_states = []
+        self.entropy_record = []
+        self.dropped = 0
+
+        self.last_seen = time.time()
+
+    def store(self, request, features, action_vec, entropy):
+        if len(self.list_states) >= self.max_steps:
+            self.dropped += 1
+            return False
+        self.list_states.append(request)
+        self.f_batch.append(features)
+        self.a_batch.append(action_vec)
+        # no entropy for decisions that did not come from the policy (fallback)
+        if entropy is not None:
+            self.entropy_record.append(entropy)
+        return True
+
+    def steps(self):
+        return len(self.list_states)
+
+    def prepend(self, earlier):
+        ''' Episode buffers of an earlier (evicted) state of the same connection go first '''
+        self.f_batch = earlier.f_batch + self.f_batch
+        self.a_batch = earlier.a_batch + self.a_batch
+        self.list_states = earlier.list_states + self.list_states
+        self.entropy_record = earlier.entropy_record + self.entropy_record
+        self.dropped += earlier.dropped
+
+
+class ConnectionTable:
+    ''' ConnectionStates keyed by connection id, idle connections get evicted '''
+    def __init__(self, s_info, s_len, max_steps, idle_timeout):
+        self._s_info = s_info
+        self._s_len = s_len
+        self._max_steps = max_steps
+        self._idle_timeout = idle_timeout
+        self._connections = {}
+
+    def get(self, conn_id):
+        conn = self._connections.get(conn_id)
+        if conn is None:
+            conn = ConnectionState(conn_id, self._s_info, self._s_len, self._max_steps)
+            self._connections[conn_id] = conn
+        conn.last_seen = time.time()
+        return conn
+
+    def evict_idle(self, now=None):
+        ''' Drop connections without a request for `idle_timeout` seconds, returns them '''
+        now = time.time() if now is None else now
+        evicted = [conn for conn in self._connections.values() if now - conn.last_seen > self._idle_timeout]
+        for conn in evicted:
+            del self._connections[conn.conn_id]
+        return evicted
+
+    def restore(self, conn):
+        ''' Puts an evicted connection back (e.g. to join its episode), merged with the live one if any '''
+        live = self._connections.get(conn.conn_id)
+        if live is None:
+            self._connections[conn.conn_id] = conn
+        else:
+            live.prepend(conn)
+
+    def ids(self):
+        return list(self._connections.keys())
+
+    def items(self):
+        return list(self._connections.items())
+
+    def clear(self):
+        self._connections.clear()
+
+    def __len__(self):
+        return len(self._connections)
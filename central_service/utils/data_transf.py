@@ -1,4 +1,7 @@
 # Some useful operations on data we need for our training
+from collections import deque, Counter
+import numpy as np
+
 
 def allUnique(x, debug=False):
     '''
@@ -21,38 +24,93 @@ def allUnique(x, debug=False):
 
 
 
-def getTrainingVariables(request):
+# Requests/streams of clients that do not send a ConnectionID
+DEFAULT_CONNECTION = 0
+
+
+def getConnectionID(message):
+    '''
+        Connection (QUIC session) a request or a stream completion belongs to
+    '''
+    return message.get('ConnectionID', DEFAULT_CONNECTION)
+
+
+def splitStreamsPerConnection(connection_ids, stream_info):
     '''
-        Return all necessary state/training variables from the request
-        They might come in random order so rotate them
+        Group the stream completions of a run per connection (StreamInfo.ConnectionID, zpublisher.go).
+        Completions of clients that do not send it go to the only connection of the run
+        if there is exactly one, otherwise they cannot be attributed and are returned separately
     '''
-    if request['Path1']['PathID'] == 1:
-        return request['Path1']['SmoothedRTT'], request['Path1']['Bandwidth'], request['Path1']['Packets'], \
-            request['Path1']['Retransmissions'], request['Path1']['Losses'], \
-            request['Path2']['SmoothedRTT'], request['Path2']['Bandwidth'], request['Path2']['Packets'], \
-            request['Path2']['Retransmissions'], request['Path2']['Losses']
-    else:
-        return request['Path2']['SmoothedRTT'], request['Path2']['Bandwidth'], request['Path2']['Packets'], \
-            request['Path2']['Retransmissions'], request['Path2']['Losses'], \
-            request['Path1']['SmoothedRTT'], request['Path1']['Bandwidth'], request['Path1']['Packets'], \
-            request['Path1']['Retransmissions'], request['Path1']['Losses']
+    per_connection = {conn_id: [] for conn_id in connection_ids}
+    unassigned = []
+    for stream in stream_info:
+        conn_id = getConnectionID(stream)
+        if conn_id in per_connection:
+            per_connection[conn_id].append(stream)
+        elif conn_id == DEFAULT_CONNECTION and len(per_connection) == 1:
+            next(iter(per_connection.values())).append(stream)
+        else:
+            unassigned.append(stream)
+    return per_connection, unassigned
 
 
-def arrangeStateStreamsInfo(states, stream_info):
+def joinStatesStreams(states, stream_info, strict=False):
     '''
-        Concurrency in MPQUIC results in slightly different ordering of stream_ids,
-        Since we only care about the server side of events (for training and validation)
-        We rearrange the stream_info based on the order of states received
-        As a matching value we have the request-path (e.g. /index.html == /index.html)
+        Hash join of the scheduling states (server side requests) of a connection
+        with the stream completions of the collector, linear in the number of streams.
+        Completions are indexed by request-path (stream['Path'] == state['RequestPath']);
+        a completion with the same StreamID is preferred, otherwise the same request-path
+        requested several times is matched in order of occurrence.
+        strict (completions known to be lost): a request-path is only matched in order
+        when it has as many completions as states, otherwise its states stay missing.
+        Returns (indices, streams, missing, extra):
+            indices - positions in states that have a completion, in order
+            streams - the matching completions, aligned with indices
+                      (StreamID set to the one of the state)
+            missing - positions in states without a completion
+            extra   - completions that match no state
     '''
-    assert (len(states) == len(stream_info))
+    by_stream = {}
+    by_path = {}
+    for j, stream in enumerate(stream_info):
+        by_stream.setdefault((stream['Path'], stream['StreamID']), deque()).append(j)
+        by_path.setdefault(stream['Path'], deque()).append(j)
+
+    used = [False] * len(stream_info)
+    matches = [None] * len(states)
+
+    # 1. same request-path and StreamID
+    for i, state in enumerate(states):
+        candidates = by_stream.get((state['RequestPath'], state['StreamID']))
+        if candidates:
+            j = candidates.popleft()
+            used[j] = True
+            matches[i] = j
 
+    # 2. same request-path, first completion not matched yet
+    requested = Counter(state['RequestPath'] for state in states) if strict else None
     for i, state in enumerate(states):
-        for j, stream in enumerate(stream_info):
-            if stream['Path'] == state['RequestPath']:
-                stream['StreamID'] = state['StreamID']
-                # reorder streams
-                if i != j:
-                    stream_info[i], stream_info[j] = stream_info[j], stream_info[i]
-
-    return stream_info
\ No newline at end of file
+        if matches[i] is not None:
+            continue
+        if strict and requested[state['RequestPath']] != len(by_path.get(state['RequestPath'], ())):
+            continue
+        candidates = by_path.get(state['RequestPath'])
+        while candidates and used[candidates[0]]:
+            candidates.popleft()
+        if candidates:
+            j = candidates.popleft()
+            used[j] = True
+            matches[i] = j
+
+    indices, streams, missing = [], [], []
+    for i, j in enumerate(matches):
+        if j is None:
+            missing.append(i)
+            continue
+        stream = stream_info[j]
+        stream['StreamID'] = states[i]['StreamID']
+        indices.append(i)
+        streams.append(stream)
+    extra = [stream for j, stream in enumerate(stream_info) if not used[j]]
+
+    return np.array(indices, dtype=np.int64), streams, missing, extra
@@ -0,0 +1,104 @@
+# Featurizer of the scheduling requests
+# a request is parsed once (binary or JSON) into a record of a preallocated ring,
+# the state features, the reward and the fallback policy all read that record
+import json
+import numpy as np
+
+try:
+    from .wire_format import request_format, REQUEST_HEADER, PATH_STATS_KEYS, FORMAT_BINARY
+except ImportError:
+    # loaded flat, as nn_testing/featurizer.py (a symlink to this file) next to nn_inference.py
+    from wire_format import request_format, REQUEST_HEADER, PATH_STATS_KEYS, FORMAT_BINARY
+
+# Per-path statistics are ordered: [path with PathID 1, other path]
+REQUEST_RECORD = np.dtype([
+    ('StreamID', '<u4'),
+    ('ConnectionID', '<u8'),
+    ('RequestPath', 'O'),
+    ('PathID', 'u1', (2,)),
+    ('SmoothedRTT', '<f8', (2,)),       # in seconds
+    ('Bandwidth', '<u8', (2,)),
+    ('Packets', '<u8', (2,)),
+    ('Retransmissions', '<u8', (2,)),
+    ('Losses', '<u8', (2,)),
+])
+
+# requests parsed but not handled yet: REP serves one at a time,
+# a ROUTER is bounded by the decision budget
+RING_CAPACITY = 4096
+
+
+class Featurizer:
+    '''
+        Parses request frames into the records of a preallocated ring (REQUEST_RECORD).
+        A record is a view into the ring, valid until RING_CAPACITY more requests are
+        parsed: copy it (record.copy()) to keep it for longer, e.g. in an episode
+    '''
+    def __init__(self, capacity=RING_CAPACITY):
+        self._records = np.zeros(capacity, dtype=REQUEST_RECORD)
+        self._next = 0
+
+    def parse(self, frame):
+        '''
+            frame: bytes, or a zmq.Frame received with copy=False (read in place)
+            Returns (record, wire format)
+        '''
+        buffer = getattr(frame, 'buffer', frame)
+        fmt = request_format(buffer)
+
+        if fmt == FORMAT_BINARY:
+            fields = REQUEST_HEADER.unpack_from(buffer)
+            size = REQUEST_HEADER.size
+            stream_id, conn_id = fields[1], fields[2]
+            request_path = bytes(buffer[size:size + fields[15]]).decode('utf-8')
+            path1, path2 = fields[3:9], fields[9:15]
+        else:
+            request = json.loads(bytes(buffer))
+            stream_id, conn_id = request['StreamID'], request.get('ConnectionID', 0)
+            request_path = request['RequestPath']
+            path1 = [request['Path1'][key] for key in PATH_STATS_KEYS]
+            path2 = [request['Path2'][key] for key in PATH_STATS_KEYS]
+
+        # They might come in random order so rotate them
+        if path1[0] != 1:
+            path1, path2 = path2, path1
+
+        index = self._next
+        self._next = (index + 1) % len(self._records)
+        self._records[index] = (stream_id, conn_id, request_path) + tuple(zip(path1, path2))
+        return self._records[index], fmt
+
+
+def request_features(records, bdw_paths, out=None):
+    '''
+        State features (S_INFO terms) of a batch of records -> (N, 6):
+        bandwidth, smoothed RTT (max RTT so far 120ms), retransmissions + losses, of both paths
+    '''
+    records = np.atleast_1d(records)
+    if out is None:
+        out = np.empty((len(records), 6))
+    out[:, 0] = (bdw_paths[0] - 1.0) / (100.0 - 1.0)
+    out[:, 1] = (bdw_paths[1] - 1.0) / (100.0 - 1.0)
+    out[:, 2:4] = ((records['SmoothedRTT'] * 1000.0) - 1.0) / (120.0)
+    out[:, 4:6] = ((records['Retransmissions'] + records['Losses']) - 0.0) / 20.0
+    return out
+
+
+def request_rewards(records, a_batch, completion_times, bdw_paths):
+    '''
+        Reward of each step: bandwidth of the chosen path - completion time
+        - 0.8 * aggregated RTT - aggregated losses (normalized as the features)
+    '''
+    features = request_features(records, bdw_paths)
+    a_batch = np.asarray(a_batch)
+    return (a_batch[:, 0] * features[:, 0] + a_batch[:, 1] * features[:, 1]) - np.asarray(completion_times) \
+        - (0.8 * (features[:, 2] + features[:, 3])) - (1.0 * (features[:, 4] + features[:, 5]))
+
+
+def lowestRTTPathID(record):
+    '''
+        Cheap built-in scheduling policy: the path with the lowest smoothed RTT
+    '''
+    if record['SmoothedRTT'][0] <= record['SmoothedRTT'][1]:
+        return int(record['PathID'][0])
+    return int(record['PathID'][1])
@@ -1,18 +1,189 @@
 import logging
+import logging.handlers
+import json
 import os
+import queue
+import threading
+import multiprocessing.util
 
-def config_logger(name='', filepath='./logs/debug.log'):
-    if os.path.isfile(filepath):
-        os.remove(filepath)
-    # create logger with 'spam_application'
+# Asynchronous logging: loggers only put their records on a queue, a background
+# writer thread (one per process) formats them and writes the files, flushed once
+# the queue is drained. config_logger is the single entry point.
+
+# 'text': as before (TEXT_FORMAT), 'json': one JSON object per line (t, level, name, msg[, exc])
+LOG_FORMAT = 'text'
+
+# Fraction of the DEBUG records kept per logger (INFO and above are always kept),
+# for the loggers that write one line per request / stream completion
+SAMPLING = {
+    'request_handler': 0.01,
+    'async_frontend': 0.01,
+    'io_loop': 0.01,
+    'collector-thread': 0.01,
+}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record):
+        line = {
+            't': round(record.created, 6),
+            'level': record.levelname,
+            'name': record.name,
+            'msg': record.getMessage()
+        }
+        if record.exc_info:
+            line['exc'] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    ''' Keeps 1 in every round(1 / rate) DEBUG records (deterministic) '''
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(int(round(1.0 / rate)), 1) if rate > 0 else 0
+        self.seen = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.INFO:
+            return True
+        if self.every == 0:
+            return False
+        self.seen += 1
+        return (self.seen - 1) % self.every == 0
+
+
+class LogFile:
+    ''' A log file, opened (truncated) once per process, written by the writer thread only '''
+    def __init__(self, filepath, formatter):
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.filepath = filepath
+        self.formatter = formatter
+        self.stream = open(filepath, 'w')
+
+    def write(self, record):
+        self.stream.write(self.formatter.format(record) + '\n')
+
+    def flush(self):
+        self.stream.flush()
+
+
+class LogWriter(threading.Thread):
+    ''' Background writer of a process: drains the record queue, then flushes the files it wrote to '''
+    def __init__(self):
+        threading.Thread.__init__(self, name='log-writer', daemon=True)
+        self.queue = queue.SimpleQueue() if hasattr(queue, 'SimpleQueue') else queue.Queue()
+        self.pid = os.getpid()
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            touched, flushed = set(), []
+            for item in items:
+                if item is None:
+                    continue
+                if isinstance(item, threading.Event):
+                    flushed.append(item) # flush_logs is waiting
+                    continue
+                logfile, record = item
+                try:
+                    logfile.write(record)
+                    touched.add(logfile)
+                except Exception:
+                    pass # never take the process down for a log line
+            for logfile in touched:
+                logfile.flush()
+
+            for event in flushed:
+                event.set()
+            if None in items:
+                return
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    ''' Queue-based handler: the caller only enqueues, the LogWriter of the process writes '''
+    def __init__(self, logfile):
+        super().__init__(None)
+        self.logfile = logfile
+
+    def prepare(self, record):
+        # formatting is left to the writer, except for messages that are not plain strings
+        # (e.g. views into buffers that are reused): they are rendered now
+        if not isinstance(record.msg, str):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        writer().queue.put((self.logfile, record))
+
+
+_lock = threading.Lock()
+_writer = None
+_files = {}
+
+
+def writer():
+    ''' LogWriter of the current process (started on first use, again after a fork) '''
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = LogWriter()
+                _writer.start()
+                # runs at exit, also in multiprocessing children (which skip atexit)
+                multiprocessing.util.Finalize(None, flush_logs, exitpriority=0)
+    return _writer
+
+
+def flush_logs():
+    ''' Blocks until every record logged so far is written '''
+    if _writer is not None and _writer.pid == os.getpid() and _writer.is_alive():
+        done = threading.Event()
+        _writer.queue.put(done)
+        done.wait()
+
+
+def config_logger(name='', filepath='./logs/debug.log', sample_rate=None, fmt=None):
+    '''
+        Logger `name` writing to `filepath` through the writer thread.
+        The file is truncated the first time it is used in a process,
+        calling it again returns the same logger (no new handler, the file is not reopened)
+        sample_rate: fraction of the DEBUG records kept (default SAMPLING.get(name, 1.0))
+        fmt: logging format of the file instead of LOG_FORMAT, e.g. '%(message)s' for data lines
+    '''
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    # create file handler which logs even debug messages
-    fh = logging.FileHandler(filepath)
-    fh.setLevel(logging.DEBUG)
-    # create formatter and add it to the handlers
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    fh.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    return logger
\ No newline at end of file
+    with _lock:
+        if getattr(logger, 'async_configured', False):
+            return logger
+
+        logfile = _files.get(filepath)
+        if logfile is None:
+            if fmt is not None:
+                formatter = logging.Formatter(fmt)
+            else:
+                formatter = JSONLinesFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+            logfile = _files[filepath] = LogFile(filepath, formatter)
+
+        logger.setLevel(logging.DEBUG)
+        handler = AsyncHandler(logfile)
+        rate = SAMPLING.get(name, 1.0) if sample_rate is None else sample_rate
+        if rate < 1.0:
+            handler.addFilter(SamplingFilter(rate))
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.async_configured = True
+    return logger
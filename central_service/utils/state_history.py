@@ -0,0 +1,74 @@
+# State history of the scheduling agent
+# (S_INFO, S_LEN) windows without np.roll / copies per request
+import numpy as np
+
+
+class StateHistory:
+    '''
+        Preallocated circular buffer holding the last `s_len` feature vectors.
+        Every column is written twice (at pos and pos + s_len), so the ordered
+        window (oldest -> newest) is always a contiguous slice i.e. a view, never a gather.
+        An empty history is all zeros, same as the initial state of the agent.
+    '''
+    def __init__(self, s_info, s_len):
+        self.s_info = s_info
+        self.s_len = s_len
+        self._buffer = np.zeros((s_info, 2 * s_len))
+        self._pos = 0  # column to be written next
+
+    def push(self, features):
+        self._buffer[:, self._pos] = features
+        self._buffer[:, self._pos + self.s_len] = features
+        self._pos = (self._pos + 1) % self.s_len
+
+    def window(self):
+        ''' View (s_info, s_len) of the history, only valid until the next push '''
+        return self._buffer[:, self._pos:self._pos + self.s_len]
+
+    def reset(self):
+        self._buffer.fill(0.0)
+        self._pos = 0
+
+
+def build_windows(features, s_len):
+    '''
+        Rebuild the (T, S_INFO, S_LEN) states of an episode from its per-step
+        feature vectors (T, S_INFO), as a strided (read only) view.
+        History before the first step is zeros, as in StateHistory.
+    '''
+    features = np.asarray(features, dtype=np.float64)
+    steps, s_info = features.shape
+    padded = np.concatenate([np.zeros((s_len - 1, s_info)), features], axis=0)
+    return np.lib.stride_tricks.as_strided(padded,
+                                           shape=(steps, s_info, s_len),
+                                           strides=(padded.strides[0], padded.strides[1], padded.strides[0]),
+                                           writeable=False)
+
+
+class BatchStateHistory:
+    '''
+        StateHistory of `n` episodes stepped in lockstep: one push / one window for all of them.
+        All the rows share the write position, so resetting a row (new episode) only zeros it
+    '''
+    def __init__(self, n, s_info, s_len):
+        self.s_info = s_info
+        self.s_len = s_len
+        self._buffer = np.zeros((n, s_info, 2 * s_len))
+        self._pos = 0
+
+    def push(self, features):
+        ''' features: (n, s_info) '''
+        self._buffer[:, :, self._pos] = features
+        self._buffer[:, :, self._pos + self.s_len] = features
+        self._pos = (self._pos + 1) % self.s_len
+
+    def window(self):
+        ''' View (n, s_info, s_len) of the histories, only valid until the next push '''
+        return self._buffer[:, :, self._pos:self._pos + self.s_len]
+
+    def reset(self, index=None):
+        if index is None:
+            self._buffer.fill(0.0)
+            self._pos = 0
+        else:
+            self._buffer[index] = 0.0
@@ -0,0 +1,51 @@
+# Lightweight distribution tracking for the serving path
+# e.g. batch sizes and wait times of the micro-batched inference
+import numpy as np
+
+
+class RunStats:
+    '''
+        Keeps the raw samples of a few named series (batch size, wait time, ...)
+        for the duration of a run and summarizes them as percentiles.
+        Samples are cheap to record (list append), summaries are computed on demand.
+    '''
+    PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self):
+        self._series = {}
+
+    def record(self, name, value):
+        self._series.setdefault(name, []).append(value)
+
+    def count(self, name):
+        return len(self._series.get(name, []))
+
+    def summary(self, name):
+        values = self._series.get(name, [])
+        if len(values) == 0:
+            return None
+
+        values = np.asarray(values, dtype=np.float64)
+        result = {
+            'count': len(values),
+            'mean': float(np.mean(values)),
+            'max': float(np.max(values))
+        }
+        for p, v in zip(self.PERCENTILES, np.percentile(values, self.PERCENTILES)):
+            result['p{}'.format(p)] = float(v)
+        return result
+
+    def histogram(self, name):
+        ''' Number of occurrences per (integer) value, e.g. how many batches of size 1, 2, ... '''
+        values = self._series.get(name, [])
+        if len(values) == 0:
+            return {}
+        uniques, counts = np.unique(np.asarray(values, dtype=np.int64), return_counts=True)
+        return {int(u): int(c) for u, c in zip(uniques, counts)}
+
+    def report(self, logger):
+        for name in sorted(self._series):
+            logger.info("{}: {}".format(name, self.summary(name)))
+
+    def reset(self):
+        self._series.clear()
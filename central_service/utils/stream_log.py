@@ -0,0 +1,63 @@
+# Append-only on-disk log of stream completions
+# fixed-size records, the whole history can be memory-mapped for offline training / analysis
+import os
+import time
+import numpy as np
+
+STREAM_RECORD = np.dtype([
+    ('time', '<f8'),              # reception time at the collector
+    ('episode', 'S32'),
+    ('sequence', '<i8'),          # -1 for unsequenced publishers
+    ('stream_id', '<u4'),
+    ('connection_id', '<u8'),
+    ('completion_time', '<f8'),
+    ('path', 'S200'),             # request-path, truncated
+    ('object_id', 'S64'),
+])
+
+
+class StreamLog:
+    '''
+        Appends every stream completion as a STREAM_RECORD to `filepath`.
+        Records are only ever appended, a reader can map the file at any time
+        with load_stream_log
+    '''
+    def __init__(self, filepath, flush_every=64):
+        self.filepath = filepath
+        self._file = open(filepath, 'ab')
+        self._record = np.zeros(1, dtype=STREAM_RECORD)
+        self._flush_every = flush_every
+        self._unflushed = 0
+        self.records = 0
+
+    def append(self, stream):
+        record = self._record
+        record['time'] = time.time()
+        record['episode'] = str(stream.get('Episode', '')).encode('utf-8')[:32]
+        record['sequence'] = stream.get('Sequence', -1)
+        record['stream_id'] = stream.get('StreamID', 0)
+        record['connection_id'] = stream.get('ConnectionID', 0)
+        record['completion_time'] = stream.get('CompletionTime', 0.0)
+        record['path'] = str(stream.get('Path', '')).encode('utf-8')[:200]
+        record['object_id'] = str(stream.get('ObjectID', '')).encode('utf-8')[:64]
+        self._file.write(record.tobytes())
+        self.records += 1
+
+        self._unflushed += 1
+        if self._unflushed >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._unflushed = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def load_stream_log(filepath):
+    ''' Read-only memory map of a stream log (structured array of STREAM_RECORD) '''
+    if os.path.getsize(filepath) == 0:
+        return np.zeros(0, dtype=STREAM_RECORD) # nothing logged (np.memmap cannot map an empty file)
+    return np.memmap(filepath, dtype=STREAM_RECORD, mode='r')
@@ -0,0 +1,117 @@
+# Wire format of the scheduling requests (rlmp-quic/zclient.go)
+# binary: versioned fixed layout, JSON: fallback for clients that do not speak it
+import json
+import struct
+import numpy as np
+
+WIRE_VERSION = 1
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+
+# Request v1, little-endian, no implicit padding (encodeRequest in zclient.go):
+#   version u8, pad 3, StreamID u32, ConnectionID u64,
+#   Path1, Path2: PathID u8, pad 7, SmoothedRTT f64, Bandwidth, Packets, Retransmissions, Losses u64
+#   len(RequestPath) u16, followed by the RequestPath (utf-8)
+PATH_STATS = 'B7xdQQQQ' # PathID .. Losses
+REQUEST_HEADER = struct.Struct('<B3xIQ' + PATH_STATS + PATH_STATS + 'H')
+
+# same fixed part as a NumPy record, e.g. to map many requests at once
+PATH_STATS_DTYPE = np.dtype([
+    ('PathID', 'u1'), ('pad', 'V7'),
+    ('SmoothedRTT', '<f8'),
+    ('Bandwidth', '<u8'),
+    ('Packets', '<u8'),
+    ('Retransmissions', '<u8'),
+    ('Losses', '<u8'),
+])
+REQUEST_DTYPE = np.dtype([
+    ('version', 'u1'), ('pad', 'V3'),
+    ('StreamID', '<u4'),
+    ('ConnectionID', '<u8'),
+    ('Path1', PATH_STATS_DTYPE),
+    ('Path2', PATH_STATS_DTYPE),
+    ('path_len', '<u2'),
+])
+assert REQUEST_DTYPE.itemsize == REQUEST_HEADER.size
+
+PATH_STATS_KEYS = ('PathID', 'SmoothedRTT', 'Bandwidth', 'Packets', 'Retransmissions', 'Losses')
+
+# reply to a request in a format this side does not support: the client falls back to JSON
+REJECT = b''
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def request_format(frame):
+    ''' FORMAT_JSON or FORMAT_BINARY, from the first byte of the request frame '''
+    if len(frame) > 0 and frame[0] == WIRE_VERSION:
+        return FORMAT_BINARY
+    if len(frame) > 0 and frame[:1] == b'{':
+        return FORMAT_JSON
+    raise UnsupportedFormat("Unknown request format (first byte {!r})".format(bytes(frame[:1])))
+
+
+def decode_request(frame):
+    '''
+        Request frame (binary v1 or JSON) -> (request, format)
+        request has the layout of the JSON encoding of Request in zclient.go
+    '''
+    fmt = request_format(frame)
+    if fmt == FORMAT_JSON:
+        return json.loads(bytes(frame)), fmt
+
+    fields = REQUEST_HEADER.unpack_from(frame)
+    size = REQUEST_HEADER.size
+    return {
+        'StreamID': fields[1],
+        'ConnectionID': fields[2],
+        'Path1': dict(zip(PATH_STATS_KEYS, fields[3:9])),
+        'Path2': dict(zip(PATH_STATS_KEYS, fields[9:15])),
+        'RequestPath': bytes(frame[size:size + fields[15]]).decode('utf-8'),
+    }, fmt
+
+
+def encode_request(request):
+    ''' Binary v1 request frame (same as zclient.go), for tests and simulated clients '''
+    path = request['RequestPath'].encode('utf-8')[:0xffff]
+    stats = [request[p][key] for p in ('Path1', 'Path2') for key in PATH_STATS_KEYS]
+    return REQUEST_HEADER.pack(WIRE_VERSION, request['StreamID'], request.get('ConnectionID', 0),
+                               *stats, len(path)) + path
+
+
+def encode_response(response, fmt):
+    '''
+        Response frames of the agent ([StreamID, PathID], decimal utf-8) in the format of the request.
+        The first frame stays decimal in both formats (the middleware reads the ID)
+    '''
+    if fmt == FORMAT_JSON:
+        return response
+    return [response[0], bytes((WIRE_VERSION, int(response[1])))]
+
+
+def decode_response(frames):
+    '''
+        Response frames of the agent -> PathID, None if the request was rejected
+        (the client side of encode_response, as Response() in zclient.go)
+    '''
+    body = bytes(frames[1])
+    if len(body) == 0:
+        return None
+    if len(body) == 2 and body[0] == WIRE_VERSION:
+        return body[1]
+    return int(body)
+
+
+def reject_response(frames):
+    ''' Reply to a request that could not be decoded '''
+    return [frames[0], REJECT]
+
+
+def split_envelope(frames):
+    ''' [identities..., b'', StreamID, request] -> ([identities..., b''], [StreamID, request])
+        of a ROUTER socket: the envelope is everything up to the empty delimiter frame of the REQ socket
+    '''
+    delimiter = [len(frame) for frame in frames].index(0)
+    return frames[:delimiter + 1], frames[delimiter + 1:]
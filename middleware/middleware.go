@@ -53,30 +53,47 @@ func listenAndForward(serverAddrs *string, clientAddrs *string, wg *sync.WaitGro
 	}
 }
 
-func subscribeAndForward(pubAddrs *string, subAddrs *string, wg *sync.WaitGroup) {
-	publisher := NewConfig(zmq.PUB, *pubAddrs)
-	subscriber := NewConfig(zmq.SUB, *subAddrs)
+// proxyRequests forwards interleaved requests of many MPQUIC sessions (ROUTER)
+// to the agent (DEALER), replies are routed back by their identity envelope
+func proxyRequests(serverAddrs *string, clientAddrs *string, wg *sync.WaitGroup) {
+	frontend := NewServer(zmq.ROUTER, *serverAddrs)
+	backend := NewServer(zmq.DEALER, *clientAddrs)
+
+	defer frontend.Close()
+	defer backend.Close()
+	defer wg.Done()
+
+	fmt.Println("ProxyRequests")
+
+	err := zmq.Proxy(frontend.socket, backend.socket, nil)
+	if err != nil {
+		fmt.Println(err.Error())
+	}
+}
+
+// pullAndForward forwards the sequenced stream completions of MPQUIC clients
+// to the collector; PUSH/PULL queues instead of dropping, unlike PUB/SUB
+func pullAndForward(pushAddrs *string, pullAddrs *string, wg *sync.WaitGroup) {
+	pusher := NewConfig(zmq.PUSH, *pushAddrs)
+	puller := NewConfig(zmq.PULL, *pullAddrs)
 
 	message := &Message{}
 	var err error
 
-	// subscribe to all
-	subscriber.socket.SetSubscribe("")
-
-	defer subscriber.Close()
-	defer publisher.Close()
+	defer puller.Close()
+	defer pusher.Close()
 	defer wg.Done()
 
-	fmt.Println("SubscribeAndForward")
+	fmt.Println("PullAndForward")
 
 	for {
-		message, err = subscriber.RecvMessage()
+		message, err = puller.RecvMessage()
 		if err != nil {
 			fmt.Println(err.Error())
 			break
 		}
 
-		err = publisher.Send(message)
+		err = pusher.Send(message)
 		if err != nil {
 			fmt.Println(err.Error())
 			break
@@ -87,8 +104,9 @@ func subscribeAndForward(pubAddrs *string, subAddrs *string, wg *sync.WaitGroup)
 func main() {
 	server := flag.String("sv", "ipc:///tmp/zmq", "Server listenAndForward")
 	client := flag.String("cl", "tcp://*:5555", "Client listenAndForward")
-	publisher := flag.String("pub", "tcp://*:5556", "Publisher Subscribe&Forward")
-	subscriber := flag.String("sub", "ipc:///tmp/pubsub", "Subscriber Subscribe&Forward")
+	publisher := flag.String("pub", "tcp://*:5556", "Stream completions to the collector (PUSH)")
+	subscriber := flag.String("sub", "ipc:///tmp/pubsub", "Stream completions from MPQUIC clients (PULL)")
+	proxy := flag.Bool("proxy", false, "ROUTER/DEALER proxy instead of REP/REQ listenAndForward")
 
 	flag.Parse()
 
@@ -99,9 +117,13 @@ func main() {
 
 	var wg sync.WaitGroup
 
-	go listenAndForward(server, client, &wg)
+	if *proxy {
+		go proxyRequests(server, client, &wg)
+	} else {
+		go listenAndForward(server, client, &wg)
+	}
 	wg.Add(1)
-	go subscribeAndForward(publisher, subscriber, &wg)
+	go pullAndForward(publisher, subscriber, &wg)
 	wg.Add(1)
 
 	wg.Wait()
@@ -0,0 +1,73 @@
+'''
+    Parity check and latency benchmark of the actor serving engines
+    (a3c.ActorNetwork through tf.Session vs NumpyActor)
+
+    python benchmark_inference.py [checkpoint]
+    Without a checkpoint the freshly initialized weights are used.
+'''
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+
+import a3c
+from numpy_actor import NumpyActor
+
+S_INFO = 6
+S_LEN = 8
+A_DIM = 2
+ACTOR_LR_RATE = 0.0001
+
+PARITY_SAMPLES = 1000
+PARITY_TOLERANCE = 1e-5
+BATCH_SIZES = [1, 8, 32]
+ITERATIONS = 2000
+
+
+def timeit(fn, inputs, iterations=ITERATIONS):
+    fn(inputs)  # warm up
+    latencies = np.zeros(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(inputs)
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1e6  # in us
+
+
+def main():
+    np.random.seed(42)
+
+    with tf.Session() as sess:
+        actor = a3c.ActorNetwork(sess,
+                                state_dim=[S_INFO, S_LEN], action_dim=A_DIM,
+                                learning_rate=ACTOR_LR_RATE)
+        sess.run(tf.global_variables_initializer())
+
+        if len(sys.argv) == 2:
+            tf.train.Saver().restore(sess, sys.argv[1])
+            np_actor = NumpyActor.from_checkpoint(sys.argv[1])
+        else:
+            np_actor = NumpyActor(actor.get_network_params())
+
+        # ---- parity ----
+        # states are normalized features, sample a bit outside [0, 1] as well
+        states = np.random.uniform(-0.5, 1.5, size=(PARITY_SAMPLES, S_INFO, S_LEN))
+        tf_out = actor.predict(states)
+        np_out = np_actor.predict(states)
+        max_diff = np.max(np.abs(tf_out - np_out))
+        same_argmax = np.mean(np.argmax(tf_out, axis=1) == np.argmax(np_out, axis=1))
+        print("parity: max |tf - numpy| = {:.3e}, same argmax = {:.2%}".format(max_diff, same_argmax))
+        assert max_diff < PARITY_TOLERANCE, "NumpyActor does not match ActorNetwork"
+
+        # ---- latency ----
+        print("{:>6} {:>8} {:>10} {:>10} {:>10}".format("batch", "engine", "p50(us)", "p99(us)", "mean(us)"))
+        for batch_size in BATCH_SIZES:
+            inputs = states[:batch_size]
+            for name, fn in [('tf', actor.predict), ('numpy', np_actor.predict)]:
+                lat = timeit(fn, inputs)
+                print("{:>6} {:>8} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+                    batch_size, name, np.percentile(lat, 50), np.percentile(lat, 99), np.mean(lat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+../central_service/utils/connection_state.py
\ No newline at end of file
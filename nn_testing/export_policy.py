@@ -0,0 +1,32 @@
+'''
+    Export the actor of a trained checkpoint to a compact policy file (.npz)
+    that nn_inference.py can load without TensorFlow
+
+    python export_policy.py <checkpoint> <policy.npz>
+'''
+import sys
+import time
+import numpy as np
+
+from numpy_actor import NumpyActor, S_INFO, S_LEN
+
+
+def main():
+    assert len(sys.argv) == 3
+    nn_model, filepath = sys.argv[1:]
+
+    actor = NumpyActor.from_checkpoint(nn_model)
+    actor.save_npz(filepath)
+
+    # sanity check: the exported file gives back the same policy
+    start = time.time()
+    exported = NumpyActor.from_npz(filepath)
+    end = time.time()
+
+    states = np.random.uniform(0.0, 1.0, size=(100, S_INFO, S_LEN))
+    assert np.array_equal(actor.predict(states), exported.predict(states))
+    print("Exported {} -> {} (load time: {:.1f}ms)".format(nn_model, filepath, (end - start) * 1000.0))
+
+
+if __name__ == "__main__":
+    main()
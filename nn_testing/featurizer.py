@@ -0,0 +1 @@
+../central_service/utils/featurizer.py
\ No newline at end of file
@@ -0,0 +1 @@
+../central_service/utils/logger.py
\ No newline at end of file
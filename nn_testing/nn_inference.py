@@ -1,11 +1,14 @@
-import tensorflow as tf
 import numpy as np
 import zmq
 import os
 import time
 import sys
-import json
-import a3c
+import signal
+from logger import config_logger, flush_logs
+from numpy_actor import NumpyActor
+from connection_state import ConnectionTable
+from wire_format import encode_response, reject_response, UnsupportedFormat
+from featurizer import Featurizer, request_features
 
 # ---------- Global Variables ----------
 S_INFO = 6  # bandwidth_path_i, path_i_mean_RTT, path_i_retransmitted_packets + path_i_lost_packets
@@ -27,49 +30,65 @@ SUMMARY_DIR = currDir + '/results'
 LOG_FILE = currDir + '/results/log'
 NN_MODEL = currDir + ''
 # NN_MODEL = None
+NN_POLICY = currDir + '/policy.npz' # exported with export_policy.py
 EPOCH = 0 # global epoch for initial value
+# tf: ActorNetwork + checkpoint, numpy: NumpyActor from the checkpoint (no tf.Session)
+# npz: NumpyActor from NN_POLICY, TensorFlow is never imported
+INFERENCE_ENGINES = ['tf', 'numpy', 'npz']
+CONNECTION_IDLE_TIMEOUT = 120 # (s) state history of a connection is dropped after being idle
 
 
-def getTrainingVariables(request):
-    '''
-        Return all necessary state/training variables from the request
-        They might come in random order so rotate them
-    '''
-    if request['Path1']['PathID'] == 1:
-        return request['Path1']['SmoothedRTT'], request['Path1']['Bandwidth'], request['Path1']['Packets'], \
-            request['Path1']['Retransmissions'], request['Path1']['Losses'], \
-            request['Path2']['SmoothedRTT'], request['Path2']['Bandwidth'], request['Path2']['Packets'], \
-            request['Path2']['Retransmissions'], request['Path2']['Losses']
-    else:
-        return request['Path2']['SmoothedRTT'], request['Path2']['Bandwidth'], request['Path2']['Packets'], \
-            request['Path2']['Retransmissions'], request['Path2']['Losses'], \
-            request['Path1']['SmoothedRTT'], request['Path1']['Bandwidth'], request['Path1']['Packets'], \
-            request['Path1']['Retransmissions'], request['Path1']['Losses']
-
-
-def handle_requests(host, bdw_path1, bdw_path2):
+def load_actor(engine):
+    ''' Returns the actor and the tf.Session backing it (None for the NumPy engines) '''
+    if engine == 'npz':
+        if not os.path.isfile(NN_POLICY):
+            sys.exit("No exported policy at {}, run: python3 export_policy.py <checkpoint> {}".format(NN_POLICY, NN_POLICY))
+        actor = NumpyActor.from_npz(NN_POLICY)
+        print("Policy loaded.")
+        return actor, None
+
+    if engine == 'numpy':
+        actor = NumpyActor.from_checkpoint(NN_MODEL)
+        print("Model restored.")
+        return actor, None
+
+    import tensorflow as tf
+    import a3c
+
+    sess = tf.Session()
+    actor = a3c.ActorNetwork(sess,
+                            state_dim=[S_INFO, S_LEN], action_dim=A_DIM,
+                            learning_rate=ACTOR_LR_RATE)
+
+    sess.run(tf.initialize_all_variables())
+    saver = tf.train.Saver()
+
+    nn_model = NN_MODEL
+    if nn_model is not None:
+        saver.restore(sess, nn_model)
+        print("Model restored.")
+    return actor, sess
+
+
+def handle_requests(host, bdw_path1, bdw_path2, engine='tf'):
     np.random.seed(RANDOM_SEED)
 
     if not os.path.exists(SUMMARY_DIR):
         os.makedirs(SUMMARY_DIR)
 
-    with tf.Session() as sess, open(LOG_FILE, 'w') as log_file:
-        actor = a3c.ActorNetwork(sess,
-                                state_dim=[S_INFO, S_LEN], action_dim=A_DIM,
-                                learning_rate=ACTOR_LR_RATE)
-        
-        sess.run(tf.initialize_all_variables())
-        saver = tf.train.Saver()
+    actor, sess = load_actor(engine)
 
-        nn_model = NN_MODEL
-        if nn_model is not None:
-            saver.restore(sess, nn_model)
-            print("Model restored.")
+    # per-request lines (tab separated, as before) written by the writer thread of utils/logger.py
+    log = config_logger('nn_inference', LOG_FILE, fmt='%(message)s')
+    # restarted with killall (SIGTERM): exit normally so that the queued lines are written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
+    try:
         init_action = np.zeros(A_DIM)
         init_action[DEFAULT_PATH] = 0
 
-        s_batch = [np.zeros((S_INFO, S_LEN))]
+        # state history per connection, no episode is recorded here
+        connections = ConnectionTable(S_INFO, S_LEN, max_steps=0, idle_timeout=CONNECTION_IDLE_TIMEOUT)
 
         # ZMQ Context
         context = zmq.Context()
@@ -79,36 +98,30 @@ def handle_requests(host, bdw_path1, bdw_path2):
         poller = zmq.Poller()
         poller.register(server, zmq.POLLIN)
 
+        # request records and features are parsed / computed in place
+        featurizer = Featurizer()
+        features = np.empty((1, S_INFO))
+        bdw_paths = (bdw_path1, bdw_path2)
+
         while True:
             if (poller.poll(timeout=10)):
 		#---- log time ----
                 start = time.time()
-                request = server.recv_multipart(zmq.NOBLOCK)
-                json_request = json.loads(request[1])
-
-                path1_smoothed_RTT, path1_bandwidth, path1_packets, \
-                path1_retransmissions, path1_losses, \
-                path2_smoothed_RTT, path2_bandwidth, path2_packets, \
-                path2_retransmissions, path2_losses, \
-                    = getTrainingVariables(json_request)
-
-                if len(s_batch) == 0:
-                    state = np.zeros((S_INFO, S_LEN))
-                else:
-                    state = np.array(s_batch[-1], copy=True)
-
-                # dequeue history record
-                state = np.roll(state, -1, axis=1)
-
-                  # this should be S_INFO number of terms
-                state[0, -1] = (bdw_path1 - 1.0) / (100.0 - 1.0) # bandwidth path1
-                state[1, -1] = (bdw_path2 - 1.0) / (100.0 - 1.0) # bandwidth path2
-                state[2, -1] = ((path1_smoothed_RTT * 1000.0) - 1.0) / (120.0) # max RTT so far 120ms 
-                state[3, -1] = ((path2_smoothed_RTT * 1000.0) - 1.0) / (120.0)
-                state[4, -1] = ((path1_retransmissions + path1_losses) - 0.0) / 20.0
-                state[5, -1] = ((path2_retransmissions + path2_losses) - 0.0) / 20.0
-
-                s_batch.append(state)
+                request = server.recv_multipart(zmq.NOBLOCK, copy=False)
+                # binary or JSON, answered in the same format
+                try:
+                    record, fmt = featurizer.parse(request[1])
+                except UnsupportedFormat as ex:
+                    print(ex)
+                    server.send_multipart(reject_response(request))
+                    continue
+
+                history = connections.get(int(record['ConnectionID'])).history
+
+                # this should be S_INFO number of terms
+                # enqueue the new column, the oldest one drops out of the window
+                history.push(request_features(record, bdw_paths, out=features)[0])
+                state = history.window()
 
                 # get prediction
                 action_prob = actor.predict(np.reshape(state, (1, S_INFO, S_LEN)))
@@ -116,30 +129,32 @@ def handle_requests(host, bdw_path1, bdw_path2):
                 path = (action_cumsum > np.random.randint(1, RAND_RANGE) / float(RAND_RANGE)).argmax()
 
                 # give back response
-                response = [json_request['StreamID'], PATHS[path]]
+                response = [record['StreamID'], PATHS[path]]
                 response = [str(r).encode('utf-8') for r in response]
-                server.send_multipart(response)
+                server.send_multipart(encode_response(response, fmt))
+                connections.evict_idle()
 
 		#---- log time ----
                 end = time.time()
                 diff = end - start
 
-                # log 
-                log_file.write(str(diff) + '\t' +
-                                str(PATHS[path]) + '\t' +
-                                str(bdw_path1) + '\t' +
-                                str(bdw_path2) + '\t' +
-                                str(path1_smoothed_RTT) + '\t' +
-                                str(path2_smoothed_RTT) + '\t' +
-                                str(path1_retransmissions+path1_losses) + '\t' +
-                                str(path2_retransmissions+path2_losses) + '\t\n')
-                log_file.flush()
+                # log (written by the writer thread)
+                srtt, losses = record['SmoothedRTT'], record['Retransmissions'] + record['Losses']
+                line = (diff, PATHS[path], bdw_path1, bdw_path2, srtt[0], srtt[1], losses[0], losses[1])
+                log.info('\t'.join(str(value) for value in line) + '\t')
+    finally:
+        flush_logs()
+        if sess is not None:
+            sess.close()
 
 
 def main():
-    assert len(sys.argv) == 3
-    bdws= sys.argv[1:]
-    handle_requests('ipc:///tmp/zmq', int(bdws[0]), int(bdws[1]))
+    # nn_inference.py bdw_path1 bdw_path2 [tf|numpy|npz]
+    assert len(sys.argv) in (3, 4)
+    bdws= sys.argv[1:3]
+    engine = sys.argv[3] if len(sys.argv) == 4 else 'tf'
+    assert engine in INFERENCE_ENGINES
+    handle_requests('ipc:///tmp/zmq', int(bdws[0]), int(bdws[1]), engine)
 
 
 if __name__ == "__main__":
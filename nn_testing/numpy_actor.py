@@ -0,0 +1 @@
+../central_service/training/numpy_actor.py
\ No newline at end of file
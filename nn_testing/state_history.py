@@ -0,0 +1 @@
+../central_service/utils/state_history.py
\ No newline at end of file
@@ -0,0 +1 @@
+../central_service/utils/wire_format.py
\ No newline at end of file
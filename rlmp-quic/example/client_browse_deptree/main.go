@@ -25,9 +25,9 @@ import (
 // Marios global ZPublisher
 var publisher *quic.ZPublisher
 var totalStreamIDCounter uint32 = 5
-var publishLock = &sync.Mutex{}
 
 var hclient *http.Client
+var hroundTripper *h2quic.RoundTripper // connection ID of the published stream completions
 
 //ObjFinish contains the total number of objs to be download, and the current downloaded objs number
 type ObjFinish struct {
@@ -659,20 +659,14 @@ func shiFirefoxGet(obj *Obj, wg *sync.WaitGroup, wgAll *sync.WaitGroup) {
 		objFinish.Lock.Unlock()
 
 		// Marios: Publish stream info
-		// The lock is necessary since the PUB/SUB zmq spec does not guarantee reliability
-		// I noticed cases, when last one (or two) messages did not get received by the middleware
-		// Probably some race condition between streams(--objs) publishing at the same time
-		// Alternative is to use confirmation, but the mutex lock,
-		// and the 10ms sleep to ensure the message has been transmited before releasing __does the trick__
-		publishLock.Lock()
+		// Sequenced PUSH/PULL channel: nothing is dropped, the collector reorders and detects gaps
 		streamInfo := &quic.StreamInfo{
+			ConnectionID:   hroundTripper.ConnectionID(host),
 			StreamID:       obj.StreamID,
 			ObjectID:       obj.ID,
 			CompletionTime: obj.Download.CompleteTime.Sub(obj.Download.StartTime).Seconds(),
 			Path:           obj.Path}
 		publisher.Publish(streamInfo) // send message
-		time.Sleep(10 * time.Millisecond)
-		publishLock.Unlock()
 
 		if strings.Contains(obj.Download.Type, "css") || strings.Contains(obj.Download.Type, "js") || strings.Contains(obj.Download.Type, "javascript") {
 			wg.Done()
@@ -919,6 +913,7 @@ func main() {
 	hclient = &http.Client{
 		Transport: roundTripper,
 	}
+	hroundTripper = roundTripper
 
 	bow.SetTransport(roundTripper)
 	start = time.Now()
@@ -932,5 +927,8 @@ func main() {
 		safariGet()
 	}
 
+	// all stream completions have been published
+	publisher.EndEpisode()
+
 	onCompletion(start)
 }
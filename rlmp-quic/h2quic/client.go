@@ -363,6 +363,17 @@ func (c *client) Close() error {
 	return c.CloseWithError(nil)
 }
 
+// ConnectionID of the QUIC session, 0 before it is dialed
+func (c *client) ConnectionID() protocol.ConnectionID {
+	sess, ok := c.session.(interface {
+		ConnectionID() protocol.ConnectionID
+	})
+	if !ok {
+		return 0
+	}
+	return sess.ConnectionID()
+}
+
 // copied from net/transport.go
 
 // authorityAddr returns a given authority (a host/IP, or host:port / ip:port)
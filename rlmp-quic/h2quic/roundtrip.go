@@ -131,6 +131,17 @@ func (r *RoundTripper) getClient(hostname string, onlyCached bool) (http.RoundTr
 	return client, nil
 }
 
+// ConnectionID of the QUIC connection to authority (host or host:port), 0 if there is none yet
+func (r *RoundTripper) ConnectionID(authority string) uint64 {
+	r.mutex.Lock()
+	defer r.mutex.Unlock()
+
+	if cl, ok := r.clients[authorityAddr("https", authority)].(*client); ok {
+		return uint64(cl.ConnectionID())
+	}
+	return 0
+}
+
 // Close closes the QUIC connections that this RoundTripper has used
 func (r *RoundTripper) Close() error {
 	r.mutex.Lock()
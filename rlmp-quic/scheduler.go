@@ -827,10 +827,11 @@ pathLoop:
 	start := time.Now()
 
 	request := &Request{
-		StreamID:    strID,
-		RequestPath: stream.requestPath,
-		Path1:       pathStats[0],
-		Path2:       pathStats[1]}
+		ConnectionID: s.connectionID,
+		StreamID:     strID,
+		RequestPath:  stream.requestPath,
+		Path1:        pathStats[0],
+		Path2:        pathStats[1]}
 
 	// utils.Infof("Request %d %s %s", request.ID, request.Path1.PathID, request.Path2.PathID)
 
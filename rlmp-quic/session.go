@@ -1333,3 +1333,8 @@ func (s *session) RemoteAddr() net.Addr {
 func (s *session) GetVersion() protocol.VersionNumber {
 	return s.version
 }
+
+// ConnectionID of the session, same on both sides (the one the scheduler sends in its requests)
+func (s *session) ConnectionID() protocol.ConnectionID {
+	return s.connectionID
+}
@@ -2,8 +2,11 @@ package quic
 
 import (
 	"bytes"
+	"encoding/binary"
 	"encoding/json"
 	"errors"
+	"math"
+	"os"
 	"strconv"
 	"time"
 
@@ -18,11 +21,33 @@ const (
 	maxRetries     = 3 // before we abandon
 )
 
+// Wire format of the requests, the agent answers in the format of the request.
+// Binary unless MPQUIC_WIRE_FORMAT=json, falls back to JSON for good when the agent
+// rejects it (empty PathID frame) or answers a binary request in JSON
+const (
+	formatBinary = iota
+	formatJSON
+)
+
+// Request v1: fixed layout, little-endian (see central_service/utils/wire_format.py):
+// version u8, pad 3, StreamID u32, ConnectionID u64, then Path1 and Path2 as
+// PathID u8, pad 7, SmoothedRTT f64, Bandwidth, Packets, Retransmissions, Losses u64,
+// then len(RequestPath) u16 and the RequestPath.
+// Response: StreamID (decimal), [version u8, PathID u8]
+const (
+	wireVersion       = 1
+	pathStatsSize     = 48
+	requestHeaderSize = 16 + 2*pathStatsSize + 2
+)
+
 // ZClient ZMQ-Client
 type ZClient struct {
 	socket   *zmq.Socket
 	poller   *zmq.Poller
 	sequence uint64
+	format   int
+	buffer   []byte
+	last     *Request // resent as JSON if the agent rejects the binary format
 }
 
 // Bandwidth same as bandwidth.go
@@ -39,10 +64,11 @@ type PathStats struct {
 
 // Request ...
 type Request struct {
-	StreamID    protocol.StreamID
-	RequestPath string
-	Path1       *PathStats
-	Path2       *PathStats
+	ConnectionID protocol.ConnectionID
+	StreamID     protocol.StreamID
+	RequestPath  string
+	Path1        *PathStats
+	Path2        *PathStats
 }
 
 // Response ...
@@ -65,6 +91,12 @@ func NewClient() (client *ZClient) {
 	client.poller = zmq.NewPoller()
 	client.poller.Add(client.socket, zmq.POLLIN)
 
+	client.format = formatBinary
+	if os.Getenv("MPQUIC_WIRE_FORMAT") == "json" {
+		client.format = formatJSON
+	}
+	client.buffer = make([]byte, requestHeaderSize, requestHeaderSize+256)
+
 	return
 }
 
@@ -111,6 +143,24 @@ func (client *ZClient) Response() (response *Response, err error) {
 
 			cstrID, _ := strconv.ParseUint(reply[0], 10, 8) // don't care about the error thug life
 			response.StreamID = protocol.StreamID(cstrID)
+
+			if client.format == formatBinary {
+				if len(reply[1]) == 2 && reply[1][0] == wireVersion {
+					response.PathID = reply[1][1]
+					break
+				}
+				utils.Infof("Binary wire format declined by the agent, falling back to JSON")
+				client.format = formatJSON
+				if len(reply[1]) == 0 && client.last != nil {
+					// rejected, ask again
+					if serr := client.send(client.last); serr != nil {
+						break
+					}
+					reply = []string{}
+					continue
+				}
+			}
+
 			// response.PathID = reply[1:]
 			// pathID, cerr := strconv.ParseUint(reply[1], 10, 8)
 			var pathID uint64
@@ -149,15 +199,65 @@ func (client *ZClient) Request(request *Request) (err error) {
 		request.Path2.Losses,
 		request.RequestPath)
 
-	// first we have to pack our struct into json -> []byte
-	packedRequest := new(bytes.Buffer)
-	json.NewEncoder(packedRequest).Encode(request)
+	client.last = request
+	return client.send(request)
+}
 
-	bsent, err := client.socket.SendMessage(request.StreamID, packedRequest.Bytes())
+func (client *ZClient) send(request *Request) (err error) {
+	var packedRequest []byte
+	if client.format == formatBinary {
+		client.buffer = encodeRequest(client.buffer, request)
+		packedRequest = client.buffer
+	} else {
+		// pack our struct into json -> []byte
+		buffer := new(bytes.Buffer)
+		json.NewEncoder(buffer).Encode(request)
+		packedRequest = buffer.Bytes()
+	}
+
+	bsent, err := client.socket.SendMessage(request.StreamID, packedRequest)
 	if err != nil || bsent <= 0 {
 		utils.Errorf("Error in Sending Request\n")
-		utils.Errorf(err.Error())
+		if err != nil {
+			utils.Errorf(err.Error())
+		}
 	}
 
 	return err
 }
+
+// encodeRequest writes the binary v1 request into buffer (reused, grown if needed)
+func encodeRequest(buffer []byte, request *Request) []byte {
+	path := request.RequestPath
+	if len(path) > math.MaxUint16 {
+		path = path[:math.MaxUint16]
+	}
+
+	size := requestHeaderSize + len(path)
+	if cap(buffer) < size {
+		buffer = make([]byte, size)
+	}
+	buffer = buffer[:size]
+
+	buffer[0] = wireVersion
+	buffer[1], buffer[2], buffer[3] = 0, 0, 0
+	binary.LittleEndian.PutUint32(buffer[4:], uint32(request.StreamID))
+	binary.LittleEndian.PutUint64(buffer[8:], uint64(request.ConnectionID))
+	putPathStats(buffer[16:], request.Path1)
+	putPathStats(buffer[16+pathStatsSize:], request.Path2)
+	binary.LittleEndian.PutUint16(buffer[16+2*pathStatsSize:], uint16(len(path)))
+	copy(buffer[requestHeaderSize:], path)
+	return buffer
+}
+
+func putPathStats(buffer []byte, stats *PathStats) {
+	for i := 0; i < 8; i++ {
+		buffer[i] = 0
+	}
+	buffer[0] = stats.PathID
+	binary.LittleEndian.PutUint64(buffer[8:], math.Float64bits(stats.SmoothedRTT))
+	binary.LittleEndian.PutUint64(buffer[16:], stats.Bandwidth)
+	binary.LittleEndian.PutUint64(buffer[24:], stats.Packets)
+	binary.LittleEndian.PutUint64(buffer[32:], stats.Retransmissions)
+	binary.LittleEndian.PutUint64(buffer[40:], stats.Losses)
+}
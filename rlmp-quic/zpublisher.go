@@ -4,6 +4,9 @@ import (
 	"bytes"
 	"encoding/json"
 	"errors"
+	"fmt"
+	"os"
+	"sync"
 	"time"
 
 	"github.com/lucas-clemente/quic-go/internal/utils"
@@ -11,9 +14,12 @@ import (
 )
 
 // ZPublisher ZMQ-Client
+// Reliable (PUSH/PULL), sequenced channel of stream completions towards the collector
 type ZPublisher struct {
 	socket   *zmq.Socket
 	poller   *zmq.Poller
+	lock     sync.Mutex // zmq sockets are not thread safe, also keeps sequence == send order
+	episode  string
 	sequence uint64
 }
 
@@ -21,20 +27,34 @@ type ZPublisher struct {
 
 // StreamInfo combined
 type StreamInfo struct {
+	ConnectionID   uint64 // QUIC session of the stream, as in the scheduling requests (Request in zclient.go)
 	StreamID       uint32
 	ObjectID       string
 	CompletionTime float64
 	Path           string
 	// StartTime  time.Time
 	// EndTime    time.Time
+
+	// Set by the publisher: 0, 1, 2... per episode (one client run)
+	Episode  string
+	Sequence uint64
+}
+
+// EndOfEpisode follows the last StreamInfo of an episode, Total StreamInfos were sent
+type EndOfEpisode struct {
+	Episode      string
+	Sequence     uint64
+	EndOfEpisode bool
+	Total        uint64
 }
 
 // NewPublisher instantiates a new zmq.Publisher and a zmq.Poller
 func NewPublisher() (publisher *ZPublisher) {
 	publisher = &ZPublisher{}
+	publisher.episode = fmt.Sprintf("%d-%d", os.Getpid(), time.Now().UnixNano())
 	var err error
 
-	publisher.socket, err = zmq.NewSocket(zmq.PUB)
+	publisher.socket, err = zmq.NewSocket(zmq.PUSH)
 
 	if err != nil {
 		utils.Errorf(err.Error())
@@ -80,22 +100,53 @@ func (publisher *ZPublisher) Close() {
 	publisher.socket.Close()
 }
 
-// Publish messages so everyone listening can receive
+// Publish sends a stream completion, safe to call from several goroutines
+// PUSH blocks instead of dropping when the pipe is full, no need to pace the sender
 func (publisher *ZPublisher) Publish(streamInfo *StreamInfo) (err error) {
-	utils.Infof("StreamID %d, ObjectID: %s, CompletionTime: %d, Path: %s\n",
+	publisher.lock.Lock()
+	defer publisher.lock.Unlock()
+
+	streamInfo.Episode = publisher.episode
+	streamInfo.Sequence = publisher.sequence
+	publisher.sequence++
+
+	utils.Infof("StreamID %d, ObjectID: %s, CompletionTime: %f, Path: %s, Sequence: %d\n",
 		streamInfo.StreamID,
 		streamInfo.ObjectID,
 		streamInfo.CompletionTime,
-		streamInfo.Path)
+		streamInfo.Path,
+		streamInfo.Sequence)
+
+	return publisher.send(streamInfo.StreamID, streamInfo)
+}
 
+// EndEpisode tells the collector that all stream completions of the episode have been sent
+func (publisher *ZPublisher) EndEpisode() (err error) {
+	publisher.lock.Lock()
+	defer publisher.lock.Unlock()
+
+	end := &EndOfEpisode{
+		Episode:      publisher.episode,
+		Sequence:     publisher.sequence,
+		EndOfEpisode: true,
+		Total:        publisher.sequence}
+
+	utils.Infof("EndOfEpisode %s, Total: %d\n", end.Episode, end.Total)
+
+	return publisher.send(0, end)
+}
+
+func (publisher *ZPublisher) send(streamID uint32, message interface{}) (err error) {
 	// first we have to pack our struct into json -> []byte
 	packedMessage := new(bytes.Buffer)
-	json.NewEncoder(packedMessage).Encode(streamInfo)
+	json.NewEncoder(packedMessage).Encode(message)
 
-	bsent, err := publisher.socket.SendMessage(streamInfo.StreamID, packedMessage.Bytes())
+	bsent, err := publisher.socket.SendMessage(streamID, packedMessage.Bytes())
 	if err != nil || bsent <= 0 {
 		utils.Errorf("Error in publishing message\n")
-		utils.Errorf(err.Error())
+		if err != nil {
+			utils.Errorf(err.Error())
+		}
 	}
 
 	return err